@@ -0,0 +1,308 @@
+"""
+PriceWatch AI - Alert Engine
+Redis-indexed alert evaluation: only alerts a price transition crosses are touched
+"""
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Set
+import redis.asyncio as aioredis
+from sqlalchemy import select, update, func
+from models import Alert, AlertType, Product, User, Webhook
+import logging
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Per product, under ALERT_INDEX_PREFIX + product_id + ":":
+#   threshold  ZSET alert_id -> price that fires when crossed downwards
+#   drop       ZSET alert_id -> minimum drop in percent (0 = any drop)
+#   increase   ZSET alert_id -> minimum increase in percent (0 = any increase)
+#   drop_amount, increase_amount
+#              ZSET alert_id -> minimum change in price, for alerts created
+#              before thresholds were percentages (threshold_is_percent NULL)
+#   stock      SET  alert_ids fired on any in_stock change
+#   loaded     marker; without it the index is rebuilt from the database
+ALERT_INDEX_PREFIX = "pricewatch:alerts:"
+ALERT_INDEX_TTL = 86400  # Indexes are reloaded from the database at least daily
+ALERT_DEBOUNCE_PREFIX = "pricewatch:alert_debounce:"
+ALERT_DEBOUNCE_SECONDS = int(os.getenv("ALERT_DEBOUNCE_SECONDS", "3600"))
+
+INDEX_SETS = {
+    AlertType.THRESHOLD: "threshold",
+    AlertType.PRICE_DROP: "drop",
+    AlertType.PRICE_INCREASE: "increase",
+    AlertType.STOCK_CHANGE: "stock",
+}
+INDEX_NAMES = list(INDEX_SETS.values()) + ["drop_amount", "increase_amount"]
+
+
+def _key(product_id: str, name: str) -> str:
+    return f"{ALERT_INDEX_PREFIX}{product_id}:{name}"
+
+
+def percent_change(old_price: float, new_price: float) -> float:
+    return abs(new_price - old_price) / old_price * 100 if old_price else 0.0
+
+
+class AlertIndex:
+    """
+    Per-product alert sets in Redis. Thresholds and percentage triggers are
+    sorted sets, so a price move from old to new reads exactly the alerts it
+    crosses with one range query, however many alerts the product has.
+    """
+
+    def __init__(self):
+        self._redis: Optional[aioredis.Redis] = None
+        self._loop = None
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        """Redis client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+            self._loop = loop
+        return self._redis
+
+    async def close(self):
+        """Close the Redis client (before its event loop goes away)"""
+        if self._redis is not None:
+            await self._redis.aclose()
+        self._redis = None
+        self._loop = None
+
+    def _stage(self, pipe, alert: Alert):
+        name = INDEX_SETS[AlertType(alert.alert_type)]
+        key = _key(alert.product_id, name)
+        if name == "stock":
+            pipe.sadd(key, alert.id)
+        elif name == "threshold":
+            if alert.threshold is not None:
+                pipe.zadd(key, {alert.id: alert.threshold})
+        elif alert.threshold_is_percent or not alert.threshold:
+            pipe.zadd(key, {alert.id: alert.threshold or 0})
+        else:
+            pipe.zadd(_key(alert.product_id, f"{name}_amount"), {alert.id: alert.threshold})
+
+    async def load(self, session, product_ids: List[str]):
+        """(Re)build the indexes of products whose index is cold"""
+        pipe = self.redis.pipeline(transaction=False)
+        for product_id in product_ids:
+            pipe.exists(_key(product_id, "loaded"))
+        cold = [product_id for product_id, warm in zip(product_ids, await pipe.execute()) if not warm]
+        if not cold:
+            return
+
+        alerts = (await session.scalars(
+            select(Alert).where(Alert.product_id.in_(cold), Alert.enabled.is_(True))
+        )).all()
+
+        pipe = self.redis.pipeline()
+        for product_id in cold:
+            pipe.delete(*[_key(product_id, name) for name in INDEX_NAMES + ["loaded"]])
+        for alert in alerts:
+            self._stage(pipe, alert)
+        for product_id in cold:
+            pipe.set(_key(product_id, "loaded"), 1)
+            for name in INDEX_NAMES + ["loaded"]:
+                pipe.expire(_key(product_id, name), ALERT_INDEX_TTL)
+        await pipe.execute()
+
+    async def add(self, alert: Alert):
+        """Index a newly enabled alert (no-op while the product's index is cold)"""
+        if not alert.enabled or not await self.redis.exists(_key(alert.product_id, "loaded")):
+            return
+        pipe = self.redis.pipeline()
+        self._stage(pipe, alert)
+        await pipe.execute()
+
+    async def remove(self, product_id: str, alert_ids: List[str]):
+        """Unindex alerts that were deleted or disabled"""
+        if not alert_ids:
+            return
+        pipe = self.redis.pipeline()
+        for name in INDEX_NAMES:
+            if name == "stock":
+                pipe.srem(_key(product_id, name), *alert_ids)
+            else:
+                pipe.zrem(_key(product_id, name), *alert_ids)
+        await pipe.execute()
+
+    async def drop_product(self, product_id: str):
+        await self.redis.delete(*[_key(product_id, name) for name in INDEX_NAMES + ["loaded"]])
+
+    async def crossed(self, changes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Alerts fired by a batch of price changes, as alert_id -> change.
+
+        THRESHOLD fires when the price falls from above the threshold to at
+        or below it; PRICE_DROP/PRICE_INCREASE when the move is at least the
+        alert's percentage (or amount, for legacy alerts); STOCK_CHANGE when
+        in_stock flips.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        queried = []
+        for change in changes:
+            old_price, new_price = change.get("old_price"), change.get("new_price")
+            product_id = change["product_id"]
+
+            if old_price is not None and new_price is not None and new_price != old_price:
+                percent = percent_change(old_price, new_price)
+                amount = abs(new_price - old_price)
+                if new_price < old_price:
+                    pipe.zrangebyscore(_key(product_id, "threshold"), new_price, f"({old_price}")
+                    pipe.zrangebyscore(_key(product_id, "drop"), "-inf", percent)
+                    pipe.zrangebyscore(_key(product_id, "drop_amount"), "-inf", amount)
+                    queried += [change, change, change]
+                else:
+                    pipe.zrangebyscore(_key(product_id, "increase"), "-inf", percent)
+                    pipe.zrangebyscore(_key(product_id, "increase_amount"), "-inf", amount)
+                    queried += [change, change]
+
+            old_stock, new_stock = change.get("old_in_stock"), change.get("new_in_stock")
+            if old_stock is not None and new_stock is not None and old_stock != new_stock:
+                pipe.smembers(_key(product_id, "stock"))
+                queried.append(change)
+
+        fired: Dict[str, Dict[str, Any]] = {}
+        if not queried:
+            return fired
+        for change, alert_ids in zip(queried, await pipe.execute()):
+            for alert_id in alert_ids:
+                fired[alert_id] = change
+        return fired
+
+    async def debounce(self, alert_ids: List[str]) -> Set[str]:
+        """Claim each alert for ALERT_DEBOUNCE_SECONDS; returns those not fired recently"""
+        pipe = self.redis.pipeline(transaction=False)
+        for alert_id in alert_ids:
+            pipe.set(ALERT_DEBOUNCE_PREFIX + alert_id, 1, nx=True, ex=ALERT_DEBOUNCE_SECONDS)
+        return {alert_id for alert_id, claimed in zip(alert_ids, await pipe.execute()) if claimed}
+
+    async def release(self, alert_ids: List[str]):
+        """Give back debounce claims for alerts whose trigger wasn't recorded"""
+        if alert_ids:
+            await self.redis.delete(*[ALERT_DEBOUNCE_PREFIX + alert_id for alert_id in alert_ids])
+
+
+alert_index = AlertIndex()
+
+
+# ========================================
+# EVALUATION
+# ========================================
+
+async def record_triggers(session, fired: List[str]):
+    """
+    Record fired alerts in one UPDATE and load what their notifications need.
+
+    Returns:
+        (alert rows, enabled webhooks of their users, trigger time)
+    """
+    now = datetime.utcnow()
+    await session.execute(
+        update(Alert)
+        .where(Alert.id.in_(fired))
+        .values(last_triggered=now, trigger_count=func.coalesce(Alert.trigger_count, 0) + 1)
+    )
+
+    rows = (await session.execute(
+        select(Alert.id, Alert.user_id, Alert.alert_type, Alert.threshold, User.email, Product.name, Product.url)
+        .join(User, User.id == Alert.user_id)
+        .join(Product, Product.id == Alert.product_id)
+        .where(Alert.id.in_(fired))
+    )).all()
+    user_ids = {row.user_id for row in rows}
+    webhooks = (await session.execute(
+        select(Webhook.id, Webhook.user_id, Webhook.events,
+               Webhook.batch_window_seconds, Webhook.batch_max_events)
+        .where(Webhook.user_id.in_(user_ids), Webhook.enabled.is_(True))
+    )).all() if user_ids else []
+    await session.commit()
+    return rows, webhooks, now
+
+
+async def check_and_trigger_alerts(changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Evaluate alerts for the change records returned by save_scrape_results,
+    record the triggers in one UPDATE and queue the notifications.
+
+    Returns:
+        One record per alert that fired
+    """
+    from database import SessionLocal
+
+    changes = [change for change in changes if change.get("old_price") is not None
+               or change.get("old_in_stock") is not None]
+    if not changes:
+        return []
+
+    async with SessionLocal() as session:
+        await alert_index.load(session, list({change["product_id"] for change in changes}))
+        crossed = await alert_index.crossed(changes)
+        if not crossed:
+            return []
+        # Claimed before the UPDATE so concurrent workers can't both fire an
+        # alert; released again if the trigger isn't committed
+        fired = list(await alert_index.debounce(list(crossed)))
+        if not fired:
+            return []
+
+        try:
+            rows, webhooks, now = await record_triggers(session, fired)
+        except Exception:
+            await alert_index.release(fired)
+            raise
+
+    webhooks_by_user: Dict[str, List[Any]] = defaultdict(list)
+    for webhook in webhooks:
+        webhooks_by_user[webhook.user_id].append(webhook)
+
+    triggered = []
+    for row in rows:
+        change = crossed[row.id]
+        triggered.append({
+            "alert_id": row.id,
+            "user_id": row.user_id,
+            "alert_type": AlertType(row.alert_type).value,
+            "product_id": change["product_id"],
+            "product_name": row.name or "Unnamed Product",
+            "product_url": row.url,
+            "email": row.email,
+            "old_price": change.get("old_price"),
+            "new_price": change.get("new_price"),
+            "threshold": row.threshold,
+            "old_in_stock": change.get("old_in_stock"),
+            "new_in_stock": change.get("new_in_stock"),
+            "triggered_at": now.isoformat()
+        })
+
+    await dispatch_notifications(triggered, webhooks_by_user)
+    logger.info(f"✅ {len(triggered)} alerts triggered ({len(crossed) - len(fired)} debounced)")
+    return triggered
+
+
+async def dispatch_notifications(triggered: List[Dict[str, Any]], webhooks_by_user: Dict[str, List[Any]]):
+    """Queue email and webhook deliveries for fired alerts"""
+    from tasks import send_price_alert_emails
+    from webhooks import queue_event
+
+    emails = [
+        {key: alert[key] for key in ("email", "alert_type", "product_name", "product_url", "old_price",
+                                     "new_price", "threshold", "old_in_stock", "new_in_stock")}
+        for alert in triggered
+    ]
+    if emails:
+        # One task for the whole batch; it sends one request per 1000 recipients
+        send_price_alert_emails.delay(emails)
+
+    for alert in triggered:
+        for webhook in webhooks_by_user.get(alert["user_id"], []):
+            if alert["alert_type"] in json.loads(webhook.events or "[]"):
+                payload = {key: value for key, value in alert.items() if key != "email"}
+                await queue_event(webhook, alert["alert_type"], payload)
@@ -0,0 +1,242 @@
+"""
+PriceWatch AI - API Key Authentication Helpers
+Key hashing, verified-key caching and batched last_used tracking
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import update, bindparam
+import redis.asyncio as aioredis
+from database import SessionLocal
+from models import APIKey
+import logging
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+KEY_USAGE_FLUSH_INTERVAL = 60  # Seconds between last_used write-backs
+
+# Verified-key cache
+KEY_CACHE_LOCAL_TTL = 30  # Seconds an entry is trusted in-process
+KEY_CACHE_NEGATIVE_TTL = 5  # Seconds an unknown key is remembered as invalid
+# Seconds an entry lives in the shared Redis cache. Entries carry the user's
+# plan and account status, which nothing invalidates: changes to those take
+# effect within KEY_CACHE_REDIS_TTL + KEY_CACHE_LOCAL_TTL
+KEY_CACHE_REDIS_TTL = 300
+KEY_CACHE_MAX_ENTRIES = 10000
+KEY_CACHE_PREFIX = "pricewatch:apikey:"  # STRING per key hash -> JSON entry
+KEY_CACHE_REVOKED_PREFIX = "pricewatch:apikey_revoked:"  # Tombstone per invalidated key hash
+KEY_CACHE_TOMBSTONE_TTL = 60  # Seconds; longer than any request that read the key before it was revoked
+KEY_CACHE_CHANNEL = "pricewatch:apikey:invalidate"
+
+# Cache a verified key unless it was invalidated meanwhile: a request that
+# read the key from the database before a revocation must not re-cache it
+# after invalidate() ran.
+# KEYS: tombstone, entry. ARGV: entry JSON, ttl
+SET_UNLESS_REVOKED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+def hash_api_key(api_key: str) -> str:
+    """API keys are stored hashed, like passwords"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class APIKeyCache:
+    """
+    Two-level cache of verified API keys: key hash -> {"key_id", "user_id",
+    "plan", "active"}.
+
+    Lookups hit an in-process LRU first, then a Redis entry shared by all API
+    workers, and only then the database. Revoking a key must call
+    invalidate(), which deletes the Redis entries, leaves a short-lived
+    tombstone that blocks re-caching by requests already in flight, and
+    broadcasts the hashes so every worker drops its local copy. Plan and
+    account status changes are picked up when entries expire (see
+    KEY_CACHE_REDIS_TTL).
+    """
+
+    def __init__(self, local_ttl: int = KEY_CACHE_LOCAL_TTL, max_entries: int = KEY_CACHE_MAX_ENTRIES):
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._redis: Optional[aioredis.Redis] = None
+        self._set_unless_revoked = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        if self._redis is None:
+            self._redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+            self._set_unless_revoked = self._redis.register_script(SET_UNLESS_REVOKED_SCRIPT)
+        return self._redis
+
+    def _remember(self, key_hash: str, entry: Optional[Dict[str, Any]], ttl: int):
+        self._local[key_hash] = (time.monotonic() + ttl, entry)
+        self._local.move_to_end(key_hash)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def _forget(self, key_hashes: List[str]):
+        for key_hash in key_hashes:
+            self._local.pop(key_hash, None)
+
+    async def get(self, key_hash: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Returns:
+            (hit, entry) - entry is None on a cached miss (unknown key)
+        """
+        cached = self._local.get(key_hash)
+        if cached:
+            expires_at, entry = cached
+            if expires_at > time.monotonic():
+                self._local.move_to_end(key_hash)
+                return True, entry
+            del self._local[key_hash]
+
+        try:
+            raw = await self.redis.get(KEY_CACHE_PREFIX + key_hash)
+        except Exception as e:
+            logger.warning(f"⚠️ API key cache unavailable: {e}")
+            return False, None
+        if raw is None:
+            return False, None
+
+        entry = json.loads(raw)
+        self._remember(key_hash, entry, self.local_ttl)
+        return True, entry
+
+    async def set(self, key_hash: str, entry: Dict[str, Any]):
+        """Cache a verified key locally and in Redis, unless it was just invalidated"""
+        try:
+            client = self.redis
+            cached = await self._set_unless_revoked(
+                keys=[KEY_CACHE_REVOKED_PREFIX + key_hash, KEY_CACHE_PREFIX + key_hash],
+                args=[json.dumps(entry), KEY_CACHE_REDIS_TTL],
+                client=client
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ API key cache unavailable: {e}")
+            cached = True
+        if cached:
+            self._remember(key_hash, entry, self.local_ttl)
+
+    def set_invalid(self, key_hash: str):
+        """Briefly remember an unknown key so repeated bad requests skip the database"""
+        self._remember(key_hash, None, KEY_CACHE_NEGATIVE_TTL)
+
+    async def invalidate(self, key_hashes: List[str]):
+        """Drop keys everywhere (call when a key is revoked)"""
+        if not key_hashes:
+            return
+        self._forget(key_hashes)
+        pipe = self.redis.pipeline()
+        pipe.delete(*[KEY_CACHE_PREFIX + key_hash for key_hash in key_hashes])
+        for key_hash in key_hashes:
+            pipe.set(KEY_CACHE_REVOKED_PREFIX + key_hash, 1, ex=KEY_CACHE_TOMBSTONE_TTL)
+        pipe.publish(KEY_CACHE_CHANNEL, json.dumps(key_hashes))
+        await pipe.execute()
+
+    async def _listen(self):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(KEY_CACHE_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    self._forget(json.loads(message["data"]))
+        finally:
+            await pubsub.close()
+
+    async def _listen_forever(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Entries may be stale until we resubscribe; start clean
+                logger.warning(f"⚠️ API key invalidation listener lost: {e}")
+                self._local.clear()
+                await asyncio.sleep(1)
+
+    def start(self):
+        """Subscribe to invalidations from other workers"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+class KeyUsageTracker:
+    """
+    Records API key usage in memory and writes APIKey.last_used back in one
+    batched UPDATE per interval, instead of a write on every request.
+    """
+
+    def __init__(self, flush_interval: int = KEY_USAGE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, key_id: str):
+        """Note that a key was just used"""
+        self._pending[key_id] = datetime.utcnow()
+
+    async def flush(self):
+        """Write pending last_used timestamps"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        table = APIKey.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("key_id"))
+            .values(last_used=bindparam("used_at"))
+        )
+        async with SessionLocal() as session:
+            await session.execute(
+                statement,
+                [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()]
+            )
+            await session.commit()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ API key usage flush failed: {str(e)}")
+
+    def start(self):
+        """Start the periodic flush on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop flushing and write out whatever is still pending"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+key_cache = APIKeyCache()
+key_usage = KeyUsageTracker()
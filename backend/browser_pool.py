@@ -0,0 +1,249 @@
+"""
+PriceWatch AI - Browser Pool
+Long-lived Chromium instances shared by every scrape in a worker process
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, AsyncIterator
+from playwright.async_api import async_playwright, Playwright, Browser, BrowserContext
+import psutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pool tuning (overridable per deployment)
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1024"))
+
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-dev-shm-usage"
+]
+
+
+class PooledBrowser:
+    """A single Chromium instance plus its usage counters"""
+
+    def __init__(self, browser: Browser, process: Optional[psutil.Process] = None):
+        self.browser = browser
+        self.process = process  # Chromium's main process, when it could be identified
+        self.pages_served = 0
+        self.active_contexts = 0
+        self.retiring = False
+
+    def rss_mb(self) -> float:
+        """RSS of this browser's process tree (main process, renderers, GPU, ...)"""
+        if self.process is None:
+            return 0.0
+        try:
+            rss = self.process.memory_info().rss
+            for child in self.process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return rss / (1024 * 1024)
+        except psutil.Error:
+            return 0.0
+
+    async def close(self):
+        """Close the underlying browser, ignoring already-dead processes"""
+        try:
+            await self.browser.close()
+        except Exception as e:
+            logger.debug(f"Browser close failed: {e}")
+
+
+class BrowserPool:
+    """
+    Keeps a small set of Chromium browsers alive for the lifetime of a worker
+    and hands out isolated BrowserContexts.
+
+    Browsers are recycled once they have served `max_pages` contexts or when
+    their Chromium process trees together grow past `max_rss_mb`. A retiring browser is
+    only closed after its last in-flight context is released.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_pages: int = BROWSER_MAX_PAGES,
+                 max_rss_mb: int = BROWSER_MAX_RSS_MB, use_proxy: bool = False,
+                 proxy_url: Optional[str] = None):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.use_proxy = use_proxy
+        self.proxy_url = proxy_url
+
+        self._playwright: Optional[Playwright] = None
+        self._slots: List[Optional[PooledBrowser]] = [None] * self.size
+        self._retired: List[PooledBrowser] = []
+        self._next_slot = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        """Start Playwright; browsers themselves are launched on first use"""
+        if self.started:
+            return
+        self._lock = asyncio.Lock()
+        self._playwright = await async_playwright().start()
+        logger.info(f"✅ Browser pool started (size={self.size}, max_pages={self.max_pages})")
+
+    async def warm_up(self):
+        """Start Playwright and launch every browser now, so the first scrape doesn't pay for it"""
+        await self.start()
+        async with self._lock:
+            for index, pooled in enumerate(self._slots):
+                if pooled is None:
+                    self._slots[index] = await self._launch()
+
+    async def close(self):
+        """Close every browser and stop Playwright"""
+        for pooled in self._slots + self._retired:
+            if pooled:
+                await pooled.close()
+        self._slots = [None] * self.size
+        self._retired = []
+
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info("Browser pool closed")
+
+    async def _launch(self) -> PooledBrowser:
+        launch_options: Dict[str, Any] = {"headless": True, "args": LAUNCH_ARGS}
+        if self.use_proxy and self.proxy_url:
+            launch_options["proxy"] = {"server": self.proxy_url}
+
+        before = self._descendant_pids()
+        browser = await self._playwright.chromium.launch(**launch_options)
+        logger.info("✅ Pooled browser launched")
+        return PooledBrowser(browser, self._browser_process(before))
+
+    def _descendant_pids(self) -> set:
+        try:
+            return {child.pid for child in psutil.Process().children(recursive=True)}
+        except psutil.Error:
+            return set()
+
+    def _browser_process(self, before: set) -> Optional[psutil.Process]:
+        """
+        Chromium's main process for a browser launched since `before` was taken.
+        Playwright doesn't expose the pid; the new process whose parent isn't
+        new itself is the browser (the Playwright driver predates it). Launches
+        are serialized under the pool lock.
+        """
+        try:
+            new = [child for child in psutil.Process().children(recursive=True) if child.pid not in before]
+            new_pids = {child.pid for child in new}
+            roots = [child for child in new if child.ppid() not in new_pids]
+        except psutil.Error:
+            return None
+        if len(roots) != 1:
+            logger.debug(f"Could not identify browser process ({len(roots)} candidates)")
+            return None
+        return roots[0]
+
+    def _browsers_rss_mb(self) -> float:
+        """
+        RSS of the pooled Chromium process trees, excluding the worker itself.
+        Retired browsers are already on their way out and don't count.
+        """
+        return sum(pooled.rss_mb() for pooled in self._slots if pooled)
+
+    def _retire(self, index: int):
+        pooled = self._slots[index]
+        if pooled:
+            pooled.retiring = True
+            self._retired.append(pooled)
+        self._slots[index] = None
+
+    async def _reap_retired(self):
+        """Close retired browsers that no longer have open contexts"""
+        still_busy = []
+        for pooled in self._retired:
+            if pooled.active_contexts > 0:
+                still_busy.append(pooled)
+            else:
+                await pooled.close()
+                logger.info(f"♻️ Recycled browser after {pooled.pages_served} pages")
+        self._retired = still_busy
+
+    async def _acquire(self) -> PooledBrowser:
+        if not self.started:
+            await self.start()
+
+        async with self._lock:
+            if self.max_rss_mb and self._browsers_rss_mb() > self.max_rss_mb:
+                logger.warning(f"⚠️ Browser RSS above {self.max_rss_mb}MB, recycling browsers")
+                for index in range(self.size):
+                    self._retire(index)
+
+            index = self._next_slot
+            self._next_slot = (self._next_slot + 1) % self.size
+
+            pooled = self._slots[index]
+            if pooled and (pooled.pages_served >= self.max_pages or not pooled.browser.is_connected()):
+                self._retire(index)
+                pooled = None
+
+            if pooled is None:
+                pooled = await self._launch()
+                self._slots[index] = pooled
+
+            pooled.pages_served += 1
+            pooled.active_contexts += 1
+
+            await self._reap_retired()
+            return pooled
+
+    @asynccontextmanager
+    async def context(self, **context_options) -> AsyncIterator[BrowserContext]:
+        """
+        Yield a fresh, isolated BrowserContext from a pooled browser.
+        The context (cookies, storage, pages) is discarded on exit.
+        """
+        pooled = await self._acquire()
+        context = None
+        try:
+            context = await pooled.browser.new_context(**context_options)
+            yield context
+        finally:
+            if context:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.debug(f"Context close failed: {e}")
+            pooled.active_contexts -= 1
+            if pooled.retiring and pooled.active_contexts == 0:
+                async with self._lock:
+                    await self._reap_retired()
+
+
+# ========================================
+# PER-PROCESS POOL
+# ========================================
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return this process's browser pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+async def shutdown_browser_pool():
+    """Close this process's browser pool if one was started"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,67 @@
+"""
+PriceWatch AI - Canonical Product URLs
+Normalize product URLs so every user tracking the same item shares one scrape
+"""
+
+import re
+from typing import Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+# Query parameters that never change which product a URL points to
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "igshid", "yclid", "srsltid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_", "tag", "linkcode", "linkid",
+    "camp", "creative", "creativeasin", "psc",
+    "content-id", "athcpid", "athpgid", "athbdg",
+    "athznid", "athieid", "clickid", "affiliates_ad_id", "wmlspartner",
+    "sourceid", "veh", "cmpid", "afid", "lnm"
+}
+TRACKING_PREFIXES = ("utm_", "pf_rd_", "pd_rd_")
+
+# Retailer-specific item ID patterns: domain -> (regex over path/query, canonical URL template)
+RETAILER_RULES = [
+    ("amazon.", re.compile(r"/(?:dp|gp/product|gp/aw/d|exec/obidos/ASIN|o/ASIN)/([A-Z0-9]{10})", re.I),
+     "https://www.{host}/dp/{id}"),
+    ("walmart.com", re.compile(r"/ip/(?:[^/]+/)?(\d+)"), "https://www.walmart.com/ip/{id}"),
+    ("target.com", re.compile(r"/A-(\d+)"), "https://www.target.com/p/-/A-{id}"),
+    ("ebay.com", re.compile(r"/itm/(?:[^/]+/)?(\d+)"), "https://www.ebay.com/itm/{id}"),
+    ("bestbuy.com", re.compile(r"(?:skuId=|/)(\d{7,})(?:\.p|&|$)"),
+     "https://www.bestbuy.com/site/{id}.p?skuId={id}"),
+]
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> Tuple[str, Optional[str]]:
+    """
+    Reduce a product URL to the canonical form used as the scrape target.
+
+    Returns:
+        (canonical_url, product_identifier) - identifier is the ASIN / item
+        ID for supported retailers, otherwise None
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().split("@")[-1]
+    if host.endswith(":443") or host.endswith(":80"):
+        host = host.rsplit(":", 1)[0]
+    bare_host = re.sub(r"^(www|smile|m)\.", "", host)
+
+    for domain, pattern, template in RETAILER_RULES:
+        if domain not in bare_host:
+            continue
+        match = pattern.search(parsed.path + ("?" + parsed.query if parsed.query else ""))
+        if match:
+            item_id = match.group(1).upper() if domain == "amazon." else match.group(1)
+            return template.format(host=bare_host, id=item_id), item_id
+
+    # Generic: drop tracking params and fragment, sort what remains
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    )
+    path = parsed.path.rstrip("/") or "/"
+    canonical = urlunparse(("https", host, path, "", urlencode(query), ""))
+    return canonical, None
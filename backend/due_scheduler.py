@@ -0,0 +1,194 @@
+"""
+PriceWatch AI - Due-Time Scheduler
+Redis sorted-set index of when each scrape target is next due for a price check
+
+A target is a canonical product URL (see canonical_url.py). Every product
+row that points at the same target subscribes to it; the target is scraped
+once per interval, using the shortest interval among its subscribers.
+"""
+
+import os
+import random
+import time
+from typing import Optional, List, Dict, Tuple
+import redis
+from canonical_url import canonicalize_url
+import logging
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+DUE_KEY = "pricewatch:due"  # ZSET target -> next due (unix seconds)
+TARGET_INTERVALS_KEY = "pricewatch:target_intervals"  # HASH target -> seconds
+PRODUCT_INTERVALS_KEY = "pricewatch:product_intervals"  # HASH product_id -> seconds
+PRODUCT_TARGETS_KEY = "pricewatch:product_targets"  # HASH product_id -> target
+SUBSCRIBERS_PREFIX = "pricewatch:target_subs:"  # SET per target of product_ids
+
+DISPATCH_BATCH_LIMIT = 1000
+JITTER_FRACTION = 0.1  # Each reschedule lands within +/-10% of the interval
+
+# Shared by subscribe/unsubscribe: drop a product from its current target and
+# recompute (or clear) that target's interval from the remaining subscribers
+_DETACH_LUA = """
+local function detach(product_id)
+    local target = redis.call('HGET', KEYS[4], product_id)
+    if not target then return end
+    local subs_key = ARGV[1] .. target
+    redis.call('SREM', subs_key, product_id)
+    redis.call('HDEL', KEYS[3], product_id)
+    redis.call('HDEL', KEYS[4], product_id)
+    local remaining = redis.call('SMEMBERS', subs_key)
+    if #remaining == 0 then
+        redis.call('ZREM', KEYS[1], target)
+        redis.call('HDEL', KEYS[2], target)
+        return
+    end
+    local shortest = nil
+    for start = 1, #remaining, 1000 do
+        local chunk = {unpack(remaining, start, math.min(start + 999, #remaining))}
+        for _, stored in ipairs(redis.call('HMGET', KEYS[3], unpack(chunk))) do
+            local value = tonumber(stored)
+            if value and (not shortest or value < shortest) then shortest = value end
+        end
+    end
+    if shortest then redis.call('HSET', KEYS[2], target, shortest) end
+end
+"""
+
+# KEYS: due, target intervals, product intervals, product targets
+# ARGV: subs prefix, product_id, target, interval, now, first offset
+SUBSCRIBE_SCRIPT = _DETACH_LUA + """
+local product_id, target = ARGV[2], ARGV[3]
+local interval, now, offset = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+-- Re-subscribing (new URL or new interval) starts from a clean slate
+detach(product_id)
+
+redis.call('SADD', ARGV[1] .. target, product_id)
+redis.call('HSET', KEYS[3], product_id, interval)
+redis.call('HSET', KEYS[4], product_id, target)
+
+local current = tonumber(redis.call('HGET', KEYS[2], target))
+if not current or interval < current then
+    redis.call('HSET', KEYS[2], target, interval)
+end
+
+local due = tonumber(redis.call('ZSCORE', KEYS[1], target))
+if not due then
+    redis.call('ZADD', KEYS[1], now + offset, target)
+elseif due > now + interval then
+    -- A stricter subscriber joined: pull the next check forward
+    redis.call('ZADD', KEYS[1], now + interval, target)
+end
+"""
+
+# KEYS: due, target intervals, product intervals, product targets
+# ARGV: subs prefix, product_id
+UNSUBSCRIBE_SCRIPT = _DETACH_LUA + """
+detach(ARGV[2])
+"""
+
+# Atomically claim due targets and push each one interval (+ jitter) ahead,
+# so a crashed dispatcher never drops a target from the schedule.
+# KEYS: due zset, target intervals hash. ARGV: now, limit, jitter_1..jitter_limit
+CLAIM_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for i, member in ipairs(due) do
+    local interval = tonumber(redis.call('HGET', KEYS[2], member) or '86400')
+    local next_due = tonumber(ARGV[1]) + interval * (1 + tonumber(ARGV[2 + i]))
+    redis.call('ZADD', KEYS[1], next_due, member)
+end
+return due
+"""
+
+
+class DueScheduler:
+    """Keeps a next-due index of scrape targets and hands out only those that are due"""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        self._subscribe = self.redis.register_script(SUBSCRIBE_SCRIPT)
+        self._unsubscribe = self.redis.register_script(UNSUBSCRIBE_SCRIPT)
+        self._claim_due = self.redis.register_script(CLAIM_DUE_SCRIPT)
+        self._keys = [DUE_KEY, TARGET_INTERVALS_KEY, PRODUCT_INTERVALS_KEY, PRODUCT_TARGETS_KEY]
+
+    def _jitter(self) -> float:
+        return random.uniform(-JITTER_FRACTION, JITTER_FRACTION)
+
+    def subscribe(self, product_id: str, url: str, interval: int, spread: bool = False) -> str:
+        """
+        Subscribe a product to the canonical target for its URL.
+
+        Args:
+            product_id: Product row to receive results
+            url: Product URL as entered by the user
+            interval: Seconds between checks for this product
+            spread: Place a new target's first check uniformly within one
+                    interval (for bulk enrollment) instead of one interval from now
+
+        Returns:
+            The canonical target URL
+        """
+        target, _ = canonicalize_url(url)
+        offset = random.uniform(0, interval) if spread else interval * (1 + self._jitter())
+        self._subscribe(keys=self._keys, args=[SUBSCRIBERS_PREFIX, product_id, target, interval, time.time(), offset])
+        return target
+
+    def enroll_missing(self, products: List[Tuple[str, str, int]]) -> int:
+        """
+        Subscribe products that aren't in the index yet (e.g. created before it
+        existed), spreading their first checks across one interval.
+
+        Args:
+            products: (product_id, url, interval) tuples
+
+        Returns:
+            Number of products enrolled
+        """
+        if not products:
+            return 0
+        enrolled = self.redis.hmget(PRODUCT_TARGETS_KEY, [product_id for product_id, _, _ in products])
+        missing = [product for product, target in zip(products, enrolled) if target is None]
+        for product_id, url, interval in missing:
+            self.subscribe(product_id, url, interval, spread=True)
+        return len(missing)
+
+    def unsubscribe(self, product_id: str):
+        """Remove a product; its target is dropped once it has no subscribers left"""
+        self._unsubscribe(keys=self._keys, args=[SUBSCRIBERS_PREFIX, product_id])
+
+    def subscribers(self, target: str) -> List[str]:
+        """Product IDs currently subscribed to a target"""
+        return list(self.redis.smembers(SUBSCRIBERS_PREFIX + target))
+
+    def subscribers_many(self, targets: List[str]) -> Dict[str, List[str]]:
+        """Subscribers for several targets in one round-trip"""
+        pipe = self.redis.pipeline()
+        for target in targets:
+            pipe.smembers(SUBSCRIBERS_PREFIX + target)
+        return {target: list(members) for target, members in zip(targets, pipe.execute())}
+
+    def claim_due(self, limit: int = DISPATCH_BATCH_LIMIT, now: Optional[float] = None) -> List[str]:
+        """
+        Return up to `limit` due targets, rescheduling each for its next check.
+        Callers loop until fewer than `limit` come back to drain a backlog.
+        """
+        now = time.time() if now is None else now
+        jitters = [self._jitter() for _ in range(limit)]
+        return self._claim_due(keys=[DUE_KEY, TARGET_INTERVALS_KEY], args=[now, limit] + jitters)
+
+    def pending_count(self, now: Optional[float] = None) -> int:
+        """Number of targets currently overdue"""
+        now = time.time() if now is None else now
+        return self.redis.zcount(DUE_KEY, "-inf", now)
+
+
+_scheduler: Optional[DueScheduler] = None
+
+
+def get_due_scheduler() -> DueScheduler:
+    """Return this process's DueScheduler, creating it on first use"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DueScheduler()
+    return _scheduler
@@ -3,11 +3,14 @@ PriceWatch AI - Email Automation Service
 Powered by SendGrid
 """
 
+import asyncio
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization
-from typing import Dict, Any, List
+import httpx
+from markupsafe import escape
+from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization, Substitution
+from typing import Dict, Any, List, Optional, Tuple, NamedTuple
 from datetime import datetime
+from email_templates import render_email, render_fragment, RenderedEmail
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,12 +20,79 @@ SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY", "")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "alerts@pricewatch-ai.com")
 FROM_NAME = "PriceWatch AI"
 
+SENDGRID_API_URL = "https://api.sendgrid.com/v3/mail/send"
+SENDGRID_MAX_PERSONALIZATIONS = 1000  # Recipients per API request
+SENDGRID_TIMEOUT = 30  # Seconds
+SENDGRID_ACCEPTED = {200, 201, 202}
+SENDGRID_RETRYABLE = {429, 500, 502, 503, 504}  # Worth retrying later; other errors are the request's fault
+
+EMAIL_MAX_RETRIES = 5
+EMAIL_RETRY_BACKOFF = 60  # Seconds before the first retry; doubles each attempt
+
+
+# Substitution tokens of the shared alert messages
+ALERT_TOKENS = {
+    key: f"-{key}-" for key in ("product_name", "product_url", "old_price", "new_price",
+                                "percent_change", "savings", "threshold", "stock_status")
+}
+ALERT_HTML_TOKENS = {"product_name": "-product_name_html-", "product_url": "-product_url_html-"}
+
+
+class BulkSendResult(NamedTuple):
+    sent: int  # Recipients SendGrid accepted
+    retry: List[Dict[str, Any]]  # Recipients whose request failed transiently (429, 5xx, network)
+
 
 class EmailService:
     """Handle all email communications"""
 
     def __init__(self):
-        self.sg = SendGridAPIClient(SENDGRID_API_KEY) if SENDGRID_API_KEY else None
+        self.enabled = bool(SENDGRID_API_KEY)
+        self._http: Optional[httpx.Client] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "headers": {"Authorization": f"Bearer {SENDGRID_API_KEY}"},
+            "timeout": SENDGRID_TIMEOUT
+        }
+
+    @property
+    def http(self) -> httpx.Client:
+        """HTTP session reused for every SendGrid request from this process"""
+        if self._http is None:
+            self._http = httpx.Client(**self._client_options())
+        return self._http
+
+    @property
+    def async_http(self) -> httpx.AsyncClient:
+        """Async session bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_http is None or self._async_loop is not loop:
+            self._async_http = httpx.AsyncClient(**self._client_options())
+            self._async_loop = loop
+        return self._async_http
+
+    async def close_async(self):
+        """Close the async session (before its event loop goes away)"""
+        if self._async_http is not None:
+            await self._async_http.aclose()
+        self._async_http = None
+        self._async_loop = None
+
+    def _post(self, payload: Dict[str, Any]) -> int:
+        """POST one mail/send request; returns the status code"""
+        response = self.http.post(SENDGRID_API_URL, json=payload)
+        if response.status_code not in SENDGRID_ACCEPTED:
+            logger.error(f"❌ Email failed: {response.status_code} {response.text[:200]}")
+        return response.status_code
+
+    async def _post_async(self, payload: Dict[str, Any]) -> int:
+        response = await self.async_http.post(SENDGRID_API_URL, json=payload)
+        if response.status_code not in SENDGRID_ACCEPTED:
+            logger.error(f"❌ Email failed: {response.status_code} {response.text[:200]}")
+        return response.status_code
 
     def send_email(self, to_email: str, subject: str, html_content: str, plain_content: str = None) -> bool:
         """
@@ -37,7 +107,7 @@ class EmailService:
         Returns:
             bool: True if sent successfully
         """
-        if not self.sg:
+        if not self.enabled:
             logger.warning("SendGrid not configured, logging email instead")
             logger.info(f"EMAIL TO: {to_email}")
             logger.info(f"SUBJECT: {subject}")
@@ -53,21 +123,153 @@ class EmailService:
             )
 
             if plain_content:
-                message.plain_text_content = Content("text/plain", plain_content)
+                message.add_content(Content("text/plain", plain_content))
 
-            response = self.sg.send(message)
-
-            if response.status_code in [200, 201, 202]:
+            if self._post(message.get()) in SENDGRID_ACCEPTED:
                 logger.info(f"✅ Email sent to {to_email}: {subject}")
                 return True
-            else:
-                logger.error(f"❌ Email failed: {response.status_code}")
-                return False
+            return False
 
         except Exception as e:
             logger.error(f"❌ SendGrid error: {str(e)}")
             return False
 
+    # ========================================
+    # BULK SENDING
+    # ========================================
+
+    def _bulk_payload(self, recipients: List[Dict[str, Any]], subject: str, html_content: str,
+                      plain_content: str = None) -> Dict[str, Any]:
+        message = Mail(
+            from_email=Email(FROM_EMAIL, FROM_NAME),
+            subject=subject,
+            html_content=Content("text/html", html_content)
+        )
+        if plain_content:
+            message.add_content(Content("text/plain", plain_content))
+
+        for recipient in recipients:
+            personalization = Personalization()
+            personalization.add_to(To(recipient["email"]))
+            for token, value in recipient.get("substitutions", {}).items():
+                personalization.add_substitution(Substitution(token, str(value)))
+            if recipient.get("subject"):
+                personalization.subject = recipient["subject"]
+            message.add_personalization(personalization)
+        return message.get()
+
+    def _chunks(self, recipients: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        return [
+            recipients[start:start + SENDGRID_MAX_PERSONALIZATIONS]
+            for start in range(0, len(recipients), SENDGRID_MAX_PERSONALIZATIONS)
+        ]
+
+    def build_bulk_payloads(self, recipients: List[Dict[str, Any]], subject: str, html_content: str,
+                            plain_content: str = None) -> List[Tuple[Dict[str, Any], int]]:
+        """
+        Build SendGrid requests for one message sent to many recipients.
+
+        Args:
+            recipients: {"email", "substitutions": {"-token-": value}, "subject" (optional)};
+                other keys are ignored and can carry the caller's own data
+            subject, html_content, plain_content: Shared content; tokens such as
+                -product_name- are replaced per recipient by SendGrid
+
+        Returns:
+            (request payload, recipient count) per chunk of up to 1000 recipients
+        """
+        return [
+            (self._bulk_payload(chunk, subject, html_content, plain_content), len(chunk))
+            for chunk in self._chunks(recipients)
+        ]
+
+    def _chunk_outcome(self, chunk: List[Dict[str, Any]], status: Optional[int]) -> Optional[BulkSendResult]:
+        """Result of a chunk's request, or None when it was rejected and should be split"""
+        if status in SENDGRID_ACCEPTED:
+            return BulkSendResult(len(chunk), [])
+        if status is None or status in SENDGRID_RETRYABLE:
+            return BulkSendResult(0, chunk)
+        if len(chunk) == 1:
+            logger.error(f"❌ SendGrid rejected email to {chunk[0]['email']}")
+            return BulkSendResult(0, [])
+        return None
+
+    def _send_chunk(self, chunk: List[Dict[str, Any]], subject: str, html_content: str,
+                    plain_content: str = None) -> BulkSendResult:
+        """
+        Send one chunk. SendGrid rejects the whole request (400) for a single
+        invalid address, so a rejected chunk is split in half and retried
+        until the bad recipients are isolated.
+        """
+        try:
+            status = self._post(self._bulk_payload(chunk, subject, html_content, plain_content))
+        except Exception as e:
+            logger.error(f"❌ SendGrid error: {str(e)}")
+            status = None
+
+        outcome = self._chunk_outcome(chunk, status)
+        if outcome is not None:
+            return outcome
+        middle = len(chunk) // 2
+        first = self._send_chunk(chunk[:middle], subject, html_content, plain_content)
+        second = self._send_chunk(chunk[middle:], subject, html_content, plain_content)
+        return BulkSendResult(first.sent + second.sent, first.retry + second.retry)
+
+    async def _send_chunk_async(self, chunk: List[Dict[str, Any]], subject: str, html_content: str,
+                                plain_content: str = None) -> BulkSendResult:
+        try:
+            status = await self._post_async(self._bulk_payload(chunk, subject, html_content, plain_content))
+        except Exception as e:
+            logger.error(f"❌ SendGrid error: {str(e)}")
+            status = None
+
+        outcome = self._chunk_outcome(chunk, status)
+        if outcome is not None:
+            return outcome
+        middle = len(chunk) // 2
+        first, second = await asyncio.gather(
+            self._send_chunk_async(chunk[:middle], subject, html_content, plain_content),
+            self._send_chunk_async(chunk[middle:], subject, html_content, plain_content)
+        )
+        return BulkSendResult(first.sent + second.sent, first.retry + second.retry)
+
+    def send_bulk(self, recipients: List[Dict[str, Any]], subject: str, html_content: str,
+                  plain_content: str = None) -> BulkSendResult:
+        """
+        Send one message to many recipients, up to 1000 per API request
+
+        Returns:
+            BulkSendResult: recipients sent, and those to retry later
+        """
+        if not self.enabled:
+            logger.warning("SendGrid not configured, logging email instead")
+            logger.info(f"BULK EMAIL TO: {len(recipients)} recipients")
+            logger.info(f"SUBJECT: {subject}")
+            return BulkSendResult(len(recipients), [])
+
+        sent, retry = 0, []
+        for chunk in self._chunks(recipients):
+            result = self._send_chunk(chunk, subject, html_content, plain_content)
+            sent += result.sent
+            retry += result.retry
+        logger.info(f"✅ Bulk email sent to {sent}/{len(recipients)} recipients: {subject}")
+        return BulkSendResult(sent, retry)
+
+    async def send_bulk_async(self, recipients: List[Dict[str, Any]], subject: str, html_content: str,
+                              plain_content: str = None) -> BulkSendResult:
+        """Async send_bulk; chunks are posted concurrently"""
+        if not self.enabled:
+            return self.send_bulk(recipients, subject, html_content, plain_content)
+
+        results = await asyncio.gather(*[
+            self._send_chunk_async(chunk, subject, html_content, plain_content)
+            for chunk in self._chunks(recipients)
+        ])
+        sent = sum(result.sent for result in results)
+        retry = [recipient for result in results for recipient in result.retry]
+        logger.info(f"✅ Bulk email sent to {sent}/{len(recipients)} recipients: {subject}")
+        return BulkSendResult(sent, retry)
+
     # ========================================
     # WELCOME & ONBOARDING EMAILS
     # ========================================
@@ -75,64 +277,8 @@ class EmailService:
     def send_welcome_email(self, user_email: str, user_name: str = None):
         """Send welcome email after signup"""
 
-        subject = "Welcome to PriceWatch AI! 🚀"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: 'Helvetica Neue', Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-                .cta-button {{ background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0; }}
-                .footer {{ text-align: center; color: #888; font-size: 12px; margin-top: 30px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Welcome to PriceWatch AI!</h1>
-                    <p>Your competitive intelligence starts now</p>
-                </div>
-                <div class="content">
-                    <p>Hi{f' {user_name}' if user_name else ''},</p>
-
-                    <p>Thank you for joining PriceWatch AI! We're excited to help you stay ahead of the competition.</p>
-
-                    <h3>🚀 Get Started in 3 Steps:</h3>
-                    <ol>
-                        <li><strong>Add your first product</strong> - Paste a competitor's product URL</li>
-                        <li><strong>Set up alerts</strong> - Get notified when prices change</li>
-                        <li><strong>Track trends</strong> - Watch your dashboard for insights</li>
-                    </ol>
-
-                    <a href="https://app.pricewatch-ai.com/dashboard" class="cta-button">Go to Dashboard</a>
-
-                    <h3>📊 What's Included:</h3>
-                    <ul>
-                        <li>✅ Automated daily price checks</li>
-                        <li>✅ Real-time email alerts</li>
-                        <li>✅ Historical price charts</li>
-                        <li>✅ Weekly intelligence reports</li>
-                    </ul>
-
-                    <p><strong>Need help?</strong> Reply to this email or check out our <a href="https://pricewatch-ai.com/docs">documentation</a>.</p>
-
-                    <p>Happy tracking!</p>
-                    <p><strong>The PriceWatch AI Team</strong></p>
-                </div>
-                <div class="footer">
-                    <p>PriceWatch AI | Automated E-commerce Intelligence</p>
-                    <p><a href="https://pricewatch-ai.com/unsubscribe">Unsubscribe</a></p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        return self.send_email(user_email, subject, html_content)
+        email = render_email("welcome", user_name=user_name)
+        return self.send_email(user_email, email.subject, email.html, email.text)
 
     # ========================================
     # PRICE ALERT EMAILS
@@ -142,106 +288,112 @@ class EmailService:
                               old_price: float, new_price: float, percent_change: float):
         """Send alert when competitor price drops"""
 
-        subject = f"🔥 Price Drop Alert: {product_name} is now ${new_price:.2f}"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .alert-box {{ background: #fff3cd; border-left: 5px solid #ffc107; padding: 20px; margin: 20px 0; }}
-                .price-old {{ text-decoration: line-through; color: #888; }}
-                .price-new {{ color: #28a745; font-size: 24px; font-weight: bold; }}
-                .savings {{ background: #28a745; color: white; padding: 10px; border-radius: 5px; display: inline-block; margin: 10px 0; }}
-                .cta-button {{ background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>🔥 Price Drop Alert!</h2>
-
-                <div class="alert-box">
-                    <h3>{product_name}</h3>
-                    <p>
-                        <span class="price-old">${old_price:.2f}</span> →
-                        <span class="price-new">${new_price:.2f}</span>
-                    </p>
-                    <div class="savings">
-                        Save {percent_change:.1f}% (${old_price - new_price:.2f})
-                    </div>
-                </div>
-
-                <p><strong>What should you do?</strong></p>
-                <ul>
-                    <li>Consider matching or beating this price</li>
-                    <li>Review your profit margins</li>
-                    <li>Check if this is a temporary promotion</li>
-                </ul>
-
-                <a href="{product_url}" class="cta-button">View Product</a>
-
-                <p style="color: #888; font-size: 12px;">
-                    This alert was triggered because you're tracking this product. <a href="https://app.pricewatch-ai.com/alerts">Manage alerts</a>
-                </p>
-            </div>
-        </body>
-        </html>
-        """
+        email = self._price_drop_content(
+            product_name, product_url, f"{old_price:.2f}", f"{new_price:.2f}",
+            f"{percent_change:.1f}", f"{old_price - new_price:.2f}"
+        )
+        return self.send_email(user_email, email.subject, email.html, email.text)
+
+    def _price_drop_content(self, product_name: str, product_url: str, old_price: str, new_price: str,
+                            percent_change: str, savings: str) -> RenderedEmail:
+        """Price drop alert from preformatted values (or substitution tokens)"""
 
-        return self.send_email(user_email, subject, html_content)
+        return render_email(
+            "price_drop", product_name=product_name, product_url=product_url, old_price=old_price,
+            new_price=new_price, percent_change=percent_change, savings=savings
+        )
 
     def send_price_increase_alert(self, user_email: str, product_name: str, product_url: str,
                                   old_price: float, new_price: float, percent_change: float):
         """Send alert when competitor price increases"""
 
-        subject = f"📈 Price Increase: {product_name} now ${new_price:.2f}"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .alert-box {{ background: #d1ecf1; border-left: 5px solid #17a2b8; padding: 20px; margin: 20px 0; }}
-                .price-old {{ color: #888; }}
-                .price-new {{ color: #dc3545; font-size: 24px; font-weight: bold; }}
-                .opportunity {{ background: #17a2b8; color: white; padding: 10px; border-radius: 5px; display: inline-block; margin: 10px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>📈 Competitor Price Increased!</h2>
-
-                <div class="alert-box">
-                    <h3>{product_name}</h3>
-                    <p>
-                        <span class="price-old">${old_price:.2f}</span> →
-                        <span class="price-new">${new_price:.2f}</span>
-                    </p>
-                    <div class="opportunity">
-                        Opportunity: {percent_change:.1f}% increase
-                    </div>
-                </div>
-
-                <p><strong>This could be your chance to:</strong></p>
-                <ul>
-                    <li>Maintain your current price and gain competitive advantage</li>
-                    <li>Slightly increase your price while staying competitive</li>
-                    <li>Capture more market share at your current pricing</li>
-                </ul>
-
-                <p style="color: #888; font-size: 12px;">
-                    <a href="https://app.pricewatch-ai.com/alerts">Manage alerts</a>
-                </p>
-            </div>
-        </body>
-        </html>
+        email = self._price_increase_content(
+            product_name, product_url, f"{old_price:.2f}", f"{new_price:.2f}", f"{percent_change:.1f}"
+        )
+        return self.send_email(user_email, email.subject, email.html, email.text)
+
+    def _price_increase_content(self, product_name: str, product_url: str, old_price: str, new_price: str,
+                                percent_change: str) -> RenderedEmail:
+        """Price increase alert from preformatted values (or substitution tokens)"""
+
+        return render_email(
+            "price_increase", product_name=product_name, product_url=product_url, old_price=old_price,
+            new_price=new_price, percent_change=percent_change
+        )
+
+    def send_price_alerts_bulk(self, alerts: List[Dict[str, Any]]) -> BulkSendResult:
         """
+        Send many alert emails with one request per 1000 recipients per alert
+        type: every alert of a type shares one tokenized message.
+
+        Args:
+            alerts: {"email", "alert_type", "product_name", "product_url", "old_price",
+                     "new_price", "threshold", "old_in_stock", "new_in_stock"}
 
-        return self.send_email(user_email, subject, html_content)
+        Returns:
+            BulkSendResult: alerts sent, and the alerts to retry later
+        """
+        by_template: Dict[str, List[Dict[str, Any]]] = {}
+        for alert in alerts:
+            template = self._alert_template(alert)
+            if template is None:
+                continue
+            by_template.setdefault(template, []).append({
+                "email": alert["email"],
+                "substitutions": self._alert_substitutions(alert),
+                "alert": alert
+            })
+
+        sent, retry = 0, []
+        for template, recipients in by_template.items():
+            result = self.send_bulk(recipients, *self._alert_content(template))
+            sent += result.sent
+            retry += [recipient["alert"] for recipient in result.retry]
+        return BulkSendResult(sent, retry)
+
+    def _alert_template(self, alert: Dict[str, Any]) -> Optional[str]:
+        """Template for an alert from its type; None when there is nothing to report"""
+        alert_type = alert.get("alert_type")
+        old_price, new_price = alert.get("old_price"), alert.get("new_price")
+        if alert_type == "stock_change":
+            return "stock_change" if alert.get("new_in_stock") is not None else None
+        if not old_price or new_price is None or old_price == new_price:
+            return None
+        if alert_type == "threshold":
+            return "price_threshold"
+        if alert_type in ("price_drop", "price_increase"):
+            return alert_type
+        # Untyped alerts: pick by direction
+        return "price_drop" if new_price < old_price else "price_increase"
+
+    def _alert_substitutions(self, alert: Dict[str, Any]) -> Dict[str, str]:
+        old_price, new_price = alert.get("old_price"), alert.get("new_price")
+        product_name = alert.get("product_name") or "Unnamed Product"
+        product_url = alert.get("product_url") or ""
+        substitutions = {
+            "-product_name-": product_name,
+            "-product_url-": product_url,
+            "-product_name_html-": str(escape(product_name)),
+            "-product_url_html-": str(escape(product_url)),
+            "-stock_status-": "back in stock" if alert.get("new_in_stock") else "out of stock",
+            "-threshold-": f"{alert['threshold']:.2f}" if alert.get("threshold") is not None else ""
+        }
+        if old_price and new_price is not None:
+            substitutions.update({
+                "-old_price-": f"{old_price:.2f}",
+                "-new_price-": f"{new_price:.2f}",
+                "-percent_change-": f"{abs(new_price - old_price) / old_price * 100:.1f}",
+                "-savings-": f"{old_price - new_price:.2f}"
+            })
+        return substitutions
+
+    def _alert_content(self, template: str) -> RenderedEmail:
+        """
+        Shared tokenized message for one alert template. Scraped names and
+        URLs are untrusted, so the HTML part uses tokens whose substitutions
+        are HTML-escaped; the subject and text part use the raw values.
+        """
+        return render_email(template, html_context=ALERT_HTML_TOKENS, **ALERT_TOKENS)
 
     # ========================================
     # WEEKLY REPORT EMAIL
@@ -250,73 +402,47 @@ class EmailService:
     def send_weekly_report(self, user_email: str, report_data: Dict[str, Any]):
         """Send weekly price intelligence report"""
 
-        subject = f"📊 Your Weekly Price Intelligence Report - {datetime.now().strftime('%b %d, %Y')}"
-
-        products_tracked = report_data.get("products_tracked", 0)
-        price_changes = report_data.get("price_changes", 0)
-        avg_competitor_price = report_data.get("avg_competitor_price", 0)
-        top_opportunities = report_data.get("top_opportunities", [])
-
-        opportunities_html = ""
-        for opp in top_opportunities[:5]:
-            opportunities_html += f"""
-            <li>
-                <strong>{opp['name']}</strong><br>
-                Price dropped {opp['percent_drop']:.1f}% to ${opp['new_price']:.2f}
-            </li>
-            """
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .stats-grid {{ display: grid; grid-template-columns: repeat(3, 1fr); gap: 15px; margin: 20px 0; }}
-                .stat-card {{ background: #f8f9fa; padding: 15px; border-radius: 8px; text-align: center; }}
-                .stat-number {{ font-size: 32px; font-weight: bold; color: #667eea; }}
-                .stat-label {{ color: #888; font-size: 14px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>📊 Your Weekly Price Intelligence Report</h2>
-                <p style="color: #888;">{datetime.now().strftime('%B %d, %Y')}</p>
-
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <div class="stat-number">{products_tracked}</div>
-                        <div class="stat-label">Products Tracked</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-number">{price_changes}</div>
-                        <div class="stat-label">Price Changes</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-number">${avg_competitor_price:.2f}</div>
-                        <div class="stat-label">Avg. Price</div>
-                    </div>
-                </div>
-
-                <h3>🎯 Top Opportunities This Week</h3>
-                <ul>
-                    {opportunities_html or '<li>No significant price changes this week</li>'}
-                </ul>
-
-                <a href="https://app.pricewatch-ai.com/dashboard" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0;">
-                    View Full Report
-                </a>
-
-                <p style="color: #888; font-size: 12px;">
-                    Sent every Monday | <a href="https://app.pricewatch-ai.com/settings">Manage preferences</a>
-                </p>
-            </div>
-        </body>
-        </html>
+        email = self._weekly_report_content(**self._weekly_report_values(report_data))
+        return self.send_email(user_email, email.subject, email.html, email.text)
+
+    def send_weekly_reports_bulk(self, reports: List[Tuple[str, Dict[str, Any]]]) -> int:
         """
+        Send Monday's reports with one request per 1000 users; each user's
+        numbers and opportunity list are substitutions into a shared message.
 
-        return self.send_email(user_email, subject, html_content)
+        Returns:
+            int: Number of reports sent
+        """
+        tokens = {key: f"-{key}-" for key in ("products_tracked", "price_changes", "avg_competitor_price",
+                                               "opportunities_html", "opportunities_text")}
+        recipients = [
+            {
+                "email": user_email,
+                "substitutions": {tokens[key]: value for key, value in self._weekly_report_values(data).items()}
+            }
+            for user_email, data in reports
+        ]
+        return self.send_bulk(recipients, *self._weekly_report_content(**tokens)).sent
+
+    def _weekly_report_values(self, report_data: Dict[str, Any]) -> Dict[str, str]:
+        opportunities = render_fragment("opportunities", opportunities=report_data.get("top_opportunities", []))
+        return {
+            "products_tracked": str(report_data.get("products_tracked", 0)),
+            "price_changes": str(report_data.get("price_changes", 0)),
+            "avg_competitor_price": f"{report_data.get('avg_competitor_price', 0):.2f}",
+            "opportunities_html": opportunities.html,
+            "opportunities_text": opportunities.text
+        }
+
+    def _weekly_report_content(self, products_tracked: str, price_changes: str, avg_competitor_price: str,
+                               opportunities_html: str, opportunities_text: str) -> RenderedEmail:
+        """Weekly report from preformatted values (or substitution tokens)"""
+
+        return render_email(
+            "weekly_report", report_date=datetime.now(), products_tracked=products_tracked,
+            price_changes=price_changes, avg_competitor_price=avg_competitor_price,
+            opportunities_html=opportunities_html, opportunities_text=opportunities_text
+        )
 
     # ========================================
     # BILLING & SUBSCRIPTION EMAILS
@@ -325,82 +451,14 @@ class EmailService:
     def send_payment_failed_email(self, user_email: str, amount: float, retry_date: str):
         """Send notification when payment fails"""
 
-        subject = "Payment Failed - Action Required"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .warning-box {{ background: #f8d7da; border-left: 5px solid #dc3545; padding: 20px; margin: 20px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>⚠️ Payment Failed</h2>
-
-                <div class="warning-box">
-                    <p><strong>We couldn't process your payment of ${amount:.2f}</strong></p>
-                    <p>Your subscription will remain active until {retry_date}, after which it will be paused.</p>
-                </div>
-
-                <p><strong>What to do:</strong></p>
-                <ol>
-                    <li>Update your payment method in your account settings</li>
-                    <li>Ensure you have sufficient funds</li>
-                    <li>Contact your bank if issues persist</li>
-                </ol>
-
-                <a href="https://app.pricewatch-ai.com/billing" style="background: #dc3545; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0;">
-                    Update Payment Method
-                </a>
-
-                <p>Need help? Reply to this email and we'll assist you.</p>
-            </div>
-        </body>
-        </html>
-        """
-
-        return self.send_email(user_email, subject, html_content)
+        email = render_email("payment_failed", amount=amount, retry_date=retry_date)
+        return self.send_email(user_email, email.subject, email.html, email.text)
 
     def send_subscription_cancelled_email(self, user_email: str):
         """Send confirmation when user cancels subscription"""
 
-        subject = "Subscription Cancelled - We're Sorry to See You Go"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Subscription Cancelled</h2>
-
-                <p>Your subscription has been cancelled. You'll continue to have access until the end of your billing period.</p>
-
-                <p><strong>We'd love your feedback:</strong></p>
-                <p>What made you decide to cancel? Your input helps us improve.</p>
-
-                <a href="https://pricewatch-ai.com/feedback" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0;">
-                    Share Feedback
-                </a>
-
-                <p>You can always re-activate your account anytime.</p>
-
-                <p>Thanks for using PriceWatch AI!</p>
-            </div>
-        </body>
-        </html>
-        """
-
-        return self.send_email(user_email, subject, html_content)
+        email = render_email("subscription_cancelled")
+        return self.send_email(user_email, email.subject, email.html, email.text)
 
     # ========================================
     # RE-ENGAGEMENT EMAILS
@@ -409,41 +467,8 @@ class EmailService:
     def send_inactive_user_email(self, user_email: str, days_inactive: int):
         """Send re-engagement email to inactive users"""
 
-        subject = f"We Miss You! Come Back to PriceWatch AI"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>👋 We Miss You!</h2>
-
-                <p>It's been {days_inactive} days since you last checked your PriceWatch AI dashboard.</p>
-
-                <p><strong>Here's what you might be missing:</strong></p>
-                <ul>
-                    <li>Competitor price changes in your market</li>
-                    <li>Opportunities to optimize your pricing</li>
-                    <li>Insights that could increase your profit margins</li>
-                </ul>
-
-                <a href="https://app.pricewatch-ai.com/dashboard" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0;">
-                    Check Your Dashboard
-                </a>
-
-                <p>Need help getting started? We're here to assist!</p>
-            </div>
-        </body>
-        </html>
-        """
-
-        return self.send_email(user_email, subject, html_content)
+        email = render_email("inactive_user", days_inactive=days_inactive)
+        return self.send_email(user_email, email.subject, email.html, email.text)
 
 
 # Singleton instance
@@ -0,0 +1,142 @@
+"""
+PriceWatch AI - Email Templates
+Jinja2 email templates compiled once per process, with timed HTML and plain-text rendering
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Optional, Dict, Any, NamedTuple
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, StrictUndefined, select_autoescape
+from markupsafe import Markup
+import logging
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "email")
+# Compiled template bytecode is shared by every worker process on the host,
+# so only the first process to start parses the template sources
+EMAIL_TEMPLATE_CACHE_DIR = os.getenv(
+    "EMAIL_TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pricewatch-email-templates")
+)
+
+# Render timings are summarized at INFO level at most this often per process
+EMAIL_RENDER_STATS_LOG_INTERVAL = int(os.getenv("EMAIL_RENDER_STATS_LOG_INTERVAL", "300"))
+
+# Subjects are short strings, compiled alongside the bodies
+SUBJECTS = {
+    "welcome": "Welcome to PriceWatch AI! 🚀",
+    "price_drop": "🔥 Price Drop Alert: {{ product_name }} is now ${{ new_price }}",
+    "price_increase": "📈 Price Increase: {{ product_name }} now ${{ new_price }}",
+    "price_threshold": "🎯 Price Target Reached: {{ product_name }} is now ${{ new_price }}",
+    "stock_change": "📦 {{ product_name }} is {{ stock_status }}",
+    "weekly_report": "📊 Your Weekly Price Intelligence Report - {{ report_date.strftime('%b %d, %Y') }}",
+    "payment_failed": "Payment Failed - Action Required",
+    "subscription_cancelled": "Subscription Cancelled - We're Sorry to See You Go",
+    "inactive_user": "We Miss You! Come Back to PriceWatch AI",
+}
+
+# Fragments without variables, rendered once and inserted as-is
+STATIC_FRAGMENTS = ["styles", "footer"]
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    html: str
+    text: str
+
+
+def _bytecode_cache():
+    try:
+        os.makedirs(EMAIL_TEMPLATE_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"⚠️ Email template cache disabled: {str(e)}")
+        return None
+    return FileSystemBytecodeCache(EMAIL_TEMPLATE_CACHE_DIR)
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+    bytecode_cache=_bytecode_cache(),
+    undefined=StrictUndefined,
+    auto_reload=False,  # Templates ship with the code; skip the mtime check on every get_template
+    keep_trailing_newline=True,
+)
+
+env.globals["fragments"] = {
+    name: Markup(env.get_template(f"fragments/{name}.html").render()) for name in STATIC_FRAGMENTS
+}
+
+# (subject, html, text) per email, compiled at import
+TEMPLATES = {
+    name: (env.from_string(subject), env.get_template(f"{name}.html"), env.get_template(f"{name}.txt"))
+    for name, subject in SUBJECTS.items()
+}
+
+_render_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {"renders": 0, "total_ms": 0.0, "max_ms": 0.0})
+_render_stats_lock = threading.Lock()  # Tasks render from many worker threads
+_render_stats_logged_at = time.monotonic()
+
+
+def render_email(name: str, html_context: Optional[Dict[str, Any]] = None, **context: Any) -> RenderedEmail:
+    """
+    Render an email's subject, HTML and plain-text parts from one context.
+
+    Values may also be SendGrid substitution tokens (e.g. "-product_name-")
+    when rendering a shared message for bulk sends. `html_context` overrides
+    values for the HTML part only, so it can use tokens whose substitutions
+    are HTML-escaped.
+    """
+    subject, html, text = TEMPLATES[name]
+
+    started = time.perf_counter()
+    rendered = RenderedEmail(
+        subject.render(context).strip(),
+        html.render({**context, **html_context} if html_context else context),
+        text.render(context)
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    _record_render(name, elapsed_ms)
+    logger.debug(f"Rendered email template {name} in {elapsed_ms:.2f}ms")
+    return rendered
+
+
+def _record_render(name: str, elapsed_ms: float):
+    global _render_stats_logged_at
+
+    with _render_stats_lock:
+        stats = _render_stats[name]
+        stats["renders"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+        now = time.monotonic()
+        if now - _render_stats_logged_at < EMAIL_RENDER_STATS_LOG_INTERVAL:
+            return
+        _render_stats_logged_at = now
+        summary = ", ".join(
+            f"{template} {stats['renders']}x avg {stats['total_ms'] / stats['renders']:.2f}ms "
+            f"max {stats['max_ms']:.2f}ms"
+            for template, stats in sorted(_render_stats.items())
+        )
+    logger.info(f"Email render times: {summary}")
+
+
+def render_fragment(name: str, **context: Any) -> RenderedEmail:
+    """Render a fragment pair (fragments/<name>.html and .txt) for embedding in an email"""
+    html = env.get_template(f"fragments/{name}.html").render(context)
+    text = env.get_template(f"fragments/{name}.txt").render(context)
+    return RenderedEmail("", Markup(html), text.rstrip())
+
+
+def render_stats() -> Dict[str, Dict[str, float]]:
+    """Render count, total, average and slowest render time (ms) per template since startup"""
+    with _render_stats_lock:
+        return {
+            name: {**stats, "avg_ms": stats["total_ms"] / stats["renders"]}
+            for name, stats in _render_stats.items()
+        }
@@ -0,0 +1,135 @@
+"""
+PriceWatch AI - Price History Export
+Stream PriceHistory rows out of a server-side cursor as NDJSON, CSV or Arrow IPC
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Optional, List, Dict, Any, AsyncIterator
+from sqlalchemy import select, func
+from database import SessionLocal
+from models import PriceHistory
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FETCH_SIZE = 5000  # Rows pulled from the cursor per round-trip
+ARROW_BATCH_SIZE = 10000  # Rows per Arrow record batch
+
+# last_seen closes each row's run when history is written in change-only mode
+EXPORT_COLUMNS = ["product_id", "timestamp", "last_seen", "price", "currency", "in_stock", "source"]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def history_query(product_ids: List[str], start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """PriceHistory rows for the given products, in (product_id, timestamp) index order"""
+    query = (
+        select(*[getattr(PriceHistory, column) for column in EXPORT_COLUMNS])
+        .where(PriceHistory.product_id.in_(product_ids))
+        .order_by(PriceHistory.product_id, PriceHistory.timestamp)
+    )
+    if start:
+        # Include runs that began earlier but were still current at `start`
+        query = query.where(func.coalesce(PriceHistory.last_seen, PriceHistory.timestamp) >= start)
+    if end:
+        query = query.where(PriceHistory.timestamp < end)
+    return query
+
+
+async def iter_history_rows(product_ids: List[str], start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield history rows one at a time from a server-side cursor.
+
+    Opens its own session: a StreamingResponse body runs after the
+    request's dependencies have been cleaned up.
+    """
+    async with SessionLocal() as session:
+        result = await session.stream(
+            history_query(product_ids, start, end).execution_options(yield_per=EXPORT_FETCH_SIZE)
+        )
+        async for row in result:
+            yield row._asdict()
+
+
+def _ndjson_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def stream_ndjson(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield (json.dumps({key: _ndjson_value(value) for key, value in row.items()}) + "\n").encode()
+
+
+async def stream_csv(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow({key: _ndjson_value(value) for key, value in row.items()})
+        # Flush roughly every 64 KB rather than once per row
+        if buffer.tell() > 65536:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+async def stream_arrow(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Arrow IPC stream, one record batch per ARROW_BATCH_SIZE rows"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("product_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("last_seen", pa.timestamp("us")),
+        ("price", pa.float64()),
+        ("currency", pa.string()),
+        ("in_stock", pa.bool_()),
+        ("source", pa.string()),
+    ])
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    columns: Dict[str, List[Any]] = {column: [] for column in EXPORT_COLUMNS}
+    count = 0
+    async for row in rows:
+        for column in EXPORT_COLUMNS:
+            columns[column].append(row[column])
+        count += 1
+        if count >= ARROW_BATCH_SIZE:
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            columns = {column: [] for column in EXPORT_COLUMNS}
+            count = 0
+            yield drain()
+
+    if count:
+        writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+    writer.close()
+    yield drain()
+
+
+EXPORT_ENCODERS = {
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+    "arrow": stream_arrow,
+}
+
+
+def export_history(product_ids: List[str], format: str = "ndjson", start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> AsyncIterator[bytes]:
+    """Encoded byte chunks of the matching price history, for a StreamingResponse"""
+    return EXPORT_ENCODERS[format](iter_history_rows(product_ids, start, end))
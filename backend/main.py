@@ -3,16 +3,32 @@ PriceWatch AI - Main FastAPI Application
 Automated E-commerce Price Intelligence Platform
 """
 
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, HttpUrl, EmailStr
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from pydantic import BaseModel, HttpUrl, EmailStr, Field
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
 import os
+import json
+import base64
 import hashlib
 import secrets
 from enum import Enum
+from sqlalchemy import select, update, delete, func, tuple_, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, get_session, init_db, expand_runs
+from auth import hash_api_key, key_cache, key_usage
+from models import User, APIKey, Product, PriceHistory, Alert, Notification, Webhook, PlanTier, AlertType
+from due_scheduler import get_due_scheduler
+from canonical_url import canonicalize_url
+from export import export_history, EXPORT_MEDIA_TYPES
+from rollups import get_rollups, pick_resolution
+from stats_cache import stats_cache
+from alerts import alert_index
 
 # Initialize FastAPI
 app = FastAPI(
@@ -37,22 +53,12 @@ security = HTTPBearer()
 # DATA MODELS
 # ========================================
 
-class PlanTier(str, Enum):
-    STARTER = "starter"
-    PROFESSIONAL = "professional"
-    BUSINESS = "business"
-    ENTERPRISE = "enterprise"
+# PlanTier and AlertType are shared with the database models
 
 class UserRole(str, Enum):
     USER = "user"
     ADMIN = "admin"
 
-class AlertType(str, Enum):
-    PRICE_DROP = "price_drop"
-    PRICE_INCREASE = "price_increase"
-    THRESHOLD = "threshold"
-    STOCK_CHANGE = "stock_change"
-
 # Request Models
 class UserSignup(BaseModel):
     email: EmailStr
@@ -72,13 +78,18 @@ class ProductAdd(BaseModel):
 class AlertConfig(BaseModel):
     product_id: str
     alert_type: AlertType
-    threshold: Optional[float] = None
+    # THRESHOLD: price at or below which the alert fires.
+    # PRICE_DROP/PRICE_INCREASE: minimum change in percent (e.g. 10 = 10%); omit to fire on any change
+    threshold: Optional[float] = Field(None, ge=0)
     enabled: bool = True
 
 class WebhookConfig(BaseModel):
     url: HttpUrl
     events: List[str]
     enabled: bool = True
+    # Opt-in batching: deliver events as one JSON array every N seconds (or sooner at batch_max_events)
+    batch_window_seconds: Optional[int] = Field(None, ge=1, le=3600)
+    batch_max_events: int = Field(100, ge=1, le=1000)
 
 # Response Models
 class ProductResponse(BaseModel):
@@ -90,6 +101,10 @@ class ProductResponse(BaseModel):
     price_history: List[Dict[str, Any]]
     competitor_name: Optional[str]
 
+class ProductPage(BaseModel):
+    products: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+
 class DashboardStats(BaseModel):
     total_products: int
     active_alerts: int
@@ -108,15 +123,16 @@ class UserProfile(BaseModel):
     subscription_status: str
 
 # ========================================
-# IN-MEMORY DATABASE (Will migrate to PostgreSQL)
+# PLAN CONFIGURATION
 # ========================================
 
-# Temporary storage - will be replaced with PostgreSQL
-USERS_DB = {}
-PRODUCTS_DB = {}
-PRICES_DB = {}
-ALERTS_DB = {}
-API_KEYS = {}
+# Product listing
+PRODUCT_FIELDS = {"id", "url", "name", "current_price", "currency", "in_stock",
+                  "last_checked", "competitor_name", "price_history"}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_HISTORY_LIMIT = 30
+MAX_HISTORY_LIMIT = 1000
 
 # Plan limits
 PLAN_LIMITS = {
@@ -134,6 +150,11 @@ def hash_password(password: str) -> str:
     """Hash password using SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+LOGIN_KEY_NAME = "Login Key"  # Issued on every login; other named keys are left alone
+# Login keys unused for this long are retired at the user's next login, so
+# each device keeps its own key without keys piling up forever
+LOGIN_KEY_MAX_IDLE_DAYS = int(os.getenv("LOGIN_KEY_MAX_IDLE_DAYS", "30"))
+
 def generate_api_key() -> str:
     """Generate secure API key"""
     return f"pk_{''.join(secrets.token_urlsafe(32))}"
@@ -146,149 +167,195 @@ def generate_product_id() -> str:
     """Generate unique product ID"""
     return f"prod_{secrets.token_urlsafe(16)}"
 
-def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+async def create_api_key(session: AsyncSession, user_id: str, name: str = "Default Key") -> Tuple[str, str]:
+    """Store a new key for the user; returns (key_id, plaintext key shown once)"""
+    api_key = generate_api_key()
+    key_id = f"key_{secrets.token_urlsafe(16)}"
+    session.add(APIKey(
+        id=key_id,
+        user_id=user_id,
+        key_hash=hash_api_key(api_key),
+        name=name
+    ))
+    return key_id, api_key
+
+async def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security),
+                         session: AsyncSession = Depends(get_session)) -> str:
     """Verify API key and return user_id"""
-    api_key = credentials.credentials
-    if api_key not in API_KEYS:
+    key_hash = hash_api_key(credentials.credentials)
+
+    # In-process LRU, then the shared Redis cache; the database only on a miss
+    hit, entry = await key_cache.get(key_hash)
+    if not hit:
+        # Unique index on key_hash: a single index probe regardless of user count
+        key = (await session.execute(
+            select(APIKey.id, APIKey.user_id, APIKey.is_active, User.plan, User.is_active.label("user_active"))
+            .join(User)
+            .where(APIKey.key_hash == key_hash)
+        )).first()
+        if key:
+            entry = {
+                "key_id": key.id,
+                "user_id": key.user_id,
+                "plan": key.plan.value,
+                "active": bool(key.is_active and key.user_active)
+            }
+            await key_cache.set(key_hash, entry)
+        else:
+            key_cache.set_invalid(key_hash)
+
+    if not entry or not entry["active"]:
         raise HTTPException(status_code=401, detail="Invalid API key")
-    return API_KEYS[api_key]
+
+    # last_used is written back in batches, not on every request
+    key_usage.touch(entry["key_id"])
+    return entry["user_id"]
+
+async def get_user_or_404(session: AsyncSession, user_id: str) -> User:
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+async def count_user_products(session: AsyncSession, user_id: str) -> int:
+    return await session.scalar(
+        select(func.count()).select_from(Product).where(Product.user_id == user_id)
+    )
 
 # ========================================
 # AUTHENTICATION ENDPOINTS
 # ========================================
 
 @app.post("/api/auth/signup")
-async def signup(user: UserSignup):
+async def signup(user: UserSignup, session: AsyncSession = Depends(get_session)):
     """User registration endpoint"""
 
-    # Check if user exists
-    if user.email in [u["email"] for u in USERS_DB.values()]:
+    # Check if user exists (unique index on users.email)
+    existing = await session.scalar(select(User.id).where(User.email == user.email))
+    if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Create user
     user_id = generate_user_id()
-    api_key = generate_api_key()
-
-    USERS_DB[user_id] = {
-        "id": user_id,
-        "email": user.email,
-        "password": hash_password(user.password),
-        "plan": user.plan,
-        "created_at": datetime.now(),
-        "subscription_status": "trial",  # Will integrate Stripe
-        "products_tracked": 0
-    }
-
-    API_KEYS[api_key] = user_id
+    session.add(User(
+        id=user_id,
+        email=user.email,
+        password_hash=hash_password(user.password),
+        plan=user.plan
+    ))
+    key_id, api_key = await create_api_key(session, user_id)
+
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same email
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
 
     return {
         "success": True,
         "user_id": user_id,
         "api_key": api_key,
+        "key_id": key_id,
         "message": "Account created successfully"
     }
 
 @app.post("/api/auth/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, session: AsyncSession = Depends(get_session)):
     """User login endpoint"""
 
-    # Find user
-    user = None
-    for u in USERS_DB.values():
-        if u["email"] == credentials.email and u["password"] == hash_password(credentials.password):
-            user = u
-            break
-
-    if not user:
+    # Find user (unique index on users.email)
+    user = await session.scalar(select(User).where(User.email == credentials.email))
+    if not user or user.password_hash != hash_password(credentials.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    # Find or create API key
-    api_key = None
-    for key, uid in API_KEYS.items():
-        if uid == user["id"]:
-            api_key = key
-            break
+    # Keys are stored hashed, so existing ones can't be shown again: issue a new
+    # one per login. Other devices keep their keys; only login keys idle past
+    # LOGIN_KEY_MAX_IDLE_DAYS are retired
+    idle_since = datetime.utcnow() - timedelta(days=LOGIN_KEY_MAX_IDLE_DAYS)
+    retired = (await session.scalars(
+        update(APIKey)
+        .where(
+            APIKey.user_id == user.id,
+            APIKey.name == LOGIN_KEY_NAME,
+            APIKey.is_active.is_(True),
+            func.coalesce(APIKey.last_used, APIKey.created_at) < idle_since
+        )
+        .values(is_active=False)
+        .returning(APIKey.key_hash)
+    )).all()
+    key_id, api_key = await create_api_key(session, user.id, name=LOGIN_KEY_NAME)
+    user.last_login = datetime.utcnow()
+    await session.commit()
 
-    if not api_key:
-        api_key = generate_api_key()
-        API_KEYS[api_key] = user["id"]
+    # Cached verifications must not outlive the retirement
+    await key_cache.invalidate(list(retired))
 
     return {
         "success": True,
         "api_key": api_key,
-        "user_id": user["id"]
+        "key_id": key_id,
+        "user_id": user.id
     }
 
+@app.delete("/api/auth/keys/{key_id}")
+async def revoke_api_key(key_id: str, user_id: str = Depends(verify_api_key),
+                         session: AsyncSession = Depends(get_session)):
+    """Revoke one of the caller's API keys"""
+
+    key = await session.get(APIKey, key_id)
+    if not key or key.user_id != user_id:
+        raise HTTPException(status_code=404, detail="API key not found")
+
+    key.is_active = False
+    await session.commit()
+
+    # Cached verifications must not outlive the revocation
+    await key_cache.invalidate([key.key_hash])
+
+    return {"success": True, "message": "API key revoked"}
+
 # ========================================
 # USER ENDPOINTS
 # ========================================
 
 @app.get("/api/user/profile")
-async def get_profile(user_id: str = Depends(verify_api_key)):
+async def get_profile(user_id: str = Depends(verify_api_key), session: AsyncSession = Depends(get_session)):
     """Get user profile"""
 
-    user = USERS_DB.get(user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    plan_limits = PLAN_LIMITS[user["plan"]]
+    user = await get_user_or_404(session, user_id)
+    plan_limits = PLAN_LIMITS[user.plan]
 
     return UserProfile(
-        id=user["id"],
-        email=user["email"],
-        plan=user["plan"],
-        products_tracked=user["products_tracked"],
+        id=user.id,
+        email=user.email,
+        plan=user.plan,
+        products_tracked=await count_user_products(session, user_id),
         products_limit=plan_limits["products"],
-        created_at=user["created_at"],
-        subscription_status=user["subscription_status"]
+        created_at=user.created_at,
+        subscription_status=user.subscription_status.value
     )
 
 @app.get("/api/user/stats")
-async def get_stats(user_id: str = Depends(verify_api_key)):
-    """Get dashboard statistics"""
-
-    user_products = [p for p in PRODUCTS_DB.values() if p["user_id"] == user_id]
+async def get_stats(user_id: str = Depends(verify_api_key), session: AsyncSession = Depends(get_session)):
+    """Get dashboard statistics (maintained incrementally, see stats_cache.py)"""
 
-    # Calculate statistics
-    total_products = len(user_products)
-    active_alerts = len([a for a in ALERTS_DB.values() if a["user_id"] == user_id and a["enabled"]])
-
-    # Get prices from last 24 hours
-    yesterday = datetime.now() - timedelta(hours=24)
-    recent_prices = [
-        p for p in PRICES_DB.values()
-        if p["user_id"] == user_id and p["timestamp"] > yesterday
-    ]
-    price_changes_24h = len(set(p["product_id"] for p in recent_prices))
-
-    # Price statistics
-    current_prices = [p["current_price"] for p in user_products if p.get("current_price")]
-    avg_price = sum(current_prices) / len(current_prices) if current_prices else None
-    lowest = min(current_prices) if current_prices else None
-    highest = max(current_prices) if current_prices else None
-
-    return DashboardStats(
-        total_products=total_products,
-        active_alerts=active_alerts,
-        price_changes_24h=price_changes_24h,
-        average_competitor_price=avg_price,
-        lowest_price_found=lowest,
-        highest_price_found=highest
-    )
+    return DashboardStats(**await stats_cache.get(session, user_id))
 
 # ========================================
 # PRODUCT ENDPOINTS
 # ========================================
 
 @app.post("/api/products/add")
-async def add_product(product: ProductAdd, background_tasks: BackgroundTasks, user_id: str = Depends(verify_api_key)):
+async def add_product(product: ProductAdd, background_tasks: BackgroundTasks,
+                      user_id: str = Depends(verify_api_key), session: AsyncSession = Depends(get_session)):
     """Add a product to track"""
 
-    user = USERS_DB.get(user_id)
-    plan_limits = PLAN_LIMITS[user["plan"]]
+    user = await get_user_or_404(session, user_id)
+    plan_limits = PLAN_LIMITS[user.plan]
 
     # Check product limit
-    if plan_limits["products"] != -1 and user["products_tracked"] >= plan_limits["products"]:
+    if plan_limits["products"] != -1 and await count_user_products(session, user_id) >= plan_limits["products"]:
         raise HTTPException(
             status_code=403,
             detail=f"Product limit reached. Upgrade your plan to track more products."
@@ -296,20 +363,40 @@ async def add_product(product: ProductAdd, background_tasks: BackgroundTasks, us
 
     # Create product
     product_id = generate_product_id()
-    PRODUCTS_DB[product_id] = {
-        "id": product_id,
-        "user_id": user_id,
-        "url": str(product.url),
-        "name": product.name or "Unnamed Product",
-        "competitor_name": product.competitor_name,
-        "current_price": None,
-        "last_checked": None,
-        "alert_threshold": product.alert_threshold,
-        "created_at": datetime.now()
-    }
+    url = str(product.url)
+    _, product_identifier = canonicalize_url(url)
+    session.add(Product(
+        id=product_id,
+        user_id=user_id,
+        url=url,
+        name=product.name,  # Filled from the first scrape if not given
+        competitor_name=product.competitor_name,
+        check_interval=plan_limits["check_interval"],
+        domain=(product.url.host or "").lower().replace("www.", ""),
+        product_identifier=product_identifier
+    ))
+
+    # alert_threshold is shorthand for a threshold alert on the new product
+    threshold_alert = None
+    if product.alert_threshold is not None:
+        threshold_alert = Alert(
+            id=f"alert_{secrets.token_urlsafe(16)}",
+            user_id=user_id,
+            product_id=product_id,
+            alert_type=AlertType.THRESHOLD,
+            threshold=product.alert_threshold,
+            enabled=True
+        )
+        session.add(threshold_alert)
+
+    await session.commit()
+    await stats_cache.product_added(user_id, alerts=1 if threshold_alert else 0)
+    if threshold_alert:
+        await alert_index.add(threshold_alert)
 
-    # Update user count
-    USERS_DB[user_id]["products_tracked"] += 1
+    # Recurring checks at the plan's interval, shared with anyone tracking the same item
+    # The scheduler's Redis client is synchronous; keep it off the event loop
+    await run_in_threadpool(get_due_scheduler().subscribe, product_id, url, plan_limits["check_interval"])
 
     # Trigger immediate price check (background task)
     background_tasks.add_task(check_product_price, product_id)
@@ -320,36 +407,172 @@ async def add_product(product: ProductAdd, background_tasks: BackgroundTasks, us
         "message": "Product added successfully. Price check initiated."
     }
 
-@app.get("/api/products/list")
-async def list_products(user_id: str = Depends(verify_api_key)):
-    """List all tracked products"""
-
-    user_products = [
-        ProductResponse(
-            id=p["id"],
-            url=p["url"],
-            name=p["name"],
-            current_price=p.get("current_price"),
-            last_checked=p.get("last_checked"),
-            price_history=get_price_history(p["id"]),
-            competitor_name=p.get("competitor_name")
+def encode_cursor(product: Product) -> str:
+    """Opaque keyset cursor: (created_at, id) of the last product on a page"""
+    raw = json.dumps([product.created_at.isoformat(), product.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), product_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert tz-aware query values to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def parse_fields(fields: Optional[str]) -> set:
+    if not fields:
+        return set(PRODUCT_FIELDS)
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - PRODUCT_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | {"id"}
+
+@app.get("/api/products/list", response_model=ProductPage)
+async def list_products(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    history_limit: int = Query(DEFAULT_HISTORY_LIMIT, ge=0, le=MAX_HISTORY_LIMIT),
+    since: Optional[datetime] = Query(None, description="Only include price history after this time"),
+    user_id: str = Depends(verify_api_key),
+    session: AsyncSession = Depends(get_session)
+):
+    """List tracked products, a page at a time, with a bounded slice of recent history"""
+
+    selected = parse_fields(fields)
+
+    query = (
+        select(Product)
+        .where(Product.user_id == user_id)
+        .order_by(Product.created_at, Product.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(tuple_(Product.created_at, Product.id) > decode_cursor(cursor))
+
+    products = (await session.scalars(query)).all()
+    has_more = len(products) > limit
+    products = products[:limit]
+
+    histories = {}
+    if "price_history" in selected and history_limit > 0:
+        histories = await get_price_histories(
+            session, [p.id for p in products], limit=history_limit, since=to_utc_naive(since)
         )
-        for p in PRODUCTS_DB.values()
-        if p["user_id"] == user_id
-    ]
 
-    return {"products": user_products}
+    user_products = []
+    for p in products:
+        row = {
+            "id": p.id,
+            "url": p.url,
+            "name": p.name or "Unnamed Product",
+            "current_price": p.current_price,
+            "currency": p.currency,
+            "in_stock": p.in_stock,
+            "last_checked": p.last_checked,
+            "competitor_name": p.competitor_name,
+            "price_history": histories.get(p.id, [])
+        }
+        user_products.append({field: value for field, value in row.items() if field in selected})
+
+    return ProductPage(
+        products=user_products,
+        next_cursor=encode_cursor(products[-1]) if has_more else None
+    )
+
+@app.get("/api/products/{product_id}/history")
+async def get_product_history(
+    product_id: str,
+    limit: int = Query(DEFAULT_HISTORY_LIMIT, ge=1, le=MAX_HISTORY_LIMIT),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resolution: Optional[str] = Query(None, pattern="^(raw|hour|day)$",
+                                      description="Default: picked from the since/until span"),
+    expand: bool = Query(False, description="Return each unchanged run as its first and last observation"),
+    user_id: str = Depends(verify_api_key),
+    session: AsyncSession = Depends(get_session)
+):
+    """Price history for one product, newest first; long ranges come from hourly/daily rollups"""
+
+    product = await session.get(Product, product_id)
+    if not product or product.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    resolution = resolution or pick_resolution(since, until)
+    if resolution != "raw":
+        rollups = await get_rollups(session, [product_id], resolution, since=since, until=until, limit=limit)
+        return {"product_id": product_id, "resolution": resolution, "price_history": rollups[product_id]}
+
+    histories = await get_price_histories(session, [product_id], limit=limit, since=since, until=until)
+    history = histories[product_id]
+    return {
+        "product_id": product_id,
+        "resolution": resolution,
+        "price_history": expand_runs(history) if expand else history
+    }
+
+@app.get("/api/products/export")
+async def export_price_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    product_id: Optional[List[str]] = Query(None, description="Limit to these products (default: all)"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: str = Depends(verify_api_key),
+    session: AsyncSession = Depends(get_session)
+):
+    """Stream full price history as NDJSON, CSV or Arrow IPC"""
+
+    query = select(Product.id).where(Product.user_id == user_id)
+    if product_id:
+        query = query.where(Product.id.in_(product_id))
+    product_ids = list((await session.scalars(query)).all())
+    if product_id and len(product_ids) != len(set(product_id)):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Arrow export is not available on this server")
+
+    filename = f"price_history_{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        export_history(product_ids, format, to_utc_naive(start), to_utc_naive(end)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @app.delete("/api/products/{product_id}")
-async def delete_product(product_id: str, user_id: str = Depends(verify_api_key)):
+async def delete_product(product_id: str, user_id: str = Depends(verify_api_key),
+                         session: AsyncSession = Depends(get_session)):
     """Delete a tracked product"""
 
-    product = PRODUCTS_DB.get(product_id)
-    if not product or product["user_id"] != user_id:
+    product = await session.get(Product, product_id)
+    if not product or product.user_id != user_id:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    del PRODUCTS_DB[product_id]
-    USERS_DB[user_id]["products_tracked"] -= 1
+    enabled_alerts = await session.scalar(
+        select(func.count()).select_from(Alert).where(Alert.product_id == product_id, Alert.enabled.is_(True))
+    )
+    # Bulk statements rather than session.delete(): the ORM cascade would load
+    # every PriceHistory row into memory first. Rollups cascade in Postgres.
+    alert_ids = select(Alert.id).where(Alert.product_id == product_id)
+    await session.execute(delete(Notification).where(Notification.alert_id.in_(alert_ids)))
+    await session.execute(delete(Alert).where(Alert.product_id == product_id))
+    await session.execute(delete(PriceHistory).where(PriceHistory.product_id == product_id))
+    await session.execute(delete(Product).where(Product.id == product_id))
+    await session.commit()
+    await run_in_threadpool(get_due_scheduler().unsubscribe, product_id)
+    await stats_cache.product_removed(user_id, product_id, alerts=enabled_alerts)
+    await alert_index.drop_product(product_id)
 
     return {"success": True, "message": "Product deleted"}
 
@@ -358,32 +581,55 @@ async def delete_product(product_id: str, user_id: str = Depends(verify_api_key)
 # ========================================
 
 @app.post("/api/alerts/configure")
-async def configure_alert(alert: AlertConfig, user_id: str = Depends(verify_api_key)):
+async def configure_alert(alert: AlertConfig, user_id: str = Depends(verify_api_key),
+                          session: AsyncSession = Depends(get_session)):
     """Configure price alert"""
 
     # Verify product ownership
-    product = PRODUCTS_DB.get(alert.product_id)
-    if not product or product["user_id"] != user_id:
+    product = await session.get(Product, alert.product_id)
+    if not product or product.user_id != user_id:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    if alert.alert_type == AlertType.THRESHOLD and alert.threshold is None:
+        raise HTTPException(status_code=400, detail="Threshold alerts need a threshold price")
+    if alert.alert_type == AlertType.PRICE_DROP and (alert.threshold or 0) > 100:
+        raise HTTPException(status_code=400, detail="Price drop thresholds are percentages (0-100)")
+
     alert_id = f"alert_{secrets.token_urlsafe(16)}"
-    ALERTS_DB[alert_id] = {
-        "id": alert_id,
-        "user_id": user_id,
-        "product_id": alert.product_id,
-        "alert_type": alert.alert_type,
-        "threshold": alert.threshold,
-        "enabled": alert.enabled,
-        "created_at": datetime.now()
-    }
+    new_alert = Alert(
+        id=alert_id,
+        user_id=user_id,
+        product_id=alert.product_id,
+        alert_type=alert.alert_type,
+        threshold=alert.threshold,
+        threshold_is_percent=alert.alert_type in (AlertType.PRICE_DROP, AlertType.PRICE_INCREASE),
+        enabled=alert.enabled
+    )
+    session.add(new_alert)
+    await session.commit()
+    if alert.enabled:
+        await stats_cache.alerts_changed(user_id, 1)
+        await alert_index.add(new_alert)
 
     return {"success": True, "alert_id": alert_id}
 
 @app.get("/api/alerts/list")
-async def list_alerts(user_id: str = Depends(verify_api_key)):
+async def list_alerts(user_id: str = Depends(verify_api_key), session: AsyncSession = Depends(get_session)):
     """List all configured alerts"""
 
-    user_alerts = [a for a in ALERTS_DB.values() if a["user_id"] == user_id]
+    alerts = (await session.scalars(select(Alert).where(Alert.user_id == user_id))).all()
+    user_alerts = [
+        {
+            "id": a.id,
+            "user_id": a.user_id,
+            "product_id": a.product_id,
+            "alert_type": a.alert_type,
+            "threshold": a.threshold,
+            "enabled": a.enabled,
+            "created_at": a.created_at
+        }
+        for a in alerts
+    ]
     return {"alerts": user_alerts}
 
 # ========================================
@@ -391,38 +637,88 @@ async def list_alerts(user_id: str = Depends(verify_api_key)):
 # ========================================
 
 @app.post("/api/webhooks/configure")
-async def configure_webhook(webhook: WebhookConfig, user_id: str = Depends(verify_api_key)):
+async def configure_webhook(webhook: WebhookConfig, user_id: str = Depends(verify_api_key),
+                            session: AsyncSession = Depends(get_session)):
     """Configure webhook for price alerts (Professional+ only)"""
 
-    user = USERS_DB.get(user_id)
-    if user["plan"] not in [PlanTier.PROFESSIONAL, PlanTier.BUSINESS, PlanTier.ENTERPRISE]:
+    user = await get_user_or_404(session, user_id)
+    if user.plan not in [PlanTier.PROFESSIONAL, PlanTier.BUSINESS, PlanTier.ENTERPRISE]:
         raise HTTPException(status_code=403, detail="Webhooks require Professional plan or higher")
 
-    # TODO: Implement webhook storage and triggers
-    return {"success": True, "message": "Webhook configured"}
+    webhook_id = f"wh_{secrets.token_urlsafe(16)}"
+    secret = secrets.token_urlsafe(32)
+    session.add(Webhook(
+        id=webhook_id,
+        user_id=user_id,
+        url=str(webhook.url),
+        events=json.dumps(webhook.events),
+        secret=secret,
+        enabled=webhook.enabled,
+        batch_window_seconds=webhook.batch_window_seconds,
+        batch_max_events=webhook.batch_max_events
+    ))
+    await session.commit()
+
+    return {
+        "success": True,
+        "webhook_id": webhook_id,
+        "secret": secret,  # Shown once; used to sign deliveries
+        "message": "Webhook configured"
+    }
 
 # ========================================
 # ADMIN/BACKGROUND TASKS
 # ========================================
 
 async def check_product_price(product_id: str):
-    """Background task to check product price (will be moved to Celery)"""
-    # Placeholder - will implement actual scraping
-    print(f"Checking price for product: {product_id}")
-    # TODO: Implement Playwright scraping logic
-
-def get_price_history(product_id: str) -> List[Dict[str, Any]]:
-    """Get price history for a product"""
-    history = [
-        {
-            "price": p["price"],
-            "timestamp": p["timestamp"].isoformat(),
-            "source": p.get("source", "scraper")
-        }
-        for p in PRICES_DB.values()
-        if p["product_id"] == product_id
-    ]
-    return sorted(history, key=lambda x: x["timestamp"], reverse=True)
+    """Background task: queue an immediate price check on the Celery workers"""
+    from tasks import check_single_product
+
+    check_single_product.delay(product_id)
+
+async def get_price_histories(session: AsyncSession, product_ids: List[str], limit: int = DEFAULT_HISTORY_LIMIT,
+                              since: Optional[datetime] = None,
+                              until: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Get the newest `limit` prices (optionally between `since` and `until`) for several
+    products in one query over the (product_id, timestamp) index
+    """
+    histories: Dict[str, List[Dict[str, Any]]] = {product_id: [] for product_id in product_ids}
+    if not product_ids:
+        return histories
+
+    conditions = [PriceHistory.product_id == Product.id]
+    if since:
+        # A run that started earlier but was still seen after `since` counts
+        conditions.append(func.coalesce(PriceHistory.last_seen, PriceHistory.timestamp) > since)
+    if until:
+        conditions.append(PriceHistory.timestamp < until)
+
+    # LATERAL: per product, walk ix_price_history_product_time backwards and
+    # stop after `limit` rows instead of ranking the whole history
+    recent = (
+        select(PriceHistory.price, PriceHistory.timestamp, PriceHistory.last_seen, PriceHistory.source)
+        .where(*conditions)
+        .order_by(PriceHistory.timestamp.desc())
+        .limit(limit)
+        .lateral("recent")
+    )
+    rows = await session.execute(
+        select(Product.id.label("product_id"), recent.c.price, recent.c.timestamp,
+               recent.c.last_seen, recent.c.source)
+        .select_from(Product)
+        .join(recent, true())
+        .where(Product.id.in_(product_ids))
+        .order_by(Product.id, recent.c.timestamp.desc())
+    )
+    for p in rows:
+        histories[p.product_id].append({
+            "price": p.price,
+            "timestamp": p.timestamp.isoformat(),
+            "last_seen": (p.last_seen or p.timestamp).isoformat(),
+            "source": p.source or "scraper"
+        })
+    return histories
 
 # ========================================
 # HEALTH CHECK
@@ -452,13 +748,40 @@ async def root():
 # STARTUP EVENT
 # ========================================
 
+async def enroll_existing_products():
+    """Put active products created before the due-time index into it"""
+    enrolled = 0
+    async with SessionLocal() as session:
+        result = await session.stream(
+            select(Product.id, Product.url, Product.check_interval)
+            .where(Product.is_active.is_(True))
+            .execution_options(yield_per=1000)
+        )
+        async for rows in result.partitions():
+            enrolled += await run_in_threadpool(
+                get_due_scheduler().enroll_missing,
+                [(row.id, row.url, row.check_interval or 86400) for row in rows]
+            )
+    if enrolled:
+        print(f"📅 Scheduled {enrolled} existing products for price checks")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
     print("🚀 PriceWatch AI API starting...")
-    print("📊 Database: In-memory (will migrate to PostgreSQL)")
+    await init_db()
+    await enroll_existing_products()
+    key_cache.start()
+    key_usage.start()
+    print("📊 Database: PostgreSQL")
     print("✅ API Ready")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered state before the worker exits"""
+    await key_usage.stop()
+    await key_cache.stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
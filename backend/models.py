@@ -2,8 +2,8 @@
 PriceWatch AI - Database Models (SQLAlchemy)
 """
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, Enum
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, DateTime, ForeignKey, Text, Enum, Index
+from sqlalchemy.ext.declarative import declarative_base, declared_attr
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -59,7 +59,7 @@ class APIKey(Base):
     __tablename__ = "api_keys"
 
     id = Column(String, primary_key=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     key_hash = Column(String, nullable=False, unique=True, index=True)
     name = Column(String, default="Default Key")
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -72,6 +72,10 @@ class APIKey(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination of a user's products
+        Index("ix_products_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
@@ -81,6 +85,7 @@ class Product(Base):
     current_price = Column(Float, nullable=True)
     currency = Column(String, default="USD")
     last_checked = Column(DateTime, nullable=True)
+    price_changed_at = Column(DateTime, nullable=True)  # Timestamp of the current PriceHistory row
     check_interval = Column(Integer, default=86400)  # Seconds (default: daily)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -102,13 +107,24 @@ class Product(Base):
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
-
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    product_id = Column(String, ForeignKey("products.id"), nullable=False, index=True)
+    __table_args__ = (
+        # Serves both "all prices for a product" and "a product's prices in a time range";
+        # created on every partition
+        Index("ix_price_history_product_time", "product_id", "timestamp"),
+        # Monthly range partitions, managed by partitions.py
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+    # The partition key must be part of the primary key
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    product_id = Column(String, ForeignKey("products.id"), nullable=False)
     price = Column(Float, nullable=False)
     currency = Column(String, default="USD")
     in_stock = Column(Boolean, default=True)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # Last check that still saw this price; with change-only writes a row
+    # covers every check from timestamp through last_seen
+    last_seen = Column(DateTime, nullable=True)
 
     # Scraping metadata
     source = Column(String, default="scraper")
@@ -120,6 +136,32 @@ class PriceHistory(Base):
     product = relationship("Product", back_populates="price_history")
 
 
+class PriceRollupMixin:
+    """Open/high/low/close summary of one product's prices over a time bucket"""
+
+    @declared_attr
+    def product_id(cls):
+        return Column(String, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour/day
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    price_sum = Column(Float, nullable=False)  # avg = price_sum / samples
+    samples = Column(Integer, nullable=False)
+    opened_at = Column(DateTime, nullable=False)  # First observation in the bucket
+    closed_at = Column(DateTime, nullable=False)  # Latest observation in the bucket
+
+
+class PriceRollupHourly(PriceRollupMixin, Base):
+    __tablename__ = "price_rollups_hourly"
+
+
+class PriceRollupDaily(PriceRollupMixin, Base):
+    __tablename__ = "price_rollups_daily"
+
+
 class Alert(Base):
     __tablename__ = "alerts"
 
@@ -127,7 +169,10 @@ class Alert(Base):
     user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     product_id = Column(String, ForeignKey("products.id"), nullable=False, index=True)
     alert_type = Column(Enum(AlertType), nullable=False)
-    threshold = Column(Float, nullable=True)  # For threshold-based alerts
+    threshold = Column(Float, nullable=True)  # Price for THRESHOLD, percent for PRICE_DROP/PRICE_INCREASE
+    # NULL on drop/increase alerts created before thresholds were percentages;
+    # their threshold is an absolute amount of price change
+    threshold_is_percent = Column(Boolean, nullable=True)
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     last_triggered = Column(DateTime, nullable=True)
@@ -176,6 +221,11 @@ class Webhook(Base):
     success_count = Column(Integer, default=0)
     failure_count = Column(Integer, default=0)
 
+    # Batching (opt-in): buffer events for up to batch_window_seconds or
+    # batch_max_events and deliver them as one JSON array
+    batch_window_seconds = Column(Integer, nullable=True)  # None/0 = deliver each event immediately
+    batch_max_events = Column(Integer, default=100)
+
     # Relationships
     user = relationship("User", back_populates="webhooks")
 
@@ -211,4 +261,5 @@ class SystemLog(Base):
     user_id = Column(String, nullable=True, index=True)
     product_id = Column(String, nullable=True, index=True)
     error_trace = Column(Text, nullable=True)
-    metadata = Column(Text, nullable=True)  # JSON additional data
+    # "metadata" is reserved on declarative classes; keep the column name
+    extra_data = Column("metadata", Text, nullable=True)  # JSON additional data
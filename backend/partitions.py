@@ -0,0 +1,229 @@
+"""
+PriceWatch AI - PriceHistory Partitions
+Monthly range partitions of price_history: creation ahead of time, retention by
+dropping or detaching whole months, and migration of an unpartitioned table
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, date
+from typing import Optional, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "price_history"
+LEGACY_TABLE = "price_history_unpartitioned"
+# Catches rows no monthly partition covers (e.g. beat was down past the
+# months created ahead) so inserts never fail
+DEFAULT_PARTITION = "price_history_default"
+
+PARTITION_MONTHS_AHEAD = 3  # Future months kept ready so inserts never miss a partition
+PRICE_HISTORY_RETENTION_DAYS = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "90"))
+# "drop": delete expired months; "detach": keep them as standalone tables for archiving
+PARTITION_RETENTION_MODE = os.getenv("PARTITION_RETENTION_MODE", "drop")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+def partition_month(name: str) -> date:
+    """Inverse of partition_name"""
+    year, month = name[len(PARENT_TABLE) + 1:].split("_")
+    return date(int(year), int(month), 1)
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    relkind = await conn.scalar(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": PARENT_TABLE}
+    )
+    return relkind == "p"
+
+
+async def list_partitions(conn: AsyncConnection) -> List[Tuple[str, date]]:
+    """Attached monthly partitions as (name, first day of month), oldest first"""
+    rows = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {"table": PARENT_TABLE})
+    # Only children named like price_history_YYYY_MM are ours
+    names = [name for name, in rows if name[len(PARENT_TABLE) + 1:].replace("_", "").isdigit()]
+    return sorted(((name, partition_month(name)) for name in names), key=lambda item: item[1])
+
+
+async def ensure_partitions(conn: AsyncConnection, first_month: Optional[date] = None,
+                            months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """
+    Create any missing monthly partitions from `first_month` (default: this
+    month) through `months_ahead` months in the future. An existing
+    unpartitioned price_history is left alone until it is migrated.
+
+    Returns:
+        Names of the partitions that were created
+    """
+    if not await is_partitioned(conn):
+        logger.warning(
+            f"⚠️ {PARENT_TABLE} is not partitioned; skipping partition creation. "
+            f"Run `python partitions.py migrate` to convert it"
+        )
+        return []
+
+    month = month_start(first_month or datetime.utcnow().date())
+    last = add_months(month_start(datetime.utcnow().date()), months_ahead)
+    existing = {name for name, _ in await list_partitions(conn)}
+    await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF {PARENT_TABLE} DEFAULT'))
+
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            await create_partition(conn, name, month)
+            created.append(name)
+        month = add_months(month, 1)
+
+    if created:
+        logger.info(f"✅ Created price history partitions: {', '.join(created)}")
+    return created
+
+
+async def create_partition(conn: AsyncConnection, name: str, month: date):
+    """
+    Create one monthly partition. Postgres refuses to add a partition whose
+    range already has rows in the default partition, so those rows are moved
+    into the new table before it is attached.
+    """
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    in_range = f"timestamp >= '{month.isoformat()}' AND timestamp < '{add_months(month, 1).isoformat()}'"
+    stranded = await conn.scalar(text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range})'))
+    if not stranded:
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}'))
+        return
+
+    await conn.execute(text(f'CREATE TABLE "{name}" (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    await conn.execute(text(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ))
+    await conn.execute(text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION "{name}" FOR VALUES {bounds}'))
+    logger.warning(f"⚠️ Moved rows for {month:%Y-%m} out of {DEFAULT_PARTITION} into {name}")
+
+
+async def expire_partitions(conn: AsyncConnection, days_to_keep: int = PRICE_HISTORY_RETENTION_DAYS,
+                            mode: str = PARTITION_RETENTION_MODE) -> List[str]:
+    """
+    Drop (or detach) every partition whose whole month is older than the
+    retention window. A month that is only partly expired is kept until it
+    ages out completely, so retention is "at least days_to_keep".
+
+    Returns:
+        Names of the partitions that were removed
+    """
+    cutoff = datetime.utcnow().date().toordinal() - days_to_keep
+    expired = [
+        name for name, month in await list_partitions(conn)
+        if add_months(month, 1).toordinal() <= cutoff
+    ]
+
+    for name in expired:
+        if mode == "detach":
+            await conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+        else:
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+
+    if expired:
+        action = "Detached" if mode == "detach" else "Dropped"
+        logger.info(f"✅ {action} price history partitions: {', '.join(expired)}")
+    return expired
+
+
+# ========================================
+# MIGRATION
+# ========================================
+
+async def migrate_to_partitioned(conn: AsyncConnection) -> bool:
+    """
+    Convert an existing unpartitioned price_history table in place.
+
+    Renames the old table, creates the partitioned one from the models,
+    creates partitions covering its oldest row onwards and copies the rows
+    across. The old table is left as price_history_unpartitioned for the
+    operator to drop once the copy has been checked.
+
+    Returns:
+        False if the table was already partitioned (or did not exist)
+    """
+    from models import PriceHistory
+
+    exists = await conn.scalar(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": PARENT_TABLE})
+    if not exists or await is_partitioned(conn):
+        return False
+
+    await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+    # Index and sequence names are schema-wide; free them for the new table
+    indexes = await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": LEGACY_TABLE}
+    )
+    for name, in indexes.all():
+        await conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_unpartitioned"'))
+    await conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {LEGACY_TABLE}_id_seq"))
+    await conn.run_sync(PriceHistory.__table__.create)
+
+    oldest = await conn.scalar(text(f"SELECT min(timestamp) FROM {LEGACY_TABLE}"))
+    await ensure_partitions(conn, first_month=oldest.date() if oldest else None)
+
+    legacy_columns = await conn.execute(
+        text("SELECT column_name FROM information_schema.columns WHERE table_name = :table"),
+        {"table": LEGACY_TABLE}
+    )
+    legacy_columns = {name for name, in legacy_columns.all()}
+    columns = ", ".join(
+        column.name for column in PriceHistory.__table__.columns if column.name in legacy_columns
+    )
+    await conn.execute(text(
+        f"INSERT INTO {PARENT_TABLE} ({columns}) SELECT {columns} FROM {LEGACY_TABLE} "
+        f"WHERE timestamp IS NOT NULL"
+    ))
+    # Continue the id sequence where the old table left off
+    await conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+        f"(SELECT coalesce(max(id), 0) + 1 FROM {PARENT_TABLE}), false)"
+    ))
+    logger.info(f"✅ Migrated {PARENT_TABLE} to monthly partitions (old table kept as {LEGACY_TABLE})")
+    return True
+
+
+async def main(command: str):
+    from database import engine
+
+    async with engine.begin() as conn:
+        if command == "migrate":
+            await migrate_to_partitioned(conn)
+            await ensure_partitions(conn)
+        elif command == "ensure":
+            await ensure_partitions(conn)
+        elif command == "expire":
+            await expire_partitions(conn)
+        else:
+            raise SystemExit(f"Unknown command: {command}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    # python partitions.py migrate|ensure|expire
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "ensure"))
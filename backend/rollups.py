@@ -0,0 +1,196 @@
+"""
+PriceWatch AI - Price Rollups
+Hourly and daily OHLC summaries of price history, maintained from the write path
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy import select, delete, case, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from models import PriceRollupHourly, PriceRollupDaily
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_MODELS = {
+    "hour": PriceRollupHourly,
+    "day": PriceRollupDaily,
+}
+
+# Reads spanning up to RAW_MAX_SPAN use raw history, up to HOURLY_MAX_SPAN
+# the hourly rollup, anything longer the daily one
+RAW_MAX_SPAN = timedelta(days=2)
+HOURLY_MAX_SPAN = timedelta(days=60)
+
+# Daily rollups are kept forever; hourly ones only this long
+ROLLUP_HOURLY_RETENTION_DAYS = int(os.getenv("ROLLUP_HOURLY_RETENTION_DAYS", "365"))
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def pick_resolution(since: Optional[datetime], until: Optional[datetime] = None) -> str:
+    """Coarsest resolution that still resolves the requested range: "raw", "hour" or "day" """
+    if since is None:
+        return "raw"
+    span = (until or datetime.utcnow()) - since
+    if span <= RAW_MAX_SPAN:
+        return "raw"
+    if span <= HOURLY_MAX_SPAN:
+        return "hour"
+    return "day"
+
+
+# ========================================
+# WRITES
+# ========================================
+
+def _summarize(observations: List[Tuple[str, datetime, float]], resolution: str) -> List[Dict[str, Any]]:
+    """Fold observations into one row per (product, bucket); an upsert may touch each row only once"""
+    rows: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+    for product_id, observed_at, price in sorted(observations, key=lambda item: item[1]):
+        key = (product_id, bucket_start(observed_at, resolution))
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {
+                "product_id": product_id, "bucket": key[1],
+                "open": price, "high": price, "low": price, "close": price,
+                "price_sum": price, "samples": 1,
+                "opened_at": observed_at, "closed_at": observed_at
+            }
+            continue
+        row["high"] = max(row["high"], price)
+        row["low"] = min(row["low"], price)
+        row["close"] = price
+        row["closed_at"] = observed_at
+        row["price_sum"] += price
+        row["samples"] += 1
+    return list(rows.values())
+
+
+def _upsert_statement(model):
+    statement = pg_insert(model)
+    table, new = model.__table__, statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.product_id, table.c.bucket],
+        set_={
+            # Late or out-of-order observations only move open/close if they
+            # are earlier/later than what the bucket already holds
+            "open": case((new.opened_at < table.c.opened_at, new.open), else_=table.c.open),
+            "close": case((new.closed_at >= table.c.closed_at, new.close), else_=table.c.close),
+            "high": func.greatest(table.c.high, new.high),
+            "low": func.least(table.c.low, new.low),
+            "price_sum": table.c.price_sum + new.price_sum,
+            "samples": table.c.samples + new.samples,
+            "opened_at": func.least(table.c.opened_at, new.opened_at),
+            "closed_at": func.greatest(table.c.closed_at, new.closed_at),
+        }
+    )
+
+
+async def upsert_rollups(session: AsyncSession, observations: List[Tuple[str, datetime, float]]):
+    """
+    Merge (product_id, observed_at, price) observations into the hourly and
+    daily rollups, one executemany upsert per resolution.
+    """
+    if not observations:
+        return
+    for resolution, model in ROLLUP_MODELS.items():
+        await session.execute(_upsert_statement(model), _summarize(observations, resolution))
+
+
+# ========================================
+# READS
+# ========================================
+
+async def get_rollups(session: AsyncSession, product_ids: List[str], resolution: str,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Rollup buckets per product, newest first"""
+    model = ROLLUP_MODELS[resolution]
+    rollups: Dict[str, List[Dict[str, Any]]] = {product_id: [] for product_id in product_ids}
+    if not product_ids:
+        return rollups
+
+    query = select(model).where(model.product_id.in_(product_ids))
+    if since:
+        query = query.where(model.bucket >= bucket_start(since, resolution))
+    if until:
+        query = query.where(model.bucket < until)
+    query = query.order_by(model.product_id, model.bucket.desc())
+    if limit and len(product_ids) == 1:
+        query = query.limit(limit)
+
+    for row in await session.scalars(query):
+        rollups[row.product_id].append({
+            "timestamp": row.bucket.isoformat(),
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+            "avg": row.price_sum / row.samples,
+            "samples": row.samples
+        })
+    return rollups
+
+
+# ========================================
+# MAINTENANCE
+# ========================================
+
+async def expire_rollups(session: AsyncSession, days_to_keep: int = ROLLUP_HOURLY_RETENTION_DAYS) -> int:
+    """Delete hourly buckets past retention; daily buckets are kept"""
+    cutoff = datetime.utcnow() - timedelta(days=days_to_keep)
+    result = await session.execute(delete(PriceRollupHourly).where(PriceRollupHourly.bucket < cutoff))
+    return result.rowcount
+
+
+async def backfill_rollups(conn: AsyncConnection, since: Optional[datetime] = None):
+    """
+    Rebuild rollups from raw price_history (e.g. after first deploying them).
+    Runs are counted by their first observation only, so sample counts from
+    change-only history are lower than for live-maintained buckets.
+    """
+    for resolution, model in ROLLUP_MODELS.items():
+        table = model.__tablename__
+        await conn.execute(text(f"""
+            INSERT INTO {table}
+                (product_id, bucket, open, high, low, close, price_sum, samples, opened_at, closed_at)
+            SELECT product_id, date_trunc('{resolution}', timestamp) AS bucket,
+                   (array_agg(price ORDER BY timestamp))[1],
+                   max(price), min(price),
+                   (array_agg(price ORDER BY timestamp DESC))[1],
+                   sum(price), count(*), min(timestamp), max(coalesce(last_seen, timestamp))
+            FROM price_history
+            WHERE (CAST(:since AS timestamp) IS NULL OR timestamp >= :since)
+            GROUP BY product_id, bucket
+            ON CONFLICT (product_id, bucket) DO UPDATE SET
+                open = excluded.open, high = excluded.high, low = excluded.low,
+                close = excluded.close, price_sum = excluded.price_sum,
+                samples = excluded.samples, opened_at = excluded.opened_at,
+                closed_at = excluded.closed_at
+        """), {"since": since})
+        logger.info(f"✅ Backfilled {table}")
+
+
+async def main():
+    from database import engine
+
+    async with engine.begin() as conn:
+        await backfill_rollups(conn)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    # python rollups.py backfill
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["backfill"]:
+        raise SystemExit("Usage: python rollups.py backfill")
+    asyncio.run(main())
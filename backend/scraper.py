@@ -5,25 +5,172 @@ Automated price extraction from e-commerce websites
 
 import asyncio
 import re
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, AsyncIterator
 from datetime import datetime
 from urllib.parse import urlparse
-from playwright.async_api import async_playwright, Browser, Page
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, Page, Route
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import httpx
+from browser_pool import BrowserPool
+from throttle import ScrapeScheduler
+from structured_data import COLLECT_JS, MICRODATA_PROPS, extract_structured_data, parse_structured_data
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Static (no-browser) fetch tuning
+STATIC_FETCH_TIMEOUT = 10  # Seconds
+STATIC_MISSES_BEFORE_BROWSER_ONLY = 3
+BROWSER_ONLY_TTL = 24 * 3600  # Re-probe browser-only domains daily
+
+# Selector price vs structured-data price disagreement worth logging
+PRICE_MISMATCH_TOLERANCE = 0.01
+
+# Resolves a {field: [selectors]} plan to {field: first non-empty innerText}
+SELECTOR_PLAN_JS = """
+(plan) => {
+    const texts = {};
+    for (const [field, selectors] of Object.entries(plan)) {
+        texts[field] = null;
+        for (const selector of selectors) {
+            let el = null;
+            try { el = document.querySelector(selector); } catch (e) { continue; }
+            const text = el ? (el.innerText || '').trim() : '';
+            if (text) { texts[field] = text; break; }
+        }
+    }
+    return texts;
+}
+"""
+
+# Selector plan and structured data together, in one CDP round-trip
+BATCHED_EXTRACTION_JS = f"""
+([plan, props]) => ({{
+    texts: ({SELECTOR_PLAN_JS})(plan),
+    structured: ({COLLECT_JS})(props)
+}})
+"""
+
+# Browser page tuning
+PRICE_WAIT_TIMEOUT = 8000  # Milliseconds to wait for a price selector
+GENERIC_WAIT_TIMEOUT = 3000  # Milliseconds to wait for price markup or network idle on unknown sites
+# Price markup that client-rendered pages add after DOMContentLoaded
+GENERIC_PRICE_SELECTOR = "[itemprop='price'], meta[property='product:price:amount'], script[type='application/ld+json']"
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "amazon-adsystem.com",
+    "facebook.net",
+    "bat.bing.com",
+    "criteo.com",
+    "criteo.net",
+    "adsrvr.org",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "nr-data.net",
+    "optimizely.com",
+    "taboola.com",
+    "outbrain.com"
+]
+
+
+class StaticFetchRouting:
+    """Remembers which domains can't be scraped without a real browser"""
+
+    def __init__(self, misses_before_browser_only: int = STATIC_MISSES_BEFORE_BROWSER_ONLY,
+                 browser_only_ttl: int = BROWSER_ONLY_TTL):
+        self.misses_before_browser_only = misses_before_browser_only
+        self.browser_only_ttl = browser_only_ttl
+        self._misses: Dict[str, int] = {}
+        self._browser_only_until: Dict[str, float] = {}
+
+    def needs_browser(self, domain: str) -> bool:
+        until = self._browser_only_until.get(domain)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            # TTL expired - give the static path another chance
+            del self._browser_only_until[domain]
+            return False
+        return True
+
+    def record_hit(self, domain: str):
+        self._misses.pop(domain, None)
+
+    def record_miss(self, domain: str):
+        self._misses[domain] = self._misses.get(domain, 0) + 1
+        if self._misses[domain] >= self.misses_before_browser_only:
+            logger.info(f"{domain} needs a browser, skipping static fetch")
+            self._browser_only_until[domain] = time.monotonic() + self.browser_only_ttl
+            self._misses.pop(domain, None)
+
+
+# Shared per process so every PriceScraper learns from earlier tasks
+static_routing = StaticFetchRouting()
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return a pooled HTTP client bound to the running event loop"""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
+            timeout=STATIC_FETCH_TIMEOUT,
+            follow_redirects=True
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client():
+    """Close the pooled client (before its event loop goes away)"""
+    global _http_client, _http_client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
 
 class PriceScraper:
     """Main scraping engine for extracting product prices"""
 
-    def __init__(self, use_proxy: bool = False, proxy_url: Optional[str] = None):
+    def __init__(self, use_proxy: bool = False, proxy_url: Optional[str] = None,
+                 pool: Optional[BrowserPool] = None, scheduler: Optional[ScrapeScheduler] = None,
+                 static_fetch: bool = True, batched_extraction: bool = True):
         self.use_proxy = use_proxy
         self.proxy_url = proxy_url
         self.browser: Optional[Browser] = None
+        self.playwright = None
+
+        # Shared per-worker browser pool; when unset the scraper owns a browser
+        self.pool = pool
+
+        # Concurrency and per-domain rate limits for batch scraping
+        self.scheduler = scheduler or ScrapeScheduler()
+
+        # Try a plain HTTP fetch before paying for a browser page
+        self.static_fetch = static_fetch
+        self.routing = static_routing
 
-        # Price extraction patterns for major e-commerce sites
+        # Resolve all selectors in one page.evaluate instead of per-selector calls
+        self.batched_extraction = batched_extraction
+
+        # Price extraction patterns for major e-commerce sites.
+        # resource_allowlist: resource types or URL fragments that must load
+        # even though they would normally be blocked
         self.site_patterns = {
             "amazon.com": {
                 "price_selectors": [
@@ -34,7 +181,8 @@ class PriceScraper:
                     "[data-a-color='price'] .a-offscreen"
                 ],
                 "name_selectors": ["#productTitle", "h1.product-title"],
-                "stock_selectors": ["#availability span"]
+                "stock_selectors": ["#availability span"],
+                "resource_allowlist": []
             },
             "walmart.com": {
                 "price_selectors": [
@@ -44,7 +192,8 @@ class PriceScraper:
                     "span[data-automation-id='product-price']"
                 ],
                 "name_selectors": ["h1[itemprop='name']", "h1.prod-ProductTitle"],
-                "stock_selectors": ["[data-testid='fulfillment-badge']"]
+                "stock_selectors": ["[data-testid='fulfillment-badge']"],
+                "resource_allowlist": []
             },
             "target.com": {
                 "price_selectors": [
@@ -53,7 +202,8 @@ class PriceScraper:
                     "[data-test='product-price-current']"
                 ],
                 "name_selectors": ["[data-test='product-title']", "h1"],
-                "stock_selectors": ["[data-test='availability']"]
+                "stock_selectors": ["[data-test='availability']"],
+                "resource_allowlist": []
             },
             "ebay.com": {
                 "price_selectors": [
@@ -62,7 +212,8 @@ class PriceScraper:
                     ".display-price"
                 ],
                 "name_selectors": ["h1.x-item-title__mainTitle", ".it-ttl"],
-                "stock_selectors": [".x-quantity__availability"]
+                "stock_selectors": [".x-quantity__availability"],
+                "resource_allowlist": []
             },
             "bestbuy.com": {
                 "price_selectors": [
@@ -71,13 +222,18 @@ class PriceScraper:
                     ".pricing-price__regular-price"
                 ],
                 "name_selectors": ["h1.sku-title", ".heading-5"],
-                "stock_selectors": [".fulfillment-add-to-cart-button"]
+                "stock_selectors": [".fulfillment-add-to-cart-button"],
+                "resource_allowlist": []
             }
         }
 
     async def initialize(self):
         """Initialize Playwright browser"""
-        playwright = await async_playwright().start()
+        if self.pool:
+            await self.pool.start()
+            return
+
+        self.playwright = await async_playwright().start()
 
         launch_options = {
             "headless": True,
@@ -90,14 +246,35 @@ class PriceScraper:
         if self.use_proxy and self.proxy_url:
             launch_options["proxy"] = {"server": self.proxy_url}
 
-        self.browser = await playwright.chromium.launch(**launch_options)
+        self.browser = await self.playwright.chromium.launch(**launch_options)
         logger.info("✅ Browser initialized")
 
     async def close(self):
-        """Close browser"""
+        """Close browser (a shared pool is left running for the next task)"""
         if self.browser:
             await self.browser.close()
+            self.browser = None
             logger.info("Browser closed")
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    @asynccontextmanager
+    async def new_page(self):
+        """Open a page in an isolated context from the pool, or on the owned browser"""
+        if self.pool:
+            async with self.pool.context() as context:
+                yield await context.new_page()
+            return
+
+        if not self.browser:
+            await self.initialize()
+
+        page = await self.browser.new_page()
+        try:
+            yield page
+        finally:
+            await page.close()
 
     def extract_domain(self, url: str) -> str:
         """Extract domain from URL"""
@@ -153,6 +330,26 @@ class PriceScraper:
                 continue
         return None
 
+    async def extract_batched(self, page: Page, patterns: Dict[str, Any]):
+        """
+        Resolve the site's price/name/stock selectors and collect structured
+        data in a single page.evaluate call.
+
+        Returns:
+            ({"price": str, "name": str, "stock": str}, structured data or None)
+        """
+        plan = {
+            "price": patterns["price_selectors"],
+            "name": patterns["name_selectors"],
+            "stock": patterns["stock_selectors"]
+        }
+        try:
+            extracted = await page.evaluate(BATCHED_EXTRACTION_JS, [plan, MICRODATA_PROPS])
+        except Exception as e:
+            logger.debug(f"Batched extraction failed: {e}")
+            return {}, None
+        return extracted["texts"], parse_structured_data(extracted["structured"])
+
     async def scrape_product(self, url: str) -> Dict[str, Any]:
         """
         Scrape product information from URL
@@ -165,13 +362,12 @@ class PriceScraper:
                 "currency": str,
                 "name": str,
                 "in_stock": bool,
+                "product_identifier": str (SKU / GTIN from structured data),
                 "timestamp": datetime,
+                "source": "static" | "browser",
                 "error": str (optional)
             }
         """
-        if not self.browser:
-            await self.initialize()
-
         result = {
             "success": False,
             "url": url,
@@ -180,103 +376,240 @@ class PriceScraper:
             "name": None,
             "in_stock": None,
             "timestamp": datetime.now(),
+            "product_identifier": None,
+            "source": "browser",
             "error": None
         }
 
+        domain = self.extract_domain(url)
+        if self.static_fetch and not self.routing.needs_browser(domain):
+            if await self._scrape_static(url, result):
+                self.routing.record_hit(domain)
+                return result
+            self.routing.record_miss(domain)
+
         try:
-            # Create new page
-            page = await self.browser.new_page()
-
-            # Set user agent to avoid bot detection
-            await page.set_extra_http_headers({
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept-Language": "en-US,en;q=0.9"
-            })
-
-            # Navigate to page
-            logger.info(f"Scraping: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-
-            # Wait for page to load
-            await page.wait_for_timeout(2000)
-
-            # Detect site and use appropriate selectors
-            domain = self.extract_domain(url)
-            patterns = None
-
-            for site_domain, site_patterns in self.site_patterns.items():
-                if site_domain in domain:
-                    patterns = site_patterns
-                    break
-
-            if patterns:
-                # Extract price
-                price_text = await self.extract_with_selectors(page, patterns["price_selectors"])
-                if price_text:
-                    result["price"] = self.clean_price(price_text)
-
-                # Extract name
-                name_text = await self.extract_with_selectors(page, patterns["name_selectors"])
-                if name_text:
-                    result["name"] = name_text[:200]  # Limit length
-
-                # Extract stock status
-                stock_text = await self.extract_with_selectors(page, patterns["stock_selectors"])
-                if stock_text:
-                    stock_lower = stock_text.lower()
-                    result["in_stock"] = not any(word in stock_lower for word in ["out of stock", "unavailable", "sold out"])
+            async with self.new_page() as page:
+                await self._scrape_page(page, url, result)
+
+        except Exception as e:
+            logger.error(f"❌ Scraping error for {url}: {str(e)}")
+            result["error"] = str(e)
+
+        return result
+
+    def should_block_request(self, request_url: str, resource_type: str, allowlist: list) -> bool:
+        """Decide whether a page subresource can be skipped"""
+        if any(allowed == resource_type or allowed in request_url for allowed in allowlist):
+            return False
+        if resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        host = urlparse(request_url).netloc.lower()
+        return any(host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_DOMAINS)
+
+    async def _route_request(self, route: Route, allowlist: list):
+        request = route.request
+        try:
+            if self.should_block_request(request.url, request.resource_type, allowlist):
+                await route.abort()
             else:
-                # Generic extraction if site not recognized
-                logger.warning(f"Unknown site: {domain}, using generic extraction")
+                await route.continue_()
+        except Exception as e:
+            # Page may already be closing
+            logger.debug(f"Route handling failed for {request.url}: {e}")
+
+    async def _scrape_static(self, url: str, result: Dict[str, Any]) -> bool:
+        """Fetch url without a browser; returns True if a price was found"""
+        try:
+            response = await get_http_client().get(url)
+            if response.status_code != 200:
+                return False
+            data = extract_structured_data(response.text)
+        except Exception as e:
+            logger.debug(f"Static fetch failed for {url}: {e}")
+            return False
+
+        price = self.clean_price(data["price"]) if data and data["price"] else None
+        if price is None:
+            return False
+
+        self.apply_structured_data(result, data)
+        result["source"] = "static"
+        result["success"] = True
+        logger.info(f"✅ Scraped (static): {result['name']} - ${result['price']}")
+        return True
 
-                # Try to find price in page text using regex
+    def apply_structured_data(self, result: Dict[str, Any], data: Optional[Dict[str, Any]]):
+        """
+        Merge schema.org data into a scrape result. Fields already found by
+        site selectors are kept; a disagreeing structured price is logged and
+        recorded as structured_price.
+        """
+        if not data:
+            return
+
+        price = self.clean_price(data["price"]) if data.get("price") else None
+        if result["price"] is None:
+            result["price"] = price
+        elif price is not None and abs(price - result["price"]) > result["price"] * PRICE_MISMATCH_TOLERANCE:
+            logger.warning(
+                f"⚠️ Price mismatch for {result['url']}: selectors ${result['price']}, structured data ${price}"
+            )
+            result["structured_price"] = price
+
+        if data.get("currency"):
+            result["currency"] = data["currency"].upper()
+        if result["in_stock"] is None:
+            result["in_stock"] = data.get("in_stock")
+        if not result["name"] and data.get("name"):
+            result["name"] = data["name"][:200]
+        if data.get("sku"):
+            result["product_identifier"] = data["sku"]
+
+    async def collect_structured_data(self, page: Page) -> Optional[Dict[str, Any]]:
+        """Read JSON-LD, microdata and product meta tags in a single evaluate() call"""
+        try:
+            raw = await page.evaluate(COLLECT_JS, MICRODATA_PROPS)
+        except Exception as e:
+            logger.debug(f"Structured data collection failed: {e}")
+            return None
+        return parse_structured_data(raw)
+
+    async def wait_for_generic_price(self, page: Page):
+        """
+        Give client-rendered pages a moment after DOMContentLoaded: wait until
+        price markup appears or the network goes idle, whichever comes first
+        """
+        waits = [
+            asyncio.ensure_future(page.wait_for_selector(
+                GENERIC_PRICE_SELECTOR, state="attached", timeout=GENERIC_WAIT_TIMEOUT
+            )),
+            asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=GENERIC_WAIT_TIMEOUT))
+        ]
+        done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        for wait in pending:
+            wait.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)  # Timeouts just mean we extract what's there
+
+    async def _scrape_page(self, page: Page, url: str, result: Dict[str, Any]):
+        """Navigate an open page to url and fill in result"""
+        # Set user agent to avoid bot detection
+        await page.set_extra_http_headers({
+            "User-Agent": USER_AGENT,
+            "Accept-Language": "en-US,en;q=0.9"
+        })
+
+        # Detect site and use appropriate selectors
+        domain = self.extract_domain(url)
+        patterns = None
+
+        for site_domain, site_patterns in self.site_patterns.items():
+            if site_domain in domain:
+                patterns = site_patterns
+                break
+
+        # Skip images, fonts, media and trackers
+        allowlist = patterns.get("resource_allowlist", []) if patterns else []
+        await page.route("**/*", lambda route: self._route_request(route, allowlist))
+
+        # Navigate to page
+        logger.info(f"Scraping: {url}")
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+
+        if patterns:
+            # Wait for the first price element instead of a fixed sleep
+            try:
+                await page.wait_for_selector(
+                    ", ".join(patterns["price_selectors"]),
+                    state="attached",
+                    timeout=PRICE_WAIT_TIMEOUT
+                )
+            except PlaywrightTimeoutError:
+                logger.debug(f"No price selector appeared on {url} within {PRICE_WAIT_TIMEOUT}ms")
+
+            if self.batched_extraction:
+                texts, structured = await self.extract_batched(page, patterns)
+            else:
+                texts = {
+                    "price": await self.extract_with_selectors(page, patterns["price_selectors"]),
+                    "name": await self.extract_with_selectors(page, patterns["name_selectors"]),
+                    "stock": await self.extract_with_selectors(page, patterns["stock_selectors"])
+                }
+                structured = await self.collect_structured_data(page)
+
+            # Extract price
+            if texts.get("price"):
+                result["price"] = self.clean_price(texts["price"])
+
+            # Extract name
+            if texts.get("name"):
+                result["name"] = texts["name"][:200]  # Limit length
+
+            # Extract stock status
+            if texts.get("stock"):
+                stock_lower = texts["stock"].lower()
+                result["in_stock"] = not any(word in stock_lower for word in ["out of stock", "unavailable", "sold out"])
+
+            # Cross-check against schema.org data and fill anything selectors missed
+            self.apply_structured_data(result, structured)
+        else:
+            # Generic extraction if site not recognized: schema.org data first
+            logger.warning(f"Unknown site: {domain}, using generic extraction")
+            await self.wait_for_generic_price(page)
+            self.apply_structured_data(result, await self.collect_structured_data(page))
+
+            if result["price"] is None:
+                # Last resort: first dollar amount in the page source
                 content = await page.content()
                 price_matches = re.findall(r'\$\s*(\d+[.,]\d{2})', content)
                 if price_matches:
                     result["price"] = self.clean_price(price_matches[0])
 
-                # Try to get title
+            if not result["name"]:
                 title = await page.title()
                 result["name"] = title[:200] if title else None
 
-            # Mark success if we got a price
-            if result["price"] is not None:
-                result["success"] = True
-                logger.info(f"✅ Scraped: {result['name']} - ${result['price']}")
-            else:
-                result["error"] = "Price not found on page"
-                logger.warning(f"⚠️ No price found for {url}")
-
-            await page.close()
+        # Mark success if we got a price
+        if result["price"] is not None:
+            result["success"] = True
+            logger.info(f"✅ Scraped: {result['name']} - ${result['price']}")
+        else:
+            result["error"] = "Price not found on page"
+            logger.warning(f"⚠️ No price found for {url}")
 
+    async def _scrape_scheduled(self, url: str) -> Dict[str, Any]:
+        """Scrape one URL once the scheduler grants it a slot"""
+        try:
+            async with self.scheduler.slot(self.extract_domain(url)):
+                return await self.scrape_product(url)
         except Exception as e:
-            logger.error(f"❌ Scraping error for {url}: {str(e)}")
-            result["error"] = str(e)
-
-        return result
+            return {
+                "success": False,
+                "url": url,
+                "error": str(e),
+                "timestamp": datetime.now()
+            }
 
-    async def scrape_multiple(self, urls: list) -> list:
-        """Scrape multiple URLs concurrently"""
+    async def scrape_stream(self, urls: list) -> AsyncIterator[Dict[str, Any]]:
+        """Scrape URLs under the scheduler's limits, yielding each result as it finishes"""
         if not self.browser:
             await self.initialize()
 
-        tasks = [self.scrape_product(url) for url in urls]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Convert exceptions to error results
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                processed_results.append({
-                    "success": False,
-                    "url": urls[i],
-                    "error": str(result),
-                    "timestamp": datetime.now()
-                })
-            else:
-                processed_results.append(result)
+        tasks = [asyncio.ensure_future(self._scrape_scheduled(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def scrape_multiple(self, urls: list) -> list:
+        """Scrape multiple URLs concurrently (bounded), returned in input order"""
+        results_by_url: Dict[str, list] = {}
+        async for result in self.scrape_stream(urls):
+            results_by_url.setdefault(result["url"], []).append(result)
 
-        return processed_results
+        return [results_by_url[url].pop() for url in urls]
 
 
 # ========================================
@@ -0,0 +1,269 @@
+"""
+PriceWatch AI - Dashboard Stats Cache
+Per-user dashboard aggregates kept up to date in Redis by the write paths
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+import redis.asyncio as aioredis
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Product, PriceHistory, Alert
+import logging
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+STATS_PREFIX = "pricewatch:stats:"  # HASH per user: products, alerts, price_sum
+STATS_PRICES_PREFIX = "pricewatch:stats_prices:"  # ZSET per user: product_id -> current price
+STATS_CHANGES_PREFIX = "pricewatch:stats_changes:"  # ZSET per user: product_id -> last change (unix seconds)
+
+# Aggregates are rebuilt from the database at least this often, which bounds
+# any drift from a write that raced a rebuild
+STATS_REBUILD_TTL = 3600
+CHANGE_WINDOW = 86400  # Seconds counted by price_changes_24h
+
+# Every script is a no-op while the user's stats are cold; the next read
+# rebuilds them from the database instead.
+# KEYS: summary, prices, changes
+
+# ARGV: field, delta
+ADJUST_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+# ARGV: now, window, then product_id, price pairs
+RECORD_PRICES_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local now = tonumber(ARGV[1])
+for i = 3, #ARGV, 2 do
+    local product_id, price = ARGV[i], tonumber(ARGV[i + 1])
+    local old = tonumber(redis.call('ZSCORE', KEYS[2], product_id))
+    if old ~= price then
+        redis.call('HINCRBYFLOAT', KEYS[1], 'price_sum', price - (old or 0))
+        redis.call('ZADD', KEYS[2], price, product_id)
+        redis.call('ZADD', KEYS[3], now, product_id)
+    end
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now - tonumber(ARGV[2]))
+return 1
+"""
+
+# ARGV: product_id, enabled alerts removed with it
+REMOVE_PRODUCT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local old = tonumber(redis.call('ZSCORE', KEYS[2], ARGV[1]))
+if old then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'price_sum', -old)
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'products', -1)
+redis.call('HINCRBY', KEYS[1], 'alerts', -tonumber(ARGV[2]))
+return 1
+"""
+
+
+def _keys(user_id: str) -> List[str]:
+    return [STATS_PREFIX + user_id, STATS_PRICES_PREFIX + user_id, STATS_CHANGES_PREFIX + user_id]
+
+
+class StatsCache:
+    """
+    Incrementally maintained dashboard aggregates.
+
+    Writers report deltas (product added/removed, alerts toggled, prices
+    recorded) and the stats endpoint reads the result in one round-trip.
+    Min/max come from a per-user sorted set of current prices, the average
+    from a running sum, and the 24h count from a sorted set of change times.
+    """
+
+    def __init__(self):
+        self._redis: Optional[aioredis.Redis] = None
+        self._loop = None
+        self._scripts: Dict[str, Any] = {}
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        """Redis client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+            self._loop = loop
+            self._scripts = {
+                "adjust": self._redis.register_script(ADJUST_SCRIPT),
+                "record_prices": self._redis.register_script(RECORD_PRICES_SCRIPT),
+                "remove_product": self._redis.register_script(REMOVE_PRODUCT_SCRIPT),
+            }
+        return self._redis
+
+    async def close(self):
+        """Close the Redis client (before its event loop goes away)"""
+        if self._redis is not None:
+            await self._redis.aclose()
+        self._redis = None
+        self._loop = None
+
+    # ========================================
+    # WRITES
+    # ========================================
+
+    async def _run(self, script: str, user_id: str, args: List[Any]):
+        try:
+            client = self.redis
+            await self._scripts[script](keys=_keys(user_id), args=args, client=client)
+        except Exception as e:
+            # Stats are rebuilt on expiry; never fail a write because of them
+            logger.warning(f"⚠️ Stats cache update failed for {user_id}: {e}")
+
+    async def product_added(self, user_id: str, alerts: int = 0):
+        await self._run("adjust", user_id, ["products", 1])
+        if alerts:
+            await self.alerts_changed(user_id, alerts)
+
+    async def product_removed(self, user_id: str, product_id: str, alerts: int = 0):
+        """`alerts` is the number of enabled alerts deleted along with the product"""
+        await self._run("remove_product", user_id, [product_id, alerts])
+
+    async def alerts_changed(self, user_id: str, delta: int):
+        """Enabled alerts were added (positive delta) or removed/disabled (negative)"""
+        await self._run("adjust", user_id, ["alerts", delta])
+
+    async def prices_recorded(self, changes: List[Dict[str, Any]]):
+        """Apply the change records returned by database.save_scrape_results"""
+        by_user: Dict[str, List[Any]] = defaultdict(list)
+        for change in changes:
+            if change.get("user_id") and change.get("new_price") is not None:
+                by_user[change["user_id"]] += [change["product_id"], change["new_price"]]
+
+        now = time.time()
+        for user_id, pairs in by_user.items():
+            await self._run("record_prices", user_id, [now, CHANGE_WINDOW] + pairs)
+
+    async def invalidate(self, user_id: str):
+        """Drop a user's aggregates; the next read rebuilds them"""
+        await self.redis.delete(*_keys(user_id))
+
+    # ========================================
+    # READS
+    # ========================================
+
+    async def get(self, session: AsyncSession, user_id: str) -> Dict[str, Any]:
+        """Dashboard stats for a user, rebuilding them from the database when cold"""
+        try:
+            stats = await self._read(user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Stats cache unavailable: {e}")
+            stats = None
+        if stats is None:
+            stats = await self.rebuild(session, user_id)
+        return stats
+
+    async def _read(self, user_id: str) -> Optional[Dict[str, Any]]:
+        summary_key, prices_key, changes_key = _keys(user_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(summary_key)
+        pipe.zcard(prices_key)
+        pipe.zrange(prices_key, 0, 0, withscores=True)
+        pipe.zrange(prices_key, -1, -1, withscores=True)
+        pipe.zcount(changes_key, time.time() - CHANGE_WINDOW, "+inf")
+        summary, priced, lowest, highest, changed = await pipe.execute()
+        if not summary:
+            return None
+
+        return {
+            "total_products": int(summary.get("products", 0)),
+            "active_alerts": int(summary.get("alerts", 0)),
+            "price_changes_24h": changed,
+            "average_competitor_price": float(summary.get("price_sum", 0)) / priced if priced else None,
+            "lowest_price_found": lowest[0][1] if lowest else None,
+            "highest_price_found": highest[0][1] if highest else None
+        }
+
+    async def rebuild(self, session: AsyncSession, user_id: str) -> Dict[str, Any]:
+        """Recompute a user's aggregates from the database and cache them"""
+        prices = dict((await session.execute(
+            select(Product.id, Product.current_price)
+            .where(Product.user_id == user_id, Product.current_price.is_not(None))
+        )).all())
+        total_products = await session.scalar(
+            select(func.count()).select_from(Product).where(Product.user_id == user_id)
+        )
+        active_alerts = await session.scalar(
+            select(func.count()).select_from(Alert).where(Alert.user_id == user_id, Alert.enabled.is_(True))
+        )
+
+        # Same definition as RECORD_PRICES_SCRIPT: an observation counts when its
+        # price differs from the product's previous one. The first row in the
+        # window is compared with the last row before it.
+        yesterday = datetime.utcnow() - timedelta(seconds=CHANGE_WINDOW)
+        in_window = (
+            select(
+                PriceHistory.product_id,
+                PriceHistory.timestamp,
+                PriceHistory.price,
+                func.lag(PriceHistory.price).over(
+                    partition_by=PriceHistory.product_id,
+                    order_by=PriceHistory.timestamp
+                ).label("previous_price")
+            )
+            .where(
+                PriceHistory.product_id.in_(select(Product.id).where(Product.user_id == user_id)),
+                PriceHistory.timestamp > yesterday
+            )
+            .subquery()
+        )
+        before_window = (
+            select(PriceHistory.price)
+            .where(PriceHistory.product_id == in_window.c.product_id, PriceHistory.timestamp <= yesterday)
+            .order_by(PriceHistory.timestamp.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        recent = (await session.execute(
+            select(in_window.c.product_id, func.max(in_window.c.timestamp))
+            .where(func.coalesce(in_window.c.previous_price, before_window).is_distinct_from(in_window.c.price))
+            .group_by(in_window.c.product_id)
+        )).all()
+
+        try:
+            summary_key, prices_key, changes_key = _keys(user_id)
+            pipe = self.redis.pipeline()
+            pipe.delete(summary_key, prices_key, changes_key)
+            pipe.hset(summary_key, mapping={
+                "products": total_products,
+                "alerts": active_alerts,
+                "price_sum": sum(prices.values())
+            })
+            if prices:
+                pipe.zadd(prices_key, prices)
+            if recent:
+                # Naive UTC timestamps, as stored
+                pipe.zadd(changes_key, {
+                    product_id: (changed_at - datetime(1970, 1, 1)).total_seconds()
+                    for product_id, changed_at in recent
+                })
+            for key in (summary_key, prices_key, changes_key):
+                pipe.expire(key, STATS_REBUILD_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not cache stats for {user_id}: {e}")
+
+        return {
+            "total_products": total_products,
+            "active_alerts": active_alerts,
+            "price_changes_24h": len(recent),
+            "average_competitor_price": sum(prices.values()) / len(prices) if prices else None,
+            "lowest_price_found": min(prices.values()) if prices else None,
+            "highest_price_found": max(prices.values()) if prices else None
+        }
+
+
+stats_cache = StatsCache()
@@ -0,0 +1,196 @@
+"""
+PriceWatch AI - Structured Data Extraction
+Read schema.org Product/Offer data (JSON-LD, microdata, OpenGraph) in one pass
+"""
+
+import json
+from typing import Optional, Dict, Any, List
+from bs4 import BeautifulSoup
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Microdata properties worth collecting
+MICRODATA_PROPS = [
+    "price", "lowPrice", "priceCurrency", "availability",
+    "sku", "mpn", "gtin13", "gtin12", "gtin", "productID", "name"
+]
+
+IDENTIFIER_KEYS = ["sku", "mpn", "gtin13", "gtin12", "gtin", "productID"]
+
+IN_STOCK_VALUES = {"instock", "limitedavailability", "onlineonly", "instoreonly", "presale", "preorder", "in stock"}
+OUT_OF_STOCK_VALUES = {"outofstock", "soldout", "discontinued", "out of stock", "oos"}
+
+# Collects the same raw structure as collect_from_html, inside the page, in a
+# single evaluate() call
+COLLECT_JS = """
+(props) => {
+    const out = {json_ld: [], microdata: {}, meta: {}};
+    document.querySelectorAll('script[type="application/ld+json"]').forEach(
+        s => out.json_ld.push(s.textContent)
+    );
+    for (const el of document.querySelectorAll('[itemprop]')) {
+        const scope = el.closest('[itemscope]');
+        const type = scope ? (scope.getAttribute('itemtype') || '') : '';
+        for (const prop of el.getAttribute('itemprop').split(/\\s+/)) {
+            if (!props.includes(prop) || prop in out.microdata) continue;
+            if (prop === 'name' && !type.includes('Product')) continue;
+            out.microdata[prop] = el.getAttribute('content') || el.getAttribute('href') || el.textContent.trim();
+        }
+    }
+    document.querySelectorAll('meta[property^="product:"], meta[property^="og:"]').forEach(
+        m => { out.meta[m.getAttribute('property')] = m.getAttribute('content'); }
+    );
+    return out;
+}
+"""
+
+
+def collect_from_html(html: str) -> Dict[str, Any]:
+    """Gather raw JSON-LD blocks, microdata props and meta tags from HTML"""
+    soup = BeautifulSoup(html, "lxml")
+    raw: Dict[str, Any] = {"json_ld": [], "microdata": {}, "meta": {}}
+
+    for script in soup.find_all("script", type="application/ld+json"):
+        raw["json_ld"].append(script.string or "")
+
+    for el in soup.find_all(attrs={"itemprop": True}):
+        scope = el if el.has_attr("itemscope") else el.find_parent(attrs={"itemscope": True})
+        scope_type = scope.get("itemtype", "") if scope else ""
+        for prop in el["itemprop"].split():
+            if prop not in MICRODATA_PROPS or prop in raw["microdata"]:
+                continue
+            if prop == "name" and "Product" not in scope_type:
+                continue
+            raw["microdata"][prop] = el.get("content") or el.get("href") or el.get_text(strip=True)
+
+    for meta in soup.find_all("meta", property=True):
+        prop = meta["property"]
+        if prop.startswith("product:") or prop.startswith("og:"):
+            raw["meta"][prop] = meta.get("content")
+
+    return raw
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _iter_json_ld_nodes(data) -> List[Dict[str, Any]]:
+    """Flatten JSON-LD documents, including @graph containers, into nodes"""
+    nodes = []
+    for item in _as_list(data):
+        if not isinstance(item, dict):
+            continue
+        nodes.append(item)
+        nodes.extend(_iter_json_ld_nodes(item.get("@graph")))
+    return nodes
+
+
+def _offer_price(offer: Dict[str, Any]):
+    spec = offer.get("priceSpecification")
+    spec_price = spec.get("price") if isinstance(spec, dict) else None
+    return offer.get("price", offer.get("lowPrice", spec_price))
+
+
+def _first_offer(offers) -> Optional[Dict[str, Any]]:
+    """Return the first offer (searching AggregateOffer nesting) that has a price"""
+    for offer in _as_list(offers):
+        if not isinstance(offer, dict):
+            continue
+        if _offer_price(offer) is not None:
+            return offer
+        nested = _first_offer(offer.get("offers"))
+        if nested:
+            return nested
+    return None
+
+
+def parse_availability(value: Optional[str]) -> Optional[bool]:
+    """Map schema.org / OpenGraph availability values to in_stock"""
+    if not value:
+        return None
+    normalized = str(value).rsplit("/", 1)[-1].strip().lower()
+    if normalized in IN_STOCK_VALUES:
+        return True
+    if normalized in OUT_OF_STOCK_VALUES:
+        return False
+    return None
+
+
+def parse_structured_data(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Resolve collected structured data into product fields.
+    JSON-LD wins over microdata, which wins over OpenGraph.
+
+    Returns:
+        {
+            "price": str or None,
+            "currency": str or None,
+            "availability": str or None,
+            "in_stock": bool or None,
+            "sku": str or None,
+            "name": str or None
+        }
+        or None if the page has no product data at all
+    """
+    data: Dict[str, Any] = {
+        "price": None, "currency": None, "availability": None,
+        "in_stock": None, "sku": None, "name": None
+    }
+
+    def fill(key, value):
+        if data[key] is None and value not in (None, ""):
+            data[key] = str(value).strip()
+
+    # 1. JSON-LD Product nodes
+    for text in raw.get("json_ld", []):
+        try:
+            document = json.loads(text)
+        except (ValueError, TypeError):
+            continue
+        for node in _iter_json_ld_nodes(document):
+            if "Product" not in _as_list(node.get("@type")):
+                continue
+            fill("name", node.get("name"))
+            for key in IDENTIFIER_KEYS:
+                fill("sku", node.get(key))
+
+            offer = _first_offer(node.get("offers"))
+            if offer:
+                fill("price", _offer_price(offer))
+                fill("currency", offer.get("priceCurrency"))
+                fill("availability", offer.get("availability"))
+                fill("sku", offer.get("sku"))
+        if data["price"] is not None:
+            break
+
+    # 2. Microdata
+    microdata = raw.get("microdata", {})
+    fill("price", microdata.get("price") or microdata.get("lowPrice"))
+    fill("currency", microdata.get("priceCurrency"))
+    fill("availability", microdata.get("availability"))
+    fill("name", microdata.get("name"))
+    for key in IDENTIFIER_KEYS:
+        fill("sku", microdata.get(key))
+
+    # 3. OpenGraph product tags
+    meta = raw.get("meta", {})
+    fill("price", meta.get("product:price:amount"))
+    fill("currency", meta.get("product:price:currency"))
+    fill("availability", meta.get("product:availability") or meta.get("og:availability"))
+    fill("sku", meta.get("product:retailer_item_id"))
+    fill("name", meta.get("og:title"))
+
+    if all(value is None for value in data.values()):
+        return None
+
+    data["in_stock"] = parse_availability(data["availability"])
+    return data
+
+
+def extract_structured_data(html: str) -> Optional[Dict[str, Any]]:
+    """Extract product fields from server-rendered HTML without running JavaScript"""
+    return parse_structured_data(collect_from_html(html))
@@ -5,9 +5,12 @@ Automated price checking and alert processing
 
 from celery import Celery
 from celery.schedules import crontab
-import asyncio
-from datetime import datetime, timedelta
-from typing import List
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+from datetime import datetime
+from typing import List, Dict, Optional
+from urllib.parse import urlparse
+import random
+from worker_loop import WORKER_ASYNC_MODE, WORKER_TASK_TIMEOUT, close_loop_clients, get_worker_loop, run_async
 import logging
 
 # Initialize Celery
@@ -28,40 +31,124 @@ celery_app.conf.update(
     task_time_limit=300,  # 5 minutes max per task
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    # Webhooks go to their own workers so slow customer endpoints never hold scrape slots
+    task_routes={
+        "tasks.trigger_webhook": {"queue": "webhooks"},
+        "tasks.flush_webhook_batch": {"queue": "webhooks"},
+    },
 )
 
 logger = logging.getLogger(__name__)
 
 
+# ========================================
+# WORKER PROCESS LIFECYCLE
+# ========================================
+
+# Queues whose tasks never scrape; workers consuming only these skip Chromium
+NON_SCRAPING_QUEUES = {"webhooks"}
+
+
+@worker_process_init.connect
+def start_worker_loop(**kwargs):
+    """Start the shared event loop and launch pooled browsers when a worker child starts"""
+    from browser_pool import get_browser_pool
+
+    if WORKER_ASYNC_MODE == "shared":
+        run_async(get_browser_pool().warm_up())
+
+
+@worker_ready.connect
+def start_worker_loop_in_process(sender=None, **kwargs):
+    """
+    worker_process_init only fires in prefork/solo pool children. Under
+    --pool=threads tasks run in the main worker process, so start there once
+    the consumer is ready.
+    """
+    from celery.concurrency.thread import TaskPool as ThreadTaskPool
+
+    if not isinstance(getattr(sender, "pool", None), ThreadTaskPool):
+        return
+    task_consumer = getattr(sender, "task_consumer", None)
+    queues = {queue.name for queue in task_consumer.queues} if task_consumer else set()
+    if queues and queues <= NON_SCRAPING_QUEUES:
+        return
+    start_worker_loop()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_worker_loop(**kwargs):
+    """
+    Close pooled browsers and HTTP clients and stop the shared loop before the
+    worker exits. Under --pool=threads, worker_shutdown is sent in the main
+    process after the task threads have been joined.
+    """
+    from browser_pool import shutdown_browser_pool
+
+    loop = get_worker_loop()
+    if loop.running:
+        run_async(shutdown_browser_pool())
+        run_async(close_loop_clients())
+        loop.stop()
+
+
+def make_scraper():
+    """Scraper wired to this worker's shared browser pool and scheduler"""
+    from scraper import PriceScraper
+    from browser_pool import get_browser_pool
+    from throttle import get_scrape_scheduler
+
+    if WORKER_ASYNC_MODE == "isolated":
+        return PriceScraper()
+    return PriceScraper(pool=get_browser_pool(), scheduler=get_scrape_scheduler())
+
+
+async def scrape_url(url: str) -> dict:
+    """Scrape one URL; close() leaves a shared pool running for the next task"""
+    scraper = make_scraper()
+    try:
+        async with scraper.scheduler.slot(scraper.extract_domain(url)):
+            return await scraper.scrape_product(url)
+    finally:
+        await scraper.close()
+
+
 # ========================================
 # PERIODIC TASKS SCHEDULE
 # ========================================
 
+# How often the due-time scheduler looks for products to check (seconds)
+DUE_DISPATCH_INTERVAL = 10
+
+# Targets per batch task (all from the same domain); rate-limited domains get
+# smaller batches so a batch finishes well within WORKER_TASK_TIMEOUT
+SCRAPE_BATCH_SIZE = 25
+SCRAPE_BATCH_TIME_BUDGET = WORKER_TASK_TIMEOUT / 2  # Seconds of scraping planned per batch
+SCRAPE_SECONDS_ESTIMATE = 15  # Typical browser scrape, used to size batches
+
+# Results are saved every SCRAPE_SAVE_CHUNK_SIZE completed scrapes, so a batch
+# that is cut off keeps what it has already scraped
+SCRAPE_SAVE_CHUNK_SIZE = 5
+
 celery_app.conf.beat_schedule = {
-    # Check prices every 15 minutes for Business tier
-    "check-business-tier-prices": {
-        "task": "tasks.check_products_by_tier",
-        "schedule": crontab(minute="*/15"),
-        "args": ("business",)
-    },
-    # Check prices hourly for Professional tier
-    "check-professional-tier-prices": {
-        "task": "tasks.check_products_by_tier",
-        "schedule": crontab(minute=0),
-        "args": ("professional",)
-    },
-    # Check prices daily for Starter tier
-    "check-starter-tier-prices": {
-        "task": "tasks.check_products_by_tier",
-        "schedule": crontab(hour=9, minute=0),  # 9 AM UTC
-        "args": ("starter",)
+    # Dispatch products whose check_interval has elapsed (all tiers,
+    # including Enterprise's 60s interval), spread across the window
+    "dispatch-due-products": {
+        "task": "tasks.dispatch_due_products",
+        "schedule": float(DUE_DISPATCH_INTERVAL),
     },
     # Generate weekly reports
     "generate-weekly-reports": {
         "task": "tasks.generate_all_weekly_reports",
         "schedule": crontab(day_of_week=1, hour=10, minute=0),  # Monday 10 AM
     },
-    # Clean up old price history (keep 90 days)
+    # Keep price_history partitions created a few months ahead
+    "ensure-price-history-partitions": {
+        "task": "tasks.ensure_price_history_partitions",
+        "schedule": crontab(hour=1, minute=30),  # Daily, 1:30 AM
+    },
+    # Clean up old price history (drop expired monthly partitions)
     "cleanup-old-data": {
         "task": "tasks.cleanup_old_price_history",
         "schedule": crontab(day_of_month=1, hour=2, minute=0),  # 1st of month, 2 AM
@@ -83,47 +170,66 @@ celery_app.conf.beat_schedule = {
 # PRICE CHECKING TASKS
 # ========================================
 
+async def trigger_alerts(changes: List[dict]):
+    """Evaluate alerts for saved price changes; failures never undo the price write"""
+    from alerts import check_and_trigger_alerts
+
+    try:
+        await check_and_trigger_alerts(changes)
+    except Exception as e:
+        logger.error(f"❌ Alert evaluation failed: {str(e)}")
+
+
+async def check_and_record(url: str, product_ids: List[str]) -> dict:
+    """Scrape a target once and fan the result out to every subscribed product"""
+    from database import SessionLocal, save_scrape_result
+    from stats_cache import stats_cache
+
+    result = await scrape_url(url)
+
+    if result["success"]:
+        async with SessionLocal() as session:
+            changes = await save_scrape_result(session, product_ids, result)
+            await session.commit()
+        await stats_cache.prices_recorded(changes)
+        await trigger_alerts(changes)
+
+    return result
+
+
 @celery_app.task(name="tasks.check_single_product")
 def check_single_product(product_id: str):
     """
     Check price for a single product
-    This is the core task that gets called repeatedly
+    Used for on-demand checks (e.g. right after a product is added)
     """
-    from scraper import PriceScraper
-    # from database import get_product, save_price_history, update_product_price
-    # from alerts import check_and_trigger_alerts
+    from canonical_url import canonicalize_url
+    from database import SessionLocal, get_product
 
     logger.info(f"Checking price for product: {product_id}")
 
     try:
-        # Get product from database
-        # product = get_product(product_id)
-        # For now, mock data
-        product = {
-            "id": product_id,
-            "url": "https://www.amazon.com/dp/B0BSHF7WHW",
-            "user_id": "user_123"
-        }
+        async def load_url():
+            async with SessionLocal() as session:
+                product = await get_product(session, product_id)
+                return product.url if product else None
 
-        # Scrape price
-        scraper = PriceScraper()
-        result = asyncio.run(scraper.scrape_product(product["url"]))
-        asyncio.run(scraper.close())
-
-        if result["success"]:
-            # Save to database
-            # save_price_history(product_id, result)
-            # update_product_price(product_id, result["price"])
+        url = run_async(load_url())
+        if not url:
+            return {"success": False, "product_id": product_id, "error": "Product not found"}
 
-            # Check if alerts should be triggered
-            # check_and_trigger_alerts(product_id, result["price"])
+        # Scrape on the worker's shared loop and browser pool, then save
+        target, _ = canonicalize_url(url)
+        result = run_async(check_and_record(target, [product_id]))
 
+        if result["success"]:
             logger.info(f"✅ Price updated for {product_id}: ${result['price']}")
             return {
                 "success": True,
                 "product_id": product_id,
                 "price": result["price"],
-                "name": result["name"]
+                "name": result["name"],
+                "product_identifier": result.get("product_identifier")
             }
         else:
             logger.error(f"❌ Failed to scrape {product_id}: {result.get('error')}")
@@ -134,87 +240,296 @@ def check_single_product(product_id: str):
         return {"success": False, "product_id": product_id, "error": str(e)}
 
 
+@celery_app.task(name="tasks.check_target")
+def check_target(target: str):
+    """
+    Scrape one canonical target and record the price for all its subscribers
+    This is the core task that gets called repeatedly
+    """
+    from due_scheduler import get_due_scheduler
+
+    product_ids = get_due_scheduler().subscribers(target)
+    if not product_ids:
+        return {"success": False, "target": target, "error": "No subscribers"}
+
+    logger.info(f"Checking {target} for {len(product_ids)} products")
+
+    try:
+        result = run_async(check_and_record(target, product_ids))
+
+        if result["success"]:
+            logger.info(f"✅ Price updated for {target}: ${result['price']} ({len(product_ids)} products)")
+            return {"success": True, "target": target, "price": result["price"], "products": len(product_ids)}
+        else:
+            logger.error(f"❌ Failed to scrape {target}: {result.get('error')}")
+            return {"success": False, "target": target, "error": result.get("error")}
+
+    except Exception as e:
+        logger.error(f"❌ Error checking target {target}: {str(e)}")
+        return {"success": False, "target": target, "error": str(e)}
+
+
+async def save_batch_chunk(subscribers: Dict[str, List[str]], results: List[dict]):
+    """Save one chunk of batch results in its own transaction, then update stats and alerts"""
+    from database import SessionLocal, save_scrape_results
+    from stats_cache import stats_cache
+
+    async with SessionLocal() as session:
+        changes = await save_scrape_results(
+            session, [(subscribers[result["url"]], result) for result in results]
+        )
+        await session.commit()
+    await stats_cache.prices_recorded(changes)
+    await trigger_alerts(changes)
+
+
+async def check_and_record_batch(subscribers: Dict[str, List[str]]) -> List[dict]:
+    """
+    Scrape a batch of targets through one shared browser, saving results
+    every SCRAPE_SAVE_CHUNK_SIZE completions rather than at the end
+    """
+    scraper = make_scraper()
+    results = []
+    pending = []
+    try:
+        async for result in scraper.scrape_stream(list(subscribers)):
+            results.append(result)
+            pending.append(result)
+            if len(pending) >= SCRAPE_SAVE_CHUNK_SIZE:
+                await save_batch_chunk(subscribers, pending)
+                pending = []
+    finally:
+        await scraper.close()
+
+    if pending:
+        await save_batch_chunk(subscribers, pending)
+    return results
+
+
+def batch_size_for(domain: str) -> int:
+    """
+    Targets per batch for a domain. A scrape takes at least one rate token
+    and shares SCRAPE_PER_DOMAIN_CONCURRENCY slots, so the slower of the two
+    bounds how many fit in SCRAPE_BATCH_TIME_BUDGET.
+    """
+    from throttle import rate_for_domain, SCRAPE_PER_DOMAIN_CONCURRENCY
+
+    rate = rate_for_domain(domain)
+    seconds_per_target = SCRAPE_SECONDS_ESTIMATE / max(1, SCRAPE_PER_DOMAIN_CONCURRENCY)
+    if rate:
+        seconds_per_target = max(seconds_per_target, 1 / rate)
+    return max(1, min(SCRAPE_BATCH_SIZE, int(SCRAPE_BATCH_TIME_BUDGET / seconds_per_target)))
+
+
+def chunk_by_domain(targets: List[str], size: Optional[int] = None) -> List[List[str]]:
+    """Group targets by domain, then split each group into batches (sized per domain unless `size` is given)"""
+    by_domain: Dict[str, List[str]] = {}
+    for target in targets:
+        domain = urlparse(target).netloc.lower().replace("www.", "")
+        by_domain.setdefault(domain, []).append(target)
+
+    batches = []
+    for domain, domain_targets in by_domain.items():
+        domain_size = size or batch_size_for(domain)
+        batches += [domain_targets[i:i + domain_size] for i in range(0, len(domain_targets), domain_size)]
+    return batches
+
+
+def dispatch_batches(subscribers: Dict[str, List[str]], spread: float = 0) -> int:
+    """Queue one check_target_batch per domain chunk; returns the number of batches"""
+    batches = chunk_by_domain(list(subscribers))
+    for batch in batches:
+        check_target_batch.apply_async(
+            args=({target: subscribers[target] for target in batch},),
+            countdown=random.uniform(0, spread) if spread else 0
+        )
+    return len(batches)
+
+
+async def load_subscribers(tier: Optional[str] = None,
+                           product_ids: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    """Group active products from the database by canonical target"""
+    from canonical_url import canonicalize_url
+    from database import SessionLocal, get_active_products
+
+    async with SessionLocal() as session:
+        products = await get_active_products(session, tier=tier, product_ids=product_ids)
+
+    subscribers: Dict[str, List[str]] = {}
+    for product in products:
+        target, _ = canonicalize_url(product.url)
+        subscribers.setdefault(target, []).append(product.id)
+    return subscribers
+
+
+@celery_app.task(name="tasks.check_target_batch", ignore_result=True)
+def check_target_batch(subscribers: Dict[str, List[str]]):
+    """
+    Scrape a same-domain batch of targets and write results back in bulk
+    subscribers: canonical target -> subscribed product IDs
+    """
+    logger.info(f"Checking batch of {len(subscribers)} targets")
+
+    try:
+        results = run_async(check_and_record_batch(subscribers))
+        succeeded = sum(1 for result in results if result.get("success"))
+        logger.info(f"✅ Batch done: {succeeded}/{len(results)} targets priced")
+        return {"success": True, "targets": len(results), "priced": succeeded}
+
+    except Exception as e:
+        logger.error(f"❌ Batch check failed: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@celery_app.task(name="tasks.dispatch_due_products")
+def dispatch_due_products():
+    """
+    Queue checks for every scrape target that is due
+    Called by periodic schedule; due targets are batched by domain and each
+    batch is delayed by a random fraction of the dispatch window so checks
+    don't all start at once
+    """
+    from due_scheduler import get_due_scheduler, DISPATCH_BATCH_LIMIT
+
+    scheduler = get_due_scheduler()
+    targets_queued = batch_count = 0
+    # Claimed targets are rescheduled into the future, so this drains the
+    # backlog and stops; one claim per tick would cap throughput at
+    # DISPATCH_BATCH_LIMIT targets per interval
+    while True:
+        targets = scheduler.claim_due(limit=DISPATCH_BATCH_LIMIT)
+        subscribers = {
+            target: product_ids
+            for target, product_ids in scheduler.subscribers_many(targets).items()
+            if product_ids
+        }
+        batch_count += dispatch_batches(subscribers, spread=DUE_DISPATCH_INTERVAL)
+        targets_queued += len(subscribers)
+        if len(targets) < DISPATCH_BATCH_LIMIT:
+            break
+
+    if targets_queued:
+        logger.info(f"Dispatched {targets_queued} due targets in {batch_count} batches")
+    return {"targets_queued": targets_queued, "batches": batch_count}
+
+
 @celery_app.task(name="tasks.check_products_by_tier")
 def check_products_by_tier(tier: str):
     """
     Check all products for users in a specific pricing tier
-    Called by periodic schedule
+    Manual/backfill use; routine checks go through dispatch_due_products
     """
     logger.info(f"Checking products for tier: {tier}")
 
-    # from database import get_products_by_tier
-
-    # Mock: get product IDs
-    # product_ids = get_products_by_tier(tier)
-    product_ids = []  # Will be populated from database
+    subscribers = run_async(load_subscribers(tier=tier))
+    batch_count = dispatch_batches(subscribers)
 
-    # Queue individual tasks
-    for product_id in product_ids:
-        check_single_product.delay(product_id)
-
-    logger.info(f"Queued {len(product_ids)} products for tier {tier}")
-    return {"tier": tier, "products_queued": len(product_ids)}
+    product_count = sum(len(product_ids) for product_ids in subscribers.values())
+    logger.info(f"Queued {product_count} products for tier {tier} in {batch_count} batches")
+    return {"tier": tier, "products_queued": product_count, "batches": batch_count}
 
 
 @celery_app.task(name="tasks.check_multiple_products")
 def check_multiple_products(product_ids: List[str]):
     """
-    Check multiple products in parallel
+    Check multiple products in domain batches
     Useful for bulk operations
     """
-    from celery import group
-
-    job = group(check_single_product.s(pid) for pid in product_ids)
-    results = job.apply_async()
+    subscribers = run_async(load_subscribers(product_ids=product_ids))
+    batch_count = dispatch_batches(subscribers)
 
-    return {"total": len(product_ids), "task_id": results.id}
+    return {"total": len(product_ids), "targets": len(subscribers), "batches": batch_count}
 
 
 # ========================================
 # ALERT TASKS
 # ========================================
 
-@celery_app.task(name="tasks.send_price_alert_email")
-def send_price_alert_email(user_email: str, product_name: str, old_price: float, new_price: float, alert_type: str):
-    """Send price alert email to user"""
-    # from email_service import send_alert_email
+@celery_app.task(name="tasks.send_price_alert_emails", bind=True, max_retries=None)
+def send_price_alert_emails(self, alerts: List[dict]):
+    """
+    Send a batch of alert emails, up to 1000 recipients per SendGrid request.
+    Alerts whose request failed transiently (429/5xx/network) are retried
+    with backoff; addresses SendGrid rejects are dropped.
+    """
+    from email_service import email_service, EMAIL_MAX_RETRIES, EMAIL_RETRY_BACKOFF
 
-    logger.info(f"Sending alert to {user_email} for {product_name}")
+    logger.info(f"Sending {len(alerts)} alert emails")
 
-    try:
-        # Mock email sending
-        # send_alert_email(user_email, {
-        #     "product_name": product_name,
-        #     "old_price": old_price,
-        #     "new_price": new_price,
-        #     "alert_type": alert_type
-        # })
+    result = email_service.send_price_alerts_bulk(alerts)
+    if not result.retry:
+        return {"success": True, "sent": result.sent}
 
-        logger.info(f"✅ Alert email sent to {user_email}")
-        return {"success": True, "email": user_email}
+    attempt = self.request.retries
+    if attempt >= EMAIL_MAX_RETRIES:
+        logger.error(f"❌ Gave up on {len(result.retry)} alert emails after {attempt + 1} attempts")
+        return {"success": False, "sent": result.sent, "failed": len(result.retry)}
 
-    except Exception as e:
-        logger.error(f"❌ Failed to send email to {user_email}: {str(e)}")
-        return {"success": False, "error": str(e)}
+    countdown = EMAIL_RETRY_BACKOFF * 2 ** attempt
+    logger.warning(f"⚠️ Retrying {len(result.retry)} alert emails in {countdown}s")
+    raise self.retry(args=(), kwargs={"alerts": result.retry}, countdown=countdown)
+
+
+@celery_app.task(name="tasks.send_price_alert_email", ignore_result=True)
+def send_price_alert_email(alert, product_name: Optional[str] = None, old_price: Optional[float] = None,
+                           new_price: Optional[float] = None, alert_type: Optional[str] = None):
+    """
+    Deprecated: forwards one alert to send_price_alert_emails. Kept for one
+    release so messages queued by older workers (user_email, product_name,
+    old_price, new_price, alert_type) are still delivered.
+    """
+    if not isinstance(alert, dict):
+        alert = {"email": alert, "product_name": product_name, "old_price": old_price,
+                 "new_price": new_price, "alert_type": alert_type}
+    send_price_alert_emails.delay([alert])
 
 
-@celery_app.task(name="tasks.trigger_webhook")
-def trigger_webhook(webhook_url: str, payload: dict):
-    """Trigger webhook for price alert (Premium feature)"""
-    import httpx
+@celery_app.task(name="tasks.trigger_webhook", bind=True, max_retries=None, ignore_result=True)
+def trigger_webhook(self, webhook_id: str, event: str, payload: dict, delivery_id: Optional[str] = None):
+    """
+    Deliver one signed webhook event (Premium feature). Runs on the
+    "webhooks" queue; failed attempts are retried with exponential backoff
+    and the same delivery ID, so receivers can de-duplicate.
+    """
+    from webhooks import (deliver, new_delivery_id, retry_delay, WebhookDeliveryError,
+                          CircuitOpenError, WEBHOOK_MAX_RETRIES)
 
-    logger.info(f"Triggering webhook: {webhook_url}")
+    delivery_id = delivery_id or new_delivery_id()
+    attempt = self.request.retries
+    final_attempt = attempt >= WEBHOOK_MAX_RETRIES
+    retry_kwargs = {"webhook_id": webhook_id, "event": event, "payload": payload, "delivery_id": delivery_id}
 
     try:
-        response = httpx.post(webhook_url, json=payload, timeout=10)
-        response.raise_for_status()
+        result = run_async(deliver(webhook_id, event, payload, delivery_id, final_attempt=final_attempt))
+        if result["success"]:
+            logger.info(f"✅ Webhook {webhook_id} delivered: {result['status_code']}")
+        return result
 
-        logger.info(f"✅ Webhook delivered: {response.status_code}")
-        return {"success": True, "status_code": response.status_code}
+    except WebhookDeliveryError as e:
+        if final_attempt:
+            logger.error(f"❌ Webhook {webhook_id} failed after {attempt + 1} attempts: {str(e)}")
+            return {"success": False, "webhook_id": webhook_id, "error": str(e)}
 
-    except Exception as e:
-        logger.error(f"❌ Webhook failed: {str(e)}")
-        return {"success": False, "error": str(e)}
+        countdown = e.retry_after if isinstance(e, CircuitOpenError) else retry_delay(attempt)
+        logger.warning(f"⚠️ Webhook {webhook_id} attempt {attempt + 1} failed ({e}); retrying in {countdown:.0f}s")
+        raise self.retry(args=(), kwargs=retry_kwargs, countdown=countdown)
+
+
+@celery_app.task(name="tasks.flush_webhook_batch", ignore_result=True)
+def flush_webhook_batch(webhook_id: str, max_events: int, window_seconds: int):
+    """Deliver a batching webhook's buffered events as one JSON array"""
+    from webhooks import webhook_buffer, BATCH_EVENT
+
+    events, remaining = run_async(webhook_buffer.take(webhook_id, max_events))
+    if events:
+        logger.info(f"Flushing {len(events)} events to webhook {webhook_id}")
+        trigger_webhook.delay(webhook_id, BATCH_EVENT, events)
+
+    # Events that arrived after this flush was scheduled need a flush of their own
+    if remaining >= max_events:
+        flush_webhook_batch.delay(webhook_id, max_events, window_seconds)
+    elif remaining:
+        flush_webhook_batch.apply_async(args=[webhook_id, max_events, window_seconds], countdown=window_seconds)
 
 
 # ========================================
@@ -268,20 +583,52 @@ def generate_all_weekly_reports():
 # MAINTENANCE TASKS
 # ========================================
 
+async def run_partition_maintenance(operation, **kwargs) -> List[str]:
+    from database import engine
+
+    async with engine.begin() as conn:
+        return await operation(conn, **kwargs)
+
+
+async def expire_hourly_rollups() -> int:
+    from database import SessionLocal
+    from rollups import expire_rollups
+
+    async with SessionLocal() as session:
+        deleted = await expire_rollups(session)
+        await session.commit()
+    return deleted
+
+
+@celery_app.task(name="tasks.ensure_price_history_partitions")
+def ensure_price_history_partitions():
+    """Create next months' price_history partitions before any row needs them"""
+    from partitions import ensure_partitions
+
+    try:
+        created = run_async(run_partition_maintenance(ensure_partitions))
+        return {"success": True, "created": created}
+
+    except Exception as e:
+        logger.error(f"❌ Partition maintenance failed: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
 @celery_app.task(name="tasks.cleanup_old_price_history")
-def cleanup_old_price_history(days_to_keep: int = 90):
-    """Delete price history older than X days to save storage"""
-    # from database import delete_old_price_history
+def cleanup_old_price_history(days_to_keep: Optional[int] = None):
+    """Drop (or detach) price_history partitions older than X days to save storage"""
+    from partitions import expire_partitions, PRICE_HISTORY_RETENTION_DAYS
 
+    if days_to_keep is None:
+        days_to_keep = PRICE_HISTORY_RETENTION_DAYS
     logger.info(f"Cleaning up price history older than {days_to_keep} days")
 
     try:
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-        # deleted_count = delete_old_price_history(cutoff_date)
-
-        deleted_count = 0  # Mock
-        logger.info(f"✅ Deleted {deleted_count} old price records")
-        return {"success": True, "deleted_count": deleted_count}
+        removed = run_async(run_partition_maintenance(expire_partitions, days_to_keep=days_to_keep))
+        logger.info(f"✅ Removed {len(removed)} expired price history partitions")
+        expired_buckets = run_async(expire_hourly_rollups())
+        logger.info(f"✅ Deleted {expired_buckets} expired hourly rollups")
+        return {"success": True, "removed_partitions": removed, "expired_rollups": expired_buckets}
 
     except Exception as e:
         logger.error(f"❌ Cleanup failed: {str(e)}")
@@ -353,17 +700,11 @@ def health_check():
 @celery_app.task(name="tasks.test_scraper")
 def test_scraper(url: str):
     """Test scraping a single URL (for debugging)"""
-    from scraper import PriceScraper
-
-    scraper = PriceScraper()
-    result = asyncio.run(scraper.scrape_product(url))
-    asyncio.run(scraper.close())
-
-    return result
+    return run_async(scrape_url(url))
 
 
 if __name__ == "__main__":
-    # Start worker: celery -A tasks worker --loglevel=info
+    # Start worker: celery -A tasks worker --pool=threads --concurrency=32 --loglevel=info
     # Start beat: celery -A tasks beat --loglevel=info
     print("PriceWatch AI - Celery Tasks Loaded")
-    print("Run with: celery -A tasks worker --loglevel=info")
+    print("Run with: celery -A tasks worker --pool=threads --concurrency=32 --loglevel=info")
@@ -0,0 +1,9 @@
+"""
+PriceWatch AI - Test Configuration
+Backend modules import each other by bare name, so tests run with backend/ on the path
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+import fakeredis
+import pytest
+import pytest_asyncio
+from alerts import AlertIndex, ALERT_DEBOUNCE_PREFIX, _key
+from models import AlertType
+
+
+def _alert(alert_id, alert_type, threshold=None, threshold_is_percent=True, product_id="prod_1", enabled=True):
+    return SimpleNamespace(id=alert_id, product_id=product_id, alert_type=alert_type.value, threshold=threshold,
+                           threshold_is_percent=threshold_is_percent, enabled=enabled)
+
+
+ALERTS = [
+    _alert("below_90", AlertType.THRESHOLD, 90.0),
+    _alert("below_50", AlertType.THRESHOLD, 50.0),
+    _alert("any_drop", AlertType.PRICE_DROP),
+    _alert("drop_20pct", AlertType.PRICE_DROP, 20.0),
+    _alert("drop_5_dollars", AlertType.PRICE_DROP, 5.0, threshold_is_percent=None),
+    _alert("rise_10pct", AlertType.PRICE_INCREASE, 10.0),
+    _alert("rise_15_dollars", AlertType.PRICE_INCREASE, 15.0, threshold_is_percent=None),
+    _alert("restock", AlertType.STOCK_CHANGE),
+]
+
+
+class FakeSession:
+    def __init__(self, alerts):
+        self.alerts = alerts
+        self.queries = 0
+
+    async def scalars(self, query):
+        self.queries += 1
+        return SimpleNamespace(all=lambda: self.alerts)
+
+
+@pytest_asyncio.fixture
+async def index():
+    index = AlertIndex()
+    index._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    index._loop = asyncio.get_running_loop()
+    await index.load(FakeSession(ALERTS), ["prod_1"])
+    return index
+
+
+def _price(old_price, new_price):
+    return {"product_id": "prod_1", "old_price": old_price, "new_price": new_price}
+
+
+@pytest.mark.asyncio
+async def test_drop_fires_crossed_thresholds_and_big_enough_drops(index):
+    fired = await index.crossed([_price(100.0, 88.0)])
+    assert set(fired) == {"below_90", "any_drop", "drop_5_dollars"}
+
+    fired = await index.crossed([_price(100.0, 50.0)])
+    assert set(fired) == {"below_90", "below_50", "any_drop", "drop_20pct", "drop_5_dollars"}
+
+
+@pytest.mark.asyncio
+async def test_threshold_only_fires_when_crossed_downwards(index):
+    assert "below_90" not in await index.crossed([_price(89.0, 80.0)])  # Already below
+    assert "below_90" in await index.crossed([_price(91.0, 90.0)])  # Landing on it counts
+
+
+@pytest.mark.asyncio
+async def test_increase_uses_percent_or_legacy_amount(index):
+    assert set(await index.crossed([_price(100.0, 105.0)])) == set()
+    assert set(await index.crossed([_price(100.0, 112.0)])) == {"rise_10pct"}
+    assert set(await index.crossed([_price(100.0, 115.0)])) == {"rise_10pct", "rise_15_dollars"}
+
+
+@pytest.mark.asyncio
+async def test_stock_flip_and_unchanged_price(index):
+    change = {"product_id": "prod_1", "old_price": 100.0, "new_price": 100.0,
+              "old_in_stock": False, "new_in_stock": True}
+    fired = await index.crossed([change])
+    assert fired == {"restock": change}
+    assert await index.crossed([{**change, "old_in_stock": True}]) == {}
+
+
+@pytest.mark.asyncio
+async def test_load_skips_warm_products_and_add_remove_update_index(index):
+    session = FakeSession([])
+    await index.load(session, ["prod_1"])
+    assert session.queries == 0
+
+    await index.add(_alert("below_95", AlertType.THRESHOLD, 95.0))
+    await index.remove("prod_1", ["below_90", "any_drop", "drop_5_dollars"])
+    assert set(await index.crossed([_price(100.0, 88.0)])) == {"below_95"}
+
+    # Cold products are left for load() to build from the database
+    await index.add(_alert("other", AlertType.STOCK_CHANGE, product_id="prod_2"))
+    assert not await index.redis.exists(_key("prod_2", "stock"))
+
+
+@pytest.mark.asyncio
+async def test_debounce_claims_once_until_released(index):
+    assert await index.debounce(["below_90", "any_drop"]) == {"below_90", "any_drop"}
+    assert await index.debounce(["below_90", "restock"]) == {"restock"}
+    assert await index.redis.ttl(ALERT_DEBOUNCE_PREFIX + "below_90") > 0
+
+    await index.release(["below_90"])
+    assert await index.debounce(["below_90"]) == {"below_90"}
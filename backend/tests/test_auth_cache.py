@@ -0,0 +1,42 @@
+import fakeredis
+import pytest
+from auth import APIKeyCache, SET_UNLESS_REVOKED_SCRIPT, KEY_CACHE_PREFIX
+
+ENTRY = {"key_id": "key_1", "user_id": "user_1", "plan": "starter", "active": True}
+
+
+@pytest.fixture
+def cache():
+    cache = APIKeyCache()
+    cache._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    cache._set_unless_revoked = cache._redis.register_script(SET_UNLESS_REVOKED_SCRIPT)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_verified_key_is_shared_through_redis(cache):
+    await cache.set("hash_1", ENTRY)
+    assert await cache.get("hash_1") == (True, ENTRY)
+
+    other_worker = APIKeyCache()
+    other_worker._redis = cache._redis
+    assert await other_worker.get("hash_1") == (True, ENTRY)
+
+
+@pytest.mark.asyncio
+async def test_unknown_key_is_a_miss(cache):
+    assert await cache.get("hash_unknown") == (False, None)
+    cache.set_invalid("hash_unknown")
+    assert await cache.get("hash_unknown") == (True, None)
+
+
+@pytest.mark.asyncio
+async def test_revoked_key_is_not_recached_by_inflight_request(cache):
+    await cache.set("hash_1", ENTRY)
+    await cache.invalidate(["hash_1"])
+    assert await cache._redis.get(KEY_CACHE_PREFIX + "hash_1") is None
+
+    # A request that read the key from the database before the revocation
+    await cache.set("hash_1", ENTRY)
+
+    assert await cache.get("hash_1") == (False, None)
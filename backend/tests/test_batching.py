@@ -0,0 +1,96 @@
+import pytest
+import tasks
+import throttle
+from throttle import rate_for_domain
+
+
+def test_rate_for_domain():
+    assert rate_for_domain("www.amazon.com") == 0.5
+    assert rate_for_domain("shop.example.com", {"example.com": 3.0}) == 3.0
+    assert rate_for_domain("other.org", {"example.com": 3.0}, default_rate=None) is None
+
+
+def test_batch_size_shrinks_for_rate_limited_domains(monkeypatch):
+    monkeypatch.setattr(throttle, "DOMAIN_RATES", {"slow.com": 0.01, "fast.com": 100.0})
+    monkeypatch.setattr(tasks, "SCRAPE_BATCH_TIME_BUDGET", 150)
+
+    # One request per 100s: only one target fits in a 150s budget
+    assert tasks.batch_size_for("slow.com") == 1
+    # Bound by scrape time instead: 15s per target over 2 domain slots
+    assert tasks.batch_size_for("fast.com") == min(tasks.SCRAPE_BATCH_SIZE, int(150 / (15 / 2)))
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(tasks, "SCRAPE_BATCH_TIME_BUDGET", 10 ** 6)
+    assert tasks.batch_size_for("example.com") == tasks.SCRAPE_BATCH_SIZE
+
+
+def test_chunk_by_domain(monkeypatch):
+    monkeypatch.setattr(tasks, "batch_size_for", lambda domain: 2 if domain == "a.com" else 10)
+    targets = [f"https://www.a.com/{i}" for i in range(5)] + ["https://b.com/1", "https://b.com/2"]
+
+    batches = tasks.chunk_by_domain(targets)
+
+    assert batches == [
+        ["https://www.a.com/0", "https://www.a.com/1"],
+        ["https://www.a.com/2", "https://www.a.com/3"],
+        ["https://www.a.com/4"],
+        ["https://b.com/1", "https://b.com/2"],
+    ]
+    assert tasks.chunk_by_domain(targets, size=3)[0] == targets[:3]
+
+
+class FakeScraper:
+    def __init__(self, urls_before_failure=None):
+        self.urls_before_failure = urls_before_failure
+        self.closed = False
+
+    async def scrape_stream(self, urls):
+        for count, url in enumerate(urls):
+            if count == self.urls_before_failure:
+                raise RuntimeError("worker timeout")
+            yield {"url": url, "success": True, "price": 1.0}
+
+    async def close(self):
+        self.closed = True
+
+
+def _subscribers(count):
+    return {f"https://example.com/{i}": [f"prod_{i}"] for i in range(count)}
+
+
+@pytest.mark.asyncio
+async def test_batch_results_are_saved_in_chunks(monkeypatch):
+    scraper, saved = FakeScraper(), []
+
+    async def save(subscribers, results):
+        saved.append([result["url"] for result in results])
+
+    monkeypatch.setattr(tasks, "make_scraper", lambda: scraper)
+    monkeypatch.setattr(tasks, "save_batch_chunk", save)
+    monkeypatch.setattr(tasks, "SCRAPE_SAVE_CHUNK_SIZE", 5)
+
+    results = await tasks.check_and_record_batch(_subscribers(12))
+
+    assert len(results) == 12
+    assert [len(chunk) for chunk in saved] == [5, 5, 2]
+    assert saved[0][0] == "https://example.com/0"
+    assert scraper.closed
+
+
+@pytest.mark.asyncio
+async def test_interrupted_batch_keeps_saved_chunks(monkeypatch):
+    scraper, saved = FakeScraper(urls_before_failure=7), []
+
+    async def save(subscribers, results):
+        saved.append(len(results))
+
+    monkeypatch.setattr(tasks, "make_scraper", lambda: scraper)
+    monkeypatch.setattr(tasks, "save_batch_chunk", save)
+    monkeypatch.setattr(tasks, "SCRAPE_SAVE_CHUNK_SIZE", 5)
+
+    with pytest.raises(RuntimeError):
+        await tasks.check_and_record_batch(_subscribers(12))
+
+    assert saved == [5]
+    assert scraper.closed
@@ -0,0 +1,35 @@
+from canonical_url import canonicalize_url
+
+
+def test_amazon_variants_share_one_target():
+    urls = [
+        "https://www.amazon.com/Some-Product-Name/dp/B08N5WRWNW/ref=sr_1_3?keywords=x&qid=1",
+        "https://amazon.com/gp/product/b08n5wrwnw?psc=1&tag=affiliate-20",
+        "https://smile.amazon.com/dp/B08N5WRWNW",
+    ]
+    for url in urls:
+        assert canonicalize_url(url) == ("https://www.amazon.com/dp/B08N5WRWNW", "B08N5WRWNW")
+
+
+def test_retailer_item_ids():
+    assert canonicalize_url("https://www.walmart.com/ip/Some-TV/123456789?athcpid=1") == \
+        ("https://www.walmart.com/ip/123456789", "123456789")
+    assert canonicalize_url("https://www.target.com/p/some-thing/-/A-54191097#lnk=sametab") == \
+        ("https://www.target.com/p/-/A-54191097", "54191097")
+    assert canonicalize_url("https://www.ebay.com/itm/Vintage-Lamp/1234567890?hash=item1") == \
+        ("https://www.ebay.com/itm/1234567890", "1234567890")
+    assert canonicalize_url("https://www.bestbuy.com/site/some-laptop/6534641.p?skuId=6534641") == \
+        ("https://www.bestbuy.com/site/6534641.p?skuId=6534641", "6534641")
+
+
+def test_generic_url_drops_tracking_and_sorts_query():
+    canonical, identifier = canonicalize_url(
+        "http://Shop.Example.com:443/products/widget/?utm_source=mail&color=red&gclid=abc&size=m#reviews"
+    )
+    assert canonical == "https://shop.example.com/products/widget?color=red&size=m"
+    assert identifier is None
+
+
+def test_generic_url_keeps_product_params():
+    canonical, _ = canonicalize_url("https://example.com/item?id=42&variant=7")
+    assert canonical == "https://example.com/item?id=42&variant=7"
@@ -0,0 +1,113 @@
+import time
+import fakeredis
+import pytest
+import due_scheduler
+import tasks
+from due_scheduler import DueScheduler, DUE_KEY, TARGET_INTERVALS_KEY, JITTER_FRACTION
+
+LAMP_URL = "https://www.amazon.com/Desk-Lamp/dp/B000000001?tag=aff-20"
+LAMP_TARGET = "https://www.amazon.com/dp/B000000001"
+
+
+@pytest.fixture
+def scheduler():
+    return DueScheduler(fakeredis.FakeRedis(decode_responses=True))
+
+
+def _due(scheduler, target):
+    return scheduler.redis.zscore(DUE_KEY, target)
+
+
+def test_subscribe_schedules_first_check_one_interval_out(scheduler):
+    now = time.time()
+    assert scheduler.subscribe("prod_1", LAMP_URL, 3600) == LAMP_TARGET
+
+    due = _due(scheduler, LAMP_TARGET)
+    assert now + 3600 * (1 - JITTER_FRACTION) - 1 <= due <= now + 3600 * (1 + JITTER_FRACTION) + 1
+
+
+def test_spread_places_first_check_within_one_interval(scheduler):
+    now = time.time()
+    for i in range(20):
+        scheduler.subscribe(f"prod_{i}", f"https://example.com/item/{i}", 600, spread=True)
+    dues = [score for _, score in scheduler.redis.zrange(DUE_KEY, 0, -1, withscores=True)]
+    assert all(now - 1 <= due <= now + 601 for due in dues)
+
+
+def test_shared_target_uses_shortest_interval(scheduler):
+    scheduler.subscribe("prod_1", LAMP_URL, 86400)
+    scheduler.subscribe("prod_2", "https://amazon.com/dp/B000000001", 3600)
+
+    assert sorted(scheduler.subscribers(LAMP_TARGET)) == ["prod_1", "prod_2"]
+    assert scheduler.redis.hget(TARGET_INTERVALS_KEY, LAMP_TARGET) == "3600"
+    # The stricter subscriber pulled the next check forward
+    assert _due(scheduler, LAMP_TARGET) <= time.time() + 3600 + 1
+
+
+def test_unsubscribe_recomputes_interval_and_drops_empty_target(scheduler):
+    scheduler.subscribe("prod_1", LAMP_URL, 86400)
+    scheduler.subscribe("prod_2", LAMP_URL, 3600)
+
+    scheduler.unsubscribe("prod_2")
+    assert scheduler.redis.hget(TARGET_INTERVALS_KEY, LAMP_TARGET) == "86400"
+
+    scheduler.unsubscribe("prod_1")
+    assert _due(scheduler, LAMP_TARGET) is None
+    assert scheduler.subscribers(LAMP_TARGET) == []
+
+
+def test_claim_due_returns_only_due_targets_and_reschedules(scheduler):
+    now = time.time()
+    scheduler.subscribe("prod_1", "https://example.com/a", 100)
+    scheduler.subscribe("prod_2", "https://example.com/b", 1000)
+
+    assert scheduler.claim_due(now=now) == []
+
+    later = now + 200
+    assert scheduler.claim_due(now=later) == ["https://example.com/a"]
+    next_due = _due(scheduler, "https://example.com/a")
+    assert later + 100 * (1 - JITTER_FRACTION) <= next_due <= later + 100 * (1 + JITTER_FRACTION)
+
+    # Claimed targets aren't handed out again until their next due time
+    assert scheduler.claim_due(now=later) == []
+    assert scheduler.claim_due(now=next_due) == ["https://example.com/a"]
+
+
+def test_claim_due_respects_limit(scheduler):
+    for i in range(5):
+        scheduler.subscribe(f"prod_{i}", f"https://example.com/{i}", 60)
+    later = time.time() + 120
+
+    first = scheduler.claim_due(limit=3, now=later)
+    second = scheduler.claim_due(limit=3, now=later)
+
+    assert len(first) == 3 and len(second) == 2
+    assert not set(first) & set(second)
+    assert scheduler.pending_count(now=later) == 0
+
+
+def test_enroll_missing_skips_enrolled_products(scheduler):
+    scheduler.subscribe("prod_1", "https://example.com/a", 60)
+    enrolled = scheduler.enroll_missing([
+        ("prod_1", "https://example.com/a", 60),
+        ("prod_2", "https://example.com/b", 60),
+    ])
+    assert enrolled == 1
+    assert scheduler.subscribers("https://example.com/b") == ["prod_2"]
+
+
+def test_dispatch_drains_backlog_past_one_claim(scheduler, monkeypatch):
+    for i in range(5):
+        scheduler.subscribe(f"prod_{i}", f"https://example.com/{i}", 60, spread=True)
+    scheduler.redis.zadd(DUE_KEY, {f"https://example.com/{i}": 0 for i in range(5)})
+
+    dispatched = []
+    monkeypatch.setattr(due_scheduler, "_scheduler", scheduler)
+    monkeypatch.setattr(due_scheduler, "DISPATCH_BATCH_LIMIT", 2)
+    monkeypatch.setattr(tasks, "dispatch_batches",
+                        lambda subscribers, spread=0: dispatched.append(subscribers) or 1)
+
+    result = tasks.dispatch_due_products()
+
+    assert result == {"targets_queued": 5, "batches": 3}
+    assert [len(subscribers) for subscribers in dispatched] == [2, 2, 1]
@@ -0,0 +1,41 @@
+import email_service
+from email_service import EmailService, SENDGRID_MAX_PERSONALIZATIONS
+
+
+def test_build_bulk_payloads_chunks_recipients(monkeypatch):
+    monkeypatch.setattr(email_service, "SENDGRID_MAX_PERSONALIZATIONS", 3)
+    recipients = [
+        {"email": f"user{i}@example.com", "substitutions": {"-name-": f"User {i}"}, "alert": i}
+        for i in range(7)
+    ]
+
+    payloads = EmailService().build_bulk_payloads(recipients, "Hi -name-", "<p>Hi -name-</p>", "Hi -name-")
+
+    assert [count for _, count in payloads] == [3, 3, 1]
+    first, _ = payloads[0]
+    personalizations = {p["to"][0]["email"]: p for p in first["personalizations"]}
+    assert set(personalizations) == {"user0@example.com", "user1@example.com", "user2@example.com"}
+    assert personalizations["user1@example.com"]["substitutions"] == {"-name-": "User 1"}
+    assert [content["type"] for content in first["content"]] == ["text/plain", "text/html"]
+
+
+def test_build_bulk_payloads_default_chunk_size():
+    recipients = [{"email": f"user{i}@example.com"} for i in range(SENDGRID_MAX_PERSONALIZATIONS + 1)]
+    payloads = EmailService().build_bulk_payloads(recipients, "Subject", "<p>Body</p>")
+    assert [count for _, count in payloads] == [SENDGRID_MAX_PERSONALIZATIONS, 1]
+
+
+def test_legacy_single_alert_task_forwards_to_bulk(monkeypatch):
+    import tasks
+
+    queued = []
+    monkeypatch.setattr(tasks.send_price_alert_emails, "delay", queued.append)
+
+    tasks.send_price_alert_email("user@example.com", "Lamp", 20.0, 18.0, "price_drop")
+    tasks.send_price_alert_email({"email": "other@example.com", "alert_type": "threshold"})
+
+    assert queued == [
+        [{"email": "user@example.com", "product_name": "Lamp", "old_price": 20.0,
+          "new_price": 18.0, "alert_type": "price_drop"}],
+        [{"email": "other@example.com", "alert_type": "threshold"}],
+    ]
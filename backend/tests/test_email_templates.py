@@ -0,0 +1,62 @@
+from datetime import datetime
+import pytest
+from email_service import ALERT_TOKENS, ALERT_HTML_TOKENS
+from email_templates import SUBJECTS, render_email, render_fragment
+
+OPPORTUNITIES = render_fragment("opportunities", opportunities=[
+    {"name": "Desk Lamp", "percent_drop": 12.345, "new_price": 19.5}
+])
+
+CONTEXTS = {
+    "welcome": {"user_name": "Sam"},
+    "price_drop": {"product_name": "Desk Lamp", "product_url": "https://example.com/lamp",
+                   "old_price": "22.00", "new_price": "19.50", "percent_change": "11.4", "savings": "2.50"},
+    "price_increase": {"product_name": "Desk Lamp", "product_url": "https://example.com/lamp",
+                       "old_price": "19.50", "new_price": "22.00", "percent_change": "12.8"},
+    "price_threshold": {"product_name": "Desk Lamp", "product_url": "https://example.com/lamp",
+                        "old_price": "22.00", "new_price": "19.50", "threshold": "20.00"},
+    "stock_change": {"product_name": "Desk Lamp", "product_url": "https://example.com/lamp",
+                     "stock_status": "back in stock"},
+    "weekly_report": {"report_date": datetime(2026, 3, 2), "products_tracked": "4", "price_changes": "7",
+                      "avg_competitor_price": "31.20", "opportunities_html": OPPORTUNITIES.html,
+                      "opportunities_text": OPPORTUNITIES.text},
+    "payment_failed": {"amount": 49.0, "retry_date": "March 5"},
+    "subscription_cancelled": {},
+    "inactive_user": {"days_inactive": 30},
+}
+
+
+def test_every_template_has_a_context():
+    assert set(CONTEXTS) == set(SUBJECTS)
+
+
+@pytest.mark.parametrize("name", sorted(SUBJECTS))
+def test_render_email(name):
+    email = render_email(name, **CONTEXTS[name])
+    assert email.subject and "\n" not in email.subject
+    assert email.html.lstrip().lower().startswith("<!doctype html") or "<html" in email.html.lower()
+    assert email.text.strip()
+    assert "{{" not in email.html + email.text
+
+
+def test_render_email_escapes_html_only():
+    email = render_email("stock_change", product_name="Tom & Jerry <DVD>",
+                         product_url="https://example.com/dvd", stock_status="back in stock")
+    assert "Tom &amp; Jerry &lt;DVD&gt;" in email.html
+    assert "Tom & Jerry <DVD>" in email.text
+    assert "Tom & Jerry <DVD>" in email.subject
+
+
+def test_weekly_report_includes_opportunities():
+    email = render_email("weekly_report", **CONTEXTS["weekly_report"])
+    assert "Desk Lamp: price dropped 12.3% to $19.50" in email.text
+    assert "Desk Lamp" in email.html
+    assert "Mar 02, 2026" in email.subject
+
+
+@pytest.mark.parametrize("template", ["price_drop", "price_increase", "price_threshold", "stock_change"])
+def test_alert_templates_render_with_tokens(template):
+    email = render_email(template, html_context=ALERT_HTML_TOKENS, **ALERT_TOKENS)
+    assert "-product_name_html-" in email.html
+    assert "-product_name-" in email.text
+    assert "-product_name-" in email.subject
@@ -0,0 +1,110 @@
+from datetime import datetime, date
+import pytest
+import partitions
+from partitions import DEFAULT_PARTITION, add_months, month_start, partition_name
+
+
+class FakeConnection:
+    """Answers the catalog queries partitions.py makes and records its DDL"""
+
+    def __init__(self, partitioned=True, partitions=(), stranded=False):
+        self.partitioned = partitioned
+        self.partitions = list(partitions)
+        self.stranded = stranded
+        self.statements = []
+
+    async def scalar(self, statement, params=None):
+        sql = str(statement)
+        if "relkind" in sql:
+            return "p" if self.partitioned else "r"
+        if "EXISTS (SELECT 1 FROM" in sql:
+            return self.stranded
+        raise AssertionError(f"Unexpected query: {sql}")
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if "pg_inherits" in sql:
+            return [(name,) for name in self.partitions]
+        self.statements.append(sql)
+
+
+def _this_month() -> date:
+    return month_start(datetime.utcnow().date())
+
+
+@pytest.mark.asyncio
+async def test_unpartitioned_table_is_left_alone():
+    conn = FakeConnection(partitioned=False)
+    assert await partitions.ensure_partitions(conn) == []
+    assert conn.statements == []
+
+
+@pytest.mark.asyncio
+async def test_creates_default_and_missing_months():
+    this_month = _this_month()
+    conn = FakeConnection(partitions=[partition_name(this_month), DEFAULT_PARTITION])
+
+    created = await partitions.ensure_partitions(conn, months_ahead=2)
+
+    assert created == [partition_name(add_months(this_month, 1)), partition_name(add_months(this_month, 2))]
+    assert f'"{DEFAULT_PARTITION}" PARTITION OF price_history DEFAULT' in conn.statements[0]
+    assert all("PARTITION OF price_history FOR VALUES" in sql for sql in conn.statements[1:])
+
+
+@pytest.mark.asyncio
+async def test_rows_in_default_partition_move_to_new_month():
+    conn = FakeConnection(stranded=True)
+    month = date(2026, 5, 1)
+
+    await partitions.create_partition(conn, "price_history_2026_05", month)
+
+    create, move, attach = conn.statements
+    assert "LIKE price_history" in create
+    assert f'DELETE FROM "{DEFAULT_PARTITION}"' in move and "timestamp < '2026-06-01'" in move
+    assert "ATTACH PARTITION \"price_history_2026_05\" FOR VALUES FROM ('2026-05-01') TO ('2026-06-01')" in attach
+
+
+@pytest.mark.asyncio
+async def test_expire_with_zero_days_keeps_current_month_and_default():
+    this_month = _this_month()
+    months = [add_months(this_month, offset) for offset in (-3, -1, 0, 1)]
+    conn = FakeConnection(partitions=[partition_name(month) for month in months] + [DEFAULT_PARTITION])
+
+    expired = await partitions.expire_partitions(conn, days_to_keep=0)
+
+    assert expired == [partition_name(months[0]), partition_name(months[1])]
+    assert conn.statements == [f'DROP TABLE "{name}"' for name in expired]
+
+
+@pytest.mark.asyncio
+async def test_expire_respects_retention_and_detach_mode():
+    this_month = _this_month()
+    old = add_months(this_month, -6)
+    conn = FakeConnection(partitions=[partition_name(old), partition_name(add_months(this_month, -1))])
+
+    expired = await partitions.expire_partitions(conn, days_to_keep=90, mode="detach")
+
+    assert expired == [partition_name(old)]
+    assert conn.statements == [f'ALTER TABLE price_history DETACH PARTITION "{partition_name(old)}"']
+
+
+@pytest.mark.parametrize("days_to_keep, expected", [(0, 0), (None, partitions.PRICE_HISTORY_RETENTION_DAYS)])
+def test_cleanup_task_passes_days_to_keep_through(monkeypatch, days_to_keep, expected):
+    import asyncio
+    import tasks
+
+    calls = []
+
+    async def maintenance(operation, **kwargs):
+        calls.append(kwargs)
+        return []
+
+    async def expire_rollups():
+        return 0
+
+    monkeypatch.setattr(tasks, "run_partition_maintenance", maintenance)
+    monkeypatch.setattr(tasks, "expire_hourly_rollups", expire_rollups)
+    monkeypatch.setattr(tasks, "run_async", asyncio.run)
+
+    assert tasks.cleanup_old_price_history(days_to_keep)["success"]
+    assert calls == [{"days_to_keep": expected}]
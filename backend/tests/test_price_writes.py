@@ -0,0 +1,125 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+import database
+from database import expand_runs, is_unchanged, save_scrape_results
+from models import PriceHistory
+
+MARCH_1 = datetime(2026, 3, 1, 9)
+MARCH_5 = datetime(2026, 3, 5, 9)
+APRIL_1 = datetime(2026, 4, 1, 9)
+
+
+def _product(**fields):
+    defaults = dict(id="prod_1", user_id="user_1", current_price=20.0, currency="USD", in_stock=True,
+                    price_changed_at=MARCH_1, product_identifier=None, name="Lamp")
+    return SimpleNamespace(**{**defaults, **fields})
+
+
+def test_expand_runs_newest_first():
+    history = [
+        {"price": 18.0, "timestamp": MARCH_5, "last_seen": datetime(2026, 3, 9)},
+        {"price": 20.0, "timestamp": MARCH_1, "last_seen": MARCH_1},
+    ]
+    points = expand_runs(history)
+    assert [(point["timestamp"], point["price"]) for point in points] == [
+        (datetime(2026, 3, 9), 18.0), (MARCH_5, 18.0), (MARCH_1, 20.0)
+    ]
+
+
+def test_expand_runs_oldest_first_and_missing_last_seen():
+    history = [
+        {"price": 20.0, "timestamp": MARCH_1, "last_seen": None},
+        {"price": 18.0, "timestamp": MARCH_5, "last_seen": datetime(2026, 3, 9)},
+    ]
+    points = expand_runs(history, newest_first=False)
+    assert [point["timestamp"] for point in points] == [MARCH_1, MARCH_5, datetime(2026, 3, 9)]
+
+
+def test_is_unchanged():
+    product = _product()
+    assert is_unchanged(product, 20.0, "USD", True, MARCH_5)
+    assert is_unchanged(product, 20.0, "USD", None, MARCH_5)  # Stock unknown doesn't break a run
+    assert not is_unchanged(product, 19.0, "USD", True, MARCH_5)
+    assert not is_unchanged(product, 20.0, "EUR", True, MARCH_5)
+    assert not is_unchanged(product, 20.0, "USD", False, MARCH_5)
+    assert not is_unchanged(product, 20.0, "USD", True, APRIL_1)  # New month starts a new row
+    assert not is_unchanged(_product(price_changed_at=None), 20.0, "USD", True, MARCH_5)
+
+
+class FakeSession:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+
+@pytest.fixture
+def write(monkeypatch):
+    """Run save_scrape_results in "changes" mode against in-memory products"""
+    monkeypatch.setattr(database, "PRICE_WRITE_MODE", "changes")
+    observed = []
+
+    async def upsert(session, observations):
+        observed.extend(observations)
+
+    monkeypatch.setattr(database, "upsert_rollups", upsert)
+
+    async def run(products, batch):
+        async def get_products(session, ids):
+            return [product for product in products if product.id in ids]
+
+        monkeypatch.setattr(database, "get_products", get_products)
+        session = FakeSession()
+        changes = await save_scrape_results(session, batch)
+        inserts = [params for statement, params in session.executed
+                   if statement.is_insert and statement.table.name == PriceHistory.__tablename__]
+        extensions = [params for statement, params in session.executed
+                      if params and "run_product_id" in params[0]]
+        return changes, inserts, extensions, observed
+
+    return run
+
+
+@pytest.mark.asyncio
+async def test_unchanged_price_extends_current_row(write):
+    changes, inserts, extensions, observed = await write(
+        [_product()], [(["prod_1"], {"success": True, "price": 20.0, "in_stock": True, "timestamp": MARCH_5})]
+    )
+
+    assert inserts == []
+    assert extensions == [[{"run_product_id": "prod_1", "run_timestamp": MARCH_1, "seen_at": MARCH_5}]]
+    assert changes[0]["old_price"] == changes[0]["new_price"] == 20.0
+    assert observed == [("prod_1", MARCH_5, 20.0)]  # Rollups still see every check
+
+
+@pytest.mark.asyncio
+async def test_changed_price_starts_new_row(write):
+    changes, inserts, extensions, _ = await write(
+        [_product(), _product(id="prod_2", current_price=18.0)],
+        [(["prod_1", "prod_2"], {"success": True, "price": 18.0, "timestamp": MARCH_5})]
+    )
+
+    assert [row["product_id"] for row in inserts[0]] == ["prod_1"]
+    assert inserts[0][0]["last_seen"] == inserts[0][0]["timestamp"] == MARCH_5
+    assert [row["run_product_id"] for row in extensions[0]] == ["prod_2"]
+    assert {change["product_id"]: change["old_price"] for change in changes} == {"prod_1": 20.0, "prod_2": 18.0}
+
+
+@pytest.mark.asyncio
+async def test_failed_scrapes_write_nothing(write):
+    changes, inserts, extensions, _ = await write(
+        [_product()], [(["prod_1"], {"success": False, "price": None, "error": "blocked"})]
+    )
+    assert (changes, inserts, extensions) == ([], [], [])
+
+
+@pytest.mark.asyncio
+async def test_all_mode_inserts_every_check(write, monkeypatch):
+    monkeypatch.setattr(database, "PRICE_WRITE_MODE", "all")
+    _, inserts, extensions, _ = await write(
+        [_product()], [(["prod_1"], {"success": True, "price": 20.0, "timestamp": MARCH_5})]
+    )
+    assert [row["product_id"] for row in inserts[0]] == ["prod_1"]
+    assert extensions == []
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.dialects import postgresql
+from models import PriceRollupHourly, PriceRollupDaily
+from rollups import bucket_start, pick_resolution, upsert_rollups, _summarize, _upsert_statement
+
+NOW = datetime(2026, 3, 10, 12)
+
+
+@pytest.mark.parametrize("span, resolution", [
+    (timedelta(hours=6), "raw"),
+    (timedelta(days=2), "raw"),
+    (timedelta(days=2, seconds=1), "hour"),
+    (timedelta(days=60), "hour"),
+    (timedelta(days=61), "day"),
+])
+def test_pick_resolution(span, resolution):
+    assert pick_resolution(NOW - span, NOW) == resolution
+
+
+def test_pick_resolution_without_since_reads_raw():
+    assert pick_resolution(None) == "raw"
+
+
+def test_bucket_start():
+    observed = datetime(2026, 3, 10, 12, 34, 56, 789)
+    assert bucket_start(observed, "hour") == datetime(2026, 3, 10, 12)
+    assert bucket_start(observed, "day") == datetime(2026, 3, 10)
+
+
+def test_summarize_folds_out_of_order_observations():
+    observations = [
+        ("prod_1", datetime(2026, 3, 10, 12, 40), 18.0),
+        ("prod_1", datetime(2026, 3, 10, 12, 5), 20.0),
+        ("prod_1", datetime(2026, 3, 10, 12, 20), 22.0),
+        ("prod_1", datetime(2026, 3, 10, 13, 0), 19.0),
+        ("prod_2", datetime(2026, 3, 10, 12, 30), 5.0),
+    ]
+
+    hourly = {(row["product_id"], row["bucket"].hour): row for row in _summarize(observations, "hour")}
+    assert len(hourly) == 3
+    first = hourly[("prod_1", 12)]
+    assert (first["open"], first["high"], first["low"], first["close"]) == (20.0, 22.0, 18.0, 18.0)
+    assert (first["price_sum"], first["samples"]) == (60.0, 3)
+    assert first["opened_at"] == datetime(2026, 3, 10, 12, 5)
+    assert first["closed_at"] == datetime(2026, 3, 10, 12, 40)
+
+    daily = {row["product_id"]: row for row in _summarize(observations, "day")}
+    assert daily["prod_1"]["samples"] == 4
+    assert daily["prod_1"]["close"] == 19.0
+
+
+def test_upsert_statement_merges_on_product_and_bucket():
+    sql = str(_upsert_statement(PriceRollupHourly).compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (product_id, bucket) DO UPDATE" in sql
+    assert "price_sum = (price_rollups_hourly.price_sum + excluded.price_sum)" in sql
+    assert "greatest(price_rollups_hourly.high, excluded.high)" in sql
+    assert "least(price_rollups_hourly.low, excluded.low)" in sql
+
+
+class FakeSession:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+
+@pytest.mark.asyncio
+async def test_upsert_rollups_writes_both_resolutions():
+    session = FakeSession()
+    await upsert_rollups(session, [("prod_1", NOW, 10.0), ("prod_1", NOW + timedelta(hours=1), 12.0)])
+
+    tables = [statement.table.name for statement, _ in session.executed]
+    assert tables == [PriceRollupHourly.__tablename__, PriceRollupDaily.__tablename__]
+    assert [len(params) for _, params in session.executed] == [2, 1]
+
+    session = FakeSession()
+    await upsert_rollups(session, [])
+    assert session.executed == []
@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from scraper import PriceScraper
+
+
+@pytest.fixture
+def scraper():
+    return PriceScraper()
+
+
+def test_blocks_heavy_resources(scraper):
+    assert scraper.should_block_request("https://shop.example.com/hero.jpg", "image", [])
+    assert scraper.should_block_request("https://shop.example.com/font.woff2", "font", [])
+    assert not scraper.should_block_request("https://shop.example.com/app.js", "script", [])
+
+
+def test_blocks_tracker_subdomains(scraper):
+    assert scraper.should_block_request("https://connect.facebook.net/en_US/fbevents.js", "script", [])
+    assert scraper.should_block_request("https://www.googletagmanager.com/gtm.js?id=1", "script", [])
+    assert scraper.should_block_request("https://doubleclick.net/pixel", "image", [])
+    # Suffix match is on whole labels only
+    assert not scraper.should_block_request("https://notfacebook.net/app.js", "script", [])
+
+
+def test_allowlist_overrides_blocking(scraper):
+    assert not scraper.should_block_request("https://shop.example.com/price.png", "image", ["image"])
+    assert not scraper.should_block_request("https://www.googletagmanager.com/gtm.js", "script", ["gtm.js"])
+
+
+class FakePage:
+    def __init__(self, selector_delay, idle_delay):
+        self.selector_delay = selector_delay
+        self.idle_delay = idle_delay
+        self.finished = []
+
+    async def _wait(self, name, delay):
+        await asyncio.sleep(delay)
+        self.finished.append(name)
+
+    async def wait_for_selector(self, selector, state, timeout):
+        await self._wait("selector", self.selector_delay)
+
+    async def wait_for_load_state(self, state, timeout):
+        await self._wait("networkidle", self.idle_delay)
+
+
+@pytest.mark.asyncio
+async def test_generic_wait_returns_on_first_signal(scraper):
+    page = FakePage(selector_delay=0.01, idle_delay=5)
+    await asyncio.wait_for(scraper.wait_for_generic_price(page), 1)
+    assert page.finished == ["selector"]
+
+    page = FakePage(selector_delay=5, idle_delay=0.01)
+    await asyncio.wait_for(scraper.wait_for_generic_price(page), 1)
+    assert page.finished == ["networkidle"]
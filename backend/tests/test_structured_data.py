@@ -0,0 +1,88 @@
+import json
+from structured_data import extract_structured_data, parse_availability, parse_structured_data
+
+
+def _json_ld(document) -> str:
+    return f'<script type="application/ld+json">{json.dumps(document)}</script>'
+
+
+def test_json_ld_product_in_graph_with_aggregate_offer():
+    html = "<html><head>" + _json_ld({
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "BreadcrumbList"},
+            {
+                "@type": ["Product"],
+                "name": "Noise Cancelling Headphones",
+                "sku": "WH-1000XM5",
+                "offers": {
+                    "@type": "AggregateOffer",
+                    "offers": [
+                        {"@type": "Offer"},
+                        {"@type": "Offer", "price": "348.00", "priceCurrency": "USD",
+                         "availability": "https://schema.org/InStock"}
+                    ]
+                }
+            }
+        ]
+    }) + "</head></html>"
+
+    data = extract_structured_data(html)
+    assert data["name"] == "Noise Cancelling Headphones"
+    assert data["price"] == "348.00"
+    assert data["currency"] == "USD"
+    assert data["sku"] == "WH-1000XM5"
+    assert data["in_stock"] is True
+
+
+def test_json_ld_wins_over_microdata_and_opengraph():
+    html = (
+        "<html><head>"
+        '<meta property="product:price:amount" content="9.99">'
+        '<meta property="og:title" content="OG Title">'
+        + _json_ld({"@type": "Product", "name": "LD Name", "offers": {"price": 12.5}}) +
+        "</head><body>"
+        '<div itemscope itemtype="https://schema.org/Product">'
+        '<span itemprop="name">Microdata Name</span>'
+        '<span itemprop="price" content="11.00">$11</span>'
+        '<link itemprop="availability" href="https://schema.org/OutOfStock">'
+        "</div></body></html>"
+    )
+
+    data = extract_structured_data(html)
+    assert data["name"] == "LD Name"
+    assert data["price"] == "12.5"
+    assert data["in_stock"] is False  # Only microdata has availability
+
+
+def test_microdata_name_outside_product_scope_is_ignored():
+    html = (
+        '<div itemscope itemtype="https://schema.org/Organization"><span itemprop="name">Store</span></div>'
+        '<div itemscope itemtype="https://schema.org/Product"><span itemprop="price">19.99</span></div>'
+    )
+    data = extract_structured_data(html)
+    assert data["price"] == "19.99"
+    assert data["name"] is None
+
+
+def test_opengraph_fallback_and_broken_json_ld():
+    raw = {
+        "json_ld": ["{not json"],
+        "microdata": {},
+        "meta": {"product:price:amount": "5.00", "product:availability": "oos", "og:title": "Cheap Thing"}
+    }
+    data = parse_structured_data(raw)
+    assert data["price"] == "5.00"
+    assert data["name"] == "Cheap Thing"
+    assert data["in_stock"] is False
+
+
+def test_no_product_data():
+    assert extract_structured_data("<html><body><p>Hello</p></body></html>") is None
+
+
+def test_parse_availability():
+    assert parse_availability("http://schema.org/LimitedAvailability") is True
+    assert parse_availability("SoldOut") is False
+    assert parse_availability("BackOrder") is None
+    assert parse_availability(None) is None
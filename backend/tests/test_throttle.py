@@ -0,0 +1,43 @@
+import asyncio
+import time
+import pytest
+from throttle import TokenBucket, ScrapeScheduler
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=20.0, capacity=2.0)
+
+    started = time.monotonic()
+    await bucket.acquire()
+    await bucket.acquire()
+    assert time.monotonic() - started < 0.03  # Burst of `capacity` is immediate
+
+    await bucket.acquire()
+    await bucket.acquire()
+    assert time.monotonic() - started >= 0.09  # Then one token per 1/rate seconds
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refill_is_capped():
+    bucket = TokenBucket(rate=1000.0, capacity=1.0)
+    await asyncio.sleep(0.02)
+    bucket._refill()
+    assert bucket.tokens == 1.0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_per_domain_concurrency():
+    scheduler = ScrapeScheduler(max_concurrency=10, per_domain_concurrency=2, domain_rates={}, default_rate=None)
+    running = peak = 0
+
+    async def scrape():
+        nonlocal running, peak
+        async with scheduler.slot("example.com"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[scrape() for _ in range(6)])
+    assert peak == 2
@@ -0,0 +1,60 @@
+import hashlib
+import hmac
+import pytest
+import webhooks
+from webhooks import CircuitBreaker, CircuitOpenError, sign_payload, retry_delay
+
+
+def test_sign_payload():
+    body = b'{"event": "price_drop"}'
+    signature = sign_payload("whsec_test", 1700000000, body)
+
+    expected = hmac.new(b"whsec_test", b"1700000000." + body, hashlib.sha256).hexdigest()
+    assert signature == f"t=1700000000,v1={expected}"
+    assert sign_payload("other", 1700000000, body) != signature
+
+
+def test_retry_delay_backs_off_with_jitter_and_cap():
+    for attempt in range(4):
+        base = webhooks.WEBHOOK_BACKOFF_BASE * 2 ** attempt
+        assert base * 0.8 <= retry_delay(attempt) <= base * 1.2
+    assert retry_delay(50) <= webhooks.WEBHOOK_BACKOFF_MAX * 1.2
+
+
+def test_circuit_opens_after_threshold_and_half_opens(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(webhooks.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=3, open_seconds=60)
+
+    for _ in range(2):
+        breaker.before_request()
+        breaker.record_failure()
+    breaker.before_request()  # Still closed below the threshold
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_request()
+    assert error.value.retry_after == 60
+
+    now[0] += 61
+    breaker.before_request()  # One half-open trial goes through
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # ...but only one
+
+    breaker.record_success()
+    breaker.before_request()
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens_circuit(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(webhooks.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, open_seconds=60)
+
+    breaker.record_failure()
+    now[0] += 61
+    breaker.before_request()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
@@ -0,0 +1,33 @@
+import worker_loop
+from alerts import alert_index
+from email_service import email_service
+from stats_cache import stats_cache
+from webhooks import webhook_buffer
+
+
+def test_isolated_run_closes_loop_bound_clients(monkeypatch):
+    monkeypatch.setattr(worker_loop, "WORKER_ASYNC_MODE", "isolated")
+
+    async def touch_clients():
+        # Creating the clients doesn't connect; each binds to this run's loop
+        return [stats_cache.redis, alert_index.redis, webhook_buffer.redis, email_service.async_http]
+
+    clients = worker_loop.run_async(touch_clients())
+
+    assert all(client is not None for client in clients)
+    assert stats_cache._redis is None
+    assert alert_index._redis is None
+    assert webhook_buffer._redis is None
+    assert email_service._async_http is None
+    assert clients[-1].is_closed
+
+
+def test_shared_loop_keeps_clients_between_runs():
+    async def stats_client():
+        return stats_cache.redis
+
+    try:
+        assert worker_loop.run_async(stats_client()) is worker_loop.run_async(stats_client())
+    finally:
+        worker_loop.run_async(worker_loop.close_loop_clients())
+        worker_loop.get_worker_loop().stop()
@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+from celery.concurrency.prefork import TaskPool as PreforkTaskPool
+from celery.concurrency.thread import TaskPool as ThreadTaskPool
+import tasks
+
+
+def _consumer(pool_cls, queues):
+    return SimpleNamespace(
+        pool=object.__new__(pool_cls),
+        task_consumer=SimpleNamespace(queues=[SimpleNamespace(name=name) for name in queues])
+    )
+
+
+def test_threads_pool_starts_browsers_when_ready(monkeypatch):
+    started = []
+    monkeypatch.setattr(tasks, "start_worker_loop", lambda **kwargs: started.append(True))
+
+    tasks.start_worker_loop_in_process(sender=_consumer(ThreadTaskPool, ["celery"]))
+    assert started == [True]
+
+
+def test_prefork_pool_leaves_startup_to_children(monkeypatch):
+    started = []
+    monkeypatch.setattr(tasks, "start_worker_loop", lambda **kwargs: started.append(True))
+
+    tasks.start_worker_loop_in_process(sender=_consumer(PreforkTaskPool, ["celery"]))
+    assert started == []
+
+
+def test_webhook_only_workers_skip_browsers(monkeypatch):
+    started = []
+    monkeypatch.setattr(tasks, "start_worker_loop", lambda **kwargs: started.append(True))
+
+    tasks.start_worker_loop_in_process(sender=_consumer(ThreadTaskPool, ["webhooks"]))
+    assert started == []
@@ -0,0 +1,125 @@
+"""
+PriceWatch AI - Scrape Throttling
+Global and per-domain concurrency caps with token-bucket rate limits
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "8"))
+SCRAPE_PER_DOMAIN_CONCURRENCY = int(os.getenv("SCRAPE_PER_DOMAIN_CONCURRENCY", "2"))
+
+# Requests per second allowed per domain (None = no rate limit)
+DOMAIN_RATES = {
+    "amazon.com": 0.5,
+    "walmart.com": 0.5,
+    "target.com": 1.0,
+    "ebay.com": 1.0,
+    "bestbuy.com": 0.5,
+}
+DEFAULT_DOMAIN_RATE: Optional[float] = 1.0
+
+
+def rate_for_domain(domain: str, domain_rates: Optional[Dict[str, float]] = None,
+                    default_rate: Optional[float] = DEFAULT_DOMAIN_RATE) -> Optional[float]:
+    """Requests per second allowed for a domain (None = no rate limit)"""
+    for site_domain, rate in (DOMAIN_RATES if domain_rates is None else domain_rates).items():
+        if site_domain in domain:
+            return rate
+    return default_rate
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class ScrapeScheduler:
+    """
+    Limits how many scrapes run at once, overall and per domain, and paces
+    requests to each domain with a token bucket.
+
+    A scrape waits for its domain slot and token before taking a global slot,
+    so a backlog for one retailer never holds capacity other domains could use.
+    """
+
+    def __init__(self, max_concurrency: int = SCRAPE_MAX_CONCURRENCY,
+                 per_domain_concurrency: int = SCRAPE_PER_DOMAIN_CONCURRENCY,
+                 domain_rates: Optional[Dict[str, float]] = None,
+                 default_rate: Optional[float] = DEFAULT_DOMAIN_RATE):
+        self.max_concurrency = max_concurrency
+        self.per_domain_concurrency = per_domain_concurrency
+        self.domain_rates = DOMAIN_RATES if domain_rates is None else domain_rates
+        self.default_rate = default_rate
+
+        self._global: Optional[asyncio.Semaphore] = None
+        self._domains: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+
+    def _rate_for(self, domain: str) -> Optional[float]:
+        return rate_for_domain(domain, self.domain_rates, self.default_rate)
+
+    def _domain_semaphore(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self._domains:
+            self._domains[domain] = asyncio.Semaphore(self.per_domain_concurrency)
+        return self._domains[domain]
+
+    def _bucket(self, domain: str) -> Optional[TokenBucket]:
+        if domain not in self._buckets:
+            rate = self._rate_for(domain)
+            self._buckets[domain] = TokenBucket(rate) if rate else None
+        return self._buckets[domain]
+
+    @asynccontextmanager
+    async def slot(self, domain: str):
+        """Hold a domain slot, a rate token and a global slot for one scrape"""
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._domain_semaphore(domain):
+            bucket = self._bucket(domain)
+            if bucket:
+                await bucket.acquire()
+            async with self._global:
+                yield
+
+
+# ========================================
+# PER-PROCESS SCHEDULER
+# ========================================
+
+_scheduler: Optional[ScrapeScheduler] = None
+
+
+def get_scrape_scheduler() -> ScrapeScheduler:
+    """Return the scheduler shared by every task on this worker's event loop"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ScrapeScheduler()
+    return _scheduler
@@ -0,0 +1,352 @@
+"""
+PriceWatch AI - Webhook Delivery
+Signed webhook POSTs over pooled HTTP/2 clients with per-endpoint circuit breakers
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse
+import httpx
+import redis.asyncio as aioredis
+from sqlalchemy import update
+from models import Webhook
+import logging
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))  # Seconds per attempt
+WEBHOOK_MAX_CONNECTIONS_PER_HOST = int(os.getenv("WEBHOOK_MAX_CONNECTIONS_PER_HOST", "10"))
+WEBHOOK_MAX_RETRIES = 6
+WEBHOOK_BACKOFF_BASE = 10  # Seconds before the first retry; doubles each attempt
+WEBHOOK_BACKOFF_MAX = 3600
+
+# An endpoint that fails CIRCUIT_FAILURE_THRESHOLD times in a row is not
+# called again for CIRCUIT_OPEN_SECONDS; then a single trial request decides
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 300
+
+SIGNATURE_HEADER = "X-PriceWatch-Signature"
+EVENT_HEADER = "X-PriceWatch-Event"
+DELIVERY_HEADER = "X-PriceWatch-Delivery"
+USER_AGENT = "PriceWatch-Webhooks/1.0"
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Batching
+BATCH_EVENT = "batch"
+DEFAULT_BATCH_MAX_EVENTS = 100
+WEBHOOK_BUFFER_PREFIX = "pricewatch:webhook_buffer:"  # LIST per webhook of JSON events
+WEBHOOK_BUFFER_TTL = 86400  # Abandoned buffers expire
+
+# KEYS: buffer. ARGV: event JSON, ttl. Returns the buffer length after the push
+PUSH_EVENT_SCRIPT = """
+local length = redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return length
+"""
+
+# KEYS: buffer. ARGV: max events. Returns {events, remaining}
+TAKE_BATCH_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local events = redis.call('LRANGE', KEYS[1], 0, limit - 1)
+redis.call('LTRIM', KEYS[1], limit, -1)
+return {events, redis.call('LLEN', KEYS[1])}
+"""
+
+
+class WebhookDeliveryError(Exception):
+    """A delivery attempt failed and may be retried"""
+
+
+class CircuitOpenError(WebhookDeliveryError):
+    """The endpoint's circuit breaker is open; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"circuit open for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    Signature header value: "t=<unix>,v1=<hex>", where v1 is
+    HMAC-SHA256(secret, "<unix>.<body>"). Receivers recompute it with their
+    webhook secret and reject stale timestamps to prevent replays.
+    """
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given retry number (0-based)"""
+    delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE * 2 ** attempt)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one endpoint"""
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, open_seconds: float = CIRCUIT_OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may go out now"""
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.open_seconds - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError(remaining)
+        if self.trial_in_flight:
+            raise CircuitOpenError(WEBHOOK_BACKOFF_BASE)
+        # Half-open: let one trial through
+        self.trial_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning(f"⚠️ Webhook circuit opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+
+class WebhookDeliverer:
+    """
+    Delivers webhooks from the worker's event loop. One AsyncClient per
+    destination host keeps HTTP/2 connections (and TLS sessions) open across
+    deliveries; breakers are tracked per webhook endpoint.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._loop = None
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Pooled client for the URL's scheme and host, bound to the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Clients can't cross event loops (isolated mode); start over
+            self._clients = {}
+            self._loop = loop
+
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        if origin not in self._clients:
+            self._clients[origin] = httpx.AsyncClient(
+                http2=True,
+                timeout=WEBHOOK_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=WEBHOOK_MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=WEBHOOK_MAX_CONNECTIONS_PER_HOST
+                ),
+                headers={"User-Agent": USER_AGENT, "Content-Type": "application/json"}
+            )
+        return self._clients[origin]
+
+    def breaker_for(self, webhook_id: str) -> CircuitBreaker:
+        if webhook_id not in self._breakers:
+            self._breakers[webhook_id] = CircuitBreaker()
+        return self._breakers[webhook_id]
+
+    async def post(self, webhook: Webhook, event: str, payload: Any, delivery_id: str) -> int:
+        """
+        One signed delivery attempt.
+
+        Returns:
+            The response status code
+
+        Raises:
+            CircuitOpenError: the endpoint is cooling down
+            WebhookDeliveryError: network error or non-2xx response
+        """
+        breaker = self.breaker_for(webhook.id)
+        breaker.before_request()
+
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        headers = {EVENT_HEADER: event, DELIVERY_HEADER: delivery_id}
+        if webhook.secret:
+            headers[SIGNATURE_HEADER] = sign_payload(webhook.secret, int(time.time()), body)
+
+        try:
+            response = await self.client_for(webhook.url).post(webhook.url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            raise WebhookDeliveryError(f"{type(e).__name__}: {e}") from e
+
+        if response.status_code >= 300:
+            breaker.record_failure()
+            raise WebhookDeliveryError(f"HTTP {response.status_code}")
+
+        breaker.record_success()
+        return response.status_code
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+
+
+_deliverer: Optional[WebhookDeliverer] = None
+
+
+def get_webhook_deliverer() -> WebhookDeliverer:
+    """Return this process's deliverer, creating it on first use"""
+    global _deliverer
+    if _deliverer is None:
+        _deliverer = WebhookDeliverer()
+    return _deliverer
+
+
+async def close_webhook_clients():
+    if _deliverer is not None:
+        await _deliverer.close()
+
+
+# ========================================
+# EVENTS AND BATCHING
+# ========================================
+
+def new_delivery_id() -> str:
+    return f"dlv_{uuid.uuid4().hex}"
+
+
+def make_event(event: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Event envelope; event_id is stable across retries and batches for idempotent receivers"""
+    return {
+        "event_id": f"evt_{uuid.uuid4().hex}",
+        "event": event,
+        "created_at": datetime.utcnow().isoformat(),
+        "data": data
+    }
+
+
+class WebhookBuffer:
+    """Redis buffer of pending events for webhooks in batching mode"""
+
+    def __init__(self):
+        self._redis: Optional[aioredis.Redis] = None
+        self._loop = None
+        self._push = None
+        self._take = None
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        """Redis client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+            self._loop = loop
+            self._push = self._redis.register_script(PUSH_EVENT_SCRIPT)
+            self._take = self._redis.register_script(TAKE_BATCH_SCRIPT)
+        return self._redis
+
+    async def close(self):
+        """Close the Redis client (before its event loop goes away)"""
+        if self._redis is not None:
+            await self._redis.aclose()
+        self._redis = None
+        self._loop = None
+
+    async def push(self, webhook_id: str, event: Dict[str, Any]) -> int:
+        """Buffer an event; returns how many are now waiting"""
+        client = self.redis
+        return await self._push(keys=[WEBHOOK_BUFFER_PREFIX + webhook_id],
+                                args=[json.dumps(event, default=str), WEBHOOK_BUFFER_TTL], client=client)
+
+    async def take(self, webhook_id: str, max_events: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Remove up to max_events buffered events; returns (events, still waiting)"""
+        client = self.redis
+        events, remaining = await self._take(keys=[WEBHOOK_BUFFER_PREFIX + webhook_id],
+                                             args=[max_events], client=client)
+        return [json.loads(event) for event in events], remaining
+
+
+webhook_buffer = WebhookBuffer()
+
+
+async def queue_event(webhook, event: str, data: Dict[str, Any]):
+    """
+    Send an event to a webhook: straight to delivery, or into its buffer when
+    the webhook batches. The first event in an empty buffer schedules a
+    flush after the window; reaching batch_max_events flushes right away.
+
+    `webhook` needs id, batch_window_seconds and batch_max_events.
+    """
+    from tasks import trigger_webhook, flush_webhook_batch
+
+    envelope = make_event(event, data)
+    if not webhook.batch_window_seconds:
+        trigger_webhook.delay(webhook.id, event, envelope)
+        return
+
+    max_events = webhook.batch_max_events or DEFAULT_BATCH_MAX_EVENTS
+    waiting = await webhook_buffer.push(webhook.id, envelope)
+    if waiting == max_events:
+        # Only the push that fills the batch queues the flush; later pushes
+        # are picked up by that flush's follow-up
+        flush_webhook_batch.delay(webhook.id, max_events, webhook.batch_window_seconds)
+    elif waiting == 1:
+        flush_webhook_batch.apply_async(
+            args=[webhook.id, max_events, webhook.batch_window_seconds],
+            countdown=webhook.batch_window_seconds
+        )
+
+
+# ========================================
+# DELIVERY
+# ========================================
+
+
+async def deliver(webhook_id: str, event: str, payload: Any, delivery_id: str,
+                  final_attempt: bool = False) -> Dict[str, Any]:
+    """
+    Load the webhook, make one delivery attempt and record the outcome:
+    success_count on success, failure_count once retries are exhausted.
+
+    Raises:
+        WebhookDeliveryError: the attempt failed and should be retried
+    """
+    from database import SessionLocal
+
+    # No session is held during the POST: a slow endpoint would otherwise keep
+    # a pooled connection checked out for the whole request timeout
+    async with SessionLocal() as session:
+        webhook = await session.get(Webhook, webhook_id)
+    if webhook is None or not webhook.enabled:
+        return {"success": False, "skipped": True, "webhook_id": webhook_id}
+
+    try:
+        status_code = await get_webhook_deliverer().post(webhook, event, payload, delivery_id)
+    except WebhookDeliveryError:
+        if final_attempt:
+            await record_outcome(webhook_id, failure_count=Webhook.failure_count + 1)
+        raise
+
+    await record_outcome(webhook_id, success_count=Webhook.success_count + 1, last_triggered=datetime.utcnow())
+    return {"success": True, "webhook_id": webhook_id, "status_code": status_code}
+
+
+async def record_outcome(webhook_id: str, **values):
+    """Update a webhook's delivery counters in a short transaction of its own"""
+    from database import SessionLocal
+
+    async with SessionLocal() as session:
+        await session.execute(update(Webhook).where(Webhook.id == webhook_id).values(**values))
+        await session.commit()
@@ -0,0 +1,126 @@
+"""
+PriceWatch AI - Worker Event Loop
+One persistent asyncio loop per Celery worker process, shared by all tasks
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# "shared": run coroutines on the persistent loop (default)
+# "isolated": asyncio.run per call, for debugging or the solo pool
+WORKER_ASYNC_MODE = os.getenv("WORKER_ASYNC_MODE", "shared")
+# Seconds a task's coroutine may run. Celery's task_time_limit is not enforced
+# under --pool=threads, so this is the only bound on a task's async work.
+WORKER_TASK_TIMEOUT = 280
+
+
+class WorkerLoop:
+    """
+    Runs an asyncio event loop on a daemon thread for the lifetime of the
+    worker process. Celery task threads submit coroutines to it, so with the
+    threads pool many tasks overlap their network waits on one loop and share
+    the browser pool, HTTP clients and scrape scheduler bound to it.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the loop thread (idempotent, and safe to call after fork)"""
+        with self._lock:
+            if self.running:
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._run_forever, name="pricewatch-worker-loop", daemon=True
+            )
+            self._thread.start()
+            logger.info("✅ Worker event loop started")
+
+    def _run_forever(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = WORKER_TASK_TIMEOUT):
+        """Run a coroutine on the shared loop and block the calling thread for its result"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Stop the loop and wait for its thread to exit"""
+        with self._lock:
+            if not self.running:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=10)
+            self.loop.close()
+            self._thread = None
+            self.loop = None
+            logger.info("Worker event loop stopped")
+
+
+_worker_loop = WorkerLoop()
+
+
+def get_worker_loop() -> WorkerLoop:
+    return _worker_loop
+
+
+async def close_loop_clients():
+    """
+    Close every pooled HTTP and Redis client bound to the running loop. Each
+    recreates itself on the next loop that uses it, so this is safe to call
+    whenever a loop is about to go away.
+    """
+    from alerts import alert_index
+    from email_service import email_service
+    from scraper import close_http_client
+    from stats_cache import stats_cache
+    from webhooks import close_webhook_clients, webhook_buffer
+
+    for close in (close_http_client, close_webhook_clients, webhook_buffer.close,
+                  stats_cache.close, alert_index.close, email_service.close_async):
+        try:
+            await close()
+        except Exception as e:
+            logger.debug(f"Closing loop client failed: {e}")
+
+
+async def _run_isolated(coro, timeout: Optional[float]):
+    """
+    Run a coroutine on a throwaway loop, then release everything bound to
+    that loop: the database pool's asyncpg connections and the pooled HTTP
+    and Redis clients would otherwise fail ("attached to a different loop")
+    or leak on the next call.
+    """
+    from database import engine
+
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    finally:
+        await close_loop_clients()
+        await engine.dispose()
+
+
+def run_async(coro, timeout: Optional[float] = WORKER_TASK_TIMEOUT):
+    """Run a coroutine from synchronous (Celery task) code"""
+    if WORKER_ASYNC_MODE == "isolated":
+        return asyncio.run(_run_isolated(coro, timeout))
+    return _worker_loop.run(coro, timeout)